@@ -9,11 +9,21 @@ from tools.build_system.code_util import REPO_ROOT
 from tools.build_system.constants import (
     IN_DOCKER_BUILD_DIR,
     IN_DOCKER_DEPS_DIR,
+    IN_DOCKER_DEPS_MIRROR_DIR,
+    IN_DOCKER_OBJECT_CACHE_DIR,
     IN_DOCKER_SRC_DIR,
 )
 from tools.build_system.docker import is_in_docker
 from tools.build_system.kioku_args import Modes, parse_args
-from tools.build_system.kioku_config import parse_host_config
+from tools.build_system.kioku_config import (
+    DEFAULT_OBJECT_CACHE_DIR,
+    DEPENDENCY_MIRROR_DIR_KEY,
+    LINKER_KEY,
+    OBJECT_CACHE_DIR_KEY,
+    parse_host_config,
+    read_config_value,
+    write_config_value,
+)
 
 
 def merge_args_and_config() -> argparse.Namespace:
@@ -49,13 +59,37 @@ def host_main():
             config.dependencies_directory: IN_DOCKER_DEPS_DIR,
         }
 
-        if config.subparser in (Modes.BUILD, Modes.DEBUG):
+        if config.subparser in (Modes.BUILD, Modes.BENCH_LINK, Modes.DEBUG):
             rw_volumes = {
                 **rw_volumes,
                 config.build_directory: IN_DOCKER_BUILD_DIR,
             }
 
-        run_in_docker("python3", sys.argv, rw_volumes=rw_volumes)
+        if config.subparser in (Modes.BUILD, Modes.BENCH_LINK, Modes.DEPS):
+            object_cache_dir = pathlib.Path(
+                getattr(config, OBJECT_CACHE_DIR_KEY, DEFAULT_OBJECT_CACHE_DIR)
+            )
+            object_cache_dir.mkdir(exist_ok=True, parents=True)
+            rw_volumes = {
+                **rw_volumes,
+                str(object_cache_dir): IN_DOCKER_OBJECT_CACHE_DIR,
+            }
+
+        ro_volumes = {}
+        if config.subparser == Modes.DEPS:
+            mirror_dir = getattr(config, DEPENDENCY_MIRROR_DIR_KEY, None)
+            if mirror_dir:
+                ro_volumes = {mirror_dir: IN_DOCKER_DEPS_MIRROR_DIR}
+            # Archives are accessed at the same paths as on the host.
+            for archive in (
+                getattr(config, "import_cache", None),
+                getattr(config, "export_cache", None),
+            ):
+                if archive and pathlib.Path(archive).is_absolute():
+                    archive_dir = str(pathlib.Path(archive).parent)
+                    rw_volumes = {**rw_volumes, archive_dir: archive_dir}
+
+        run_in_docker("python3", sys.argv, ro_volumes=ro_volumes, rw_volumes=rw_volumes)
 
     config = merge_args_and_config()
 
@@ -67,6 +101,43 @@ def host_main():
         forward_to_docker(config)
 
 
+def make_build_config(args: argparse.Namespace):
+    """Make the configuration of a build inside docker from cli arguments."""
+    # pylint: disable=import-outside-toplevel
+    from tools.build_system.build_config import BuildConfig
+    from tools.build_system.linker_selection import AUTO_LINKER, select_linker
+
+    return BuildConfig(
+        debug=args.debug,
+        compiler=args.compiler,
+        optimize=args.optimize,
+        cpp_standard=args.cpp_standard,
+        build_directory=pathlib.Path(IN_DOCKER_BUILD_DIR),
+        target_directory=args.target,
+        test=args.test,
+        thirdparty_dep_directory=pathlib.Path(IN_DOCKER_DEPS_DIR),
+        shared_objects=args.shared_objects,
+        force_build=args.force_build,
+        jobs=args.jobs,
+        link_jobs=args.link_jobs,
+        object_cache_directory=(
+            None if args.no_object_cache else pathlib.Path(IN_DOCKER_OBJECT_CACHE_DIR)
+        ),
+        object_cache_size=args.object_cache_size * 1024**2,
+        remote_cache_url=args.remote_cache,
+        remote_cache_mode=args.remote_cache_mode,
+        remote_cache_timeout=args.remote_cache_timeout,
+        distributed_workers=tuple(args.distribute),
+        pch_threshold=args.pch_threshold,
+        unity=args.unity,
+        unity_batch_size=args.unity_batch_size,
+        affected=args.affected,
+        linker=select_linker(
+            args.compiler, args.linker or read_config_value(LINKER_KEY) or AUTO_LINKER
+        ),
+    )
+
+
 def docker_main():
     """Run main function that is invoked inside docker container."""
     args = parse_args()
@@ -76,11 +147,30 @@ def docker_main():
 
     if args.subparser == Modes.DEPS:
         from tools.build_system.dependencies import Dependencies
-
-        dep_manager = Dependencies(pathlib.Path(IN_DOCKER_DEPS_DIR))
+        from tools.build_system.dependency_cache import DependencyCache
+        from tools.build_system.fancy import fancy_print
+
+        # The mirror directory of the host is mounted at a fixed path.
+        mirror_dir = None
+        if getattr(args, DEPENDENCY_MIRROR_DIR_KEY) or read_config_value(
+            DEPENDENCY_MIRROR_DIR_KEY
+        ):
+            mirror_dir = pathlib.Path(IN_DOCKER_DEPS_MIRROR_DIR)
+        dep_cache = DependencyCache(pathlib.Path(IN_DOCKER_OBJECT_CACHE_DIR))
+        if args.import_cache:
+            count = dep_cache.import_archive(pathlib.Path(args.import_cache))
+            fancy_print(f"Imported {count} dependency cache entries.")
+
+        dep_manager = Dependencies(
+            pathlib.Path(IN_DOCKER_DEPS_DIR), mirror_dir, dep_cache
+        )
         dep_manager.fetch()
         dep_manager.build()
 
+        if args.export_cache:
+            count = dep_cache.export_archive(pathlib.Path(args.export_cache))
+            fancy_print(f"Exported {count} dependency cache entries.")
+
     elif args.subparser == Modes.CODE_QUAL:
         # TODO: unify similar jobs under common commands, fix the import scheme.
         if args.clang_format:
@@ -115,28 +205,28 @@ def docker_main():
             raise ValueError(f"{Modes.CODE_QUAL} command needs a job as a parameter.")
 
     elif args.subparser == Modes.BUILD:
-        from tools.build_system.build_config import BuildConfig
         from tools.build_system.builder import Builder
 
-        config = BuildConfig(
-            debug=args.debug,
-            compiler=args.compiler,
-            optimize=args.optimize,
-            cpp_standard=args.cpp_standard,
-            build_directory=pathlib.Path(IN_DOCKER_BUILD_DIR),
-            target_directory=args.target,
-            test=args.test,
-            thirdparty_dep_directory=pathlib.Path(IN_DOCKER_DEPS_DIR),
-            force_build=args.force_build,
-        )
-
+        config = make_build_config(args)
         kioku_builder = Builder(config)
         kioku_builder.build()
 
         if config.test:
+            from tools.build_system.build_database import BuildDatabase
             from tools.build_system.test_and_debug_util import run_tests
 
-            sys.exit(run_tests(pathlib.Path(IN_DOCKER_BUILD_DIR) / Builder.TEST_DIR))
+            build_dir = pathlib.Path(IN_DOCKER_BUILD_DIR)
+            sys.exit(
+                run_tests(
+                    build_dir / Builder.TEST_DIR,
+                    workers=args.test_jobs,
+                    timeout=args.test_timeout,
+                    database=BuildDatabase(build_dir),
+                    runtime_directories=[build_dir / Builder.SO_DIR],
+                    rerun=args.rerun_tests,
+                    executables=kioku_builder.get_affected_test_paths(),
+                )
+            )
     elif args.subparser == Modes.DEBUG:
         from tools.build_system.builder import Builder
         from tools.build_system.test_and_debug_util import (
@@ -152,6 +242,38 @@ def docker_main():
         selected = choose_executable_to_debug(tests_and_binaries)
 
         run_in_debugger(selected)
+    elif args.subparser == Modes.BENCH_LINK:
+        import dataclasses
+
+        from tools.build_system.builder import Builder
+        from tools.build_system.fancy import MessageType, fancy_print
+        from tools.build_system.linker_selection import (
+            DEFAULT_LINKER,
+            benchmark_linkers,
+            find_available_linkers,
+        )
+
+        # Link the tests, with no linker selected, before timing each linker.
+        config = dataclasses.replace(make_build_config(args), test=True, linker=None)
+        kioku_builder = Builder(config)
+        kioku_builder.build()
+
+        linkers = [DEFAULT_LINKER, *find_available_linkers(config.compiler)]
+        timings = benchmark_linkers(
+            kioku_builder.get_link_commands(), linkers, args.repeat
+        )
+        for linker, elapsed in sorted(timings.items(), key=lambda item: item[1]):
+            fancy_print(f"{linker}: {elapsed:.3f}s", msg_type=MessageType.OTHER)
+        if not timings:
+            fancy_print("No linker could link the tests.", msg_type=MessageType.ERROR)
+            sys.exit(-1)
+
+        fastest = min(timings, key=timings.get)
+        write_config_value(LINKER_KEY, fastest)
+        fancy_print(
+            f"Saved {fastest} as the linker in the config.",
+            msg_type=MessageType.SUCCESS,
+        )
 
 
 def main():
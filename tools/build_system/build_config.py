@@ -1,6 +1,8 @@
 """Configuration module for C++ builds."""
+import os
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -15,6 +17,9 @@ class BuildConfig:
     target_directory: str = None
     test: bool = False
     thirdparty_dep_directory: Path = Path()
+    # Link modules as position independent shared objects rather than static
+    # libraries, so that changing a module does not relink its executables.
+    shared_objects: bool = False
 
     # kioku-TIL:
     #     Exclude an attribute from the list of equality
@@ -33,5 +38,47 @@ class BuildConfig:
     #     `force_build` in the comparison, rather we explicitly check
     #     for it in a separate condition.
     #
-    #     See `class CacheState` in `cache.py` for implementation.
+    #     See `class Cache` in `cache.py` for implementation.
     force_build: bool = field(default=False, compare=False)
+
+    # Number of concurrent compilation and linkage jobs. Like `force_build`,
+    # they have no effect on the build output and hence are excluded from the
+    # comparison. Linkage is limited separately, as it needs much more memory.
+    jobs: int = field(default=os.cpu_count() or 1, compare=False)
+    link_jobs: int = field(default=max(1, (os.cpu_count() or 1) // 4), compare=False)
+
+    # Content-addressed store of object files, shared by all build directories.
+    # Its keys cover everything that affects the objects, hence it is excluded
+    # from the comparison as well. Disabled if no directory is given.
+    object_cache_directory: Optional[Path] = field(default=None, compare=False)
+    object_cache_size: int = field(default=5 * 1024**3, compare=False)
+
+    # Remote cache of objects and executables, shared by multiple machines, see
+    # `remote_cache.py`. Disabled if no url is given.
+    remote_cache_url: Optional[str] = field(default=None, compare=False)
+    remote_cache_mode: str = field(default="ro", compare=False)
+    remote_cache_timeout: float = field(default=5.0, compare=False)
+
+    # Addresses of the worker agents to distribute compilation to, as
+    # `host[:port]`, see `distributed.py`. Compiles locally only if empty.
+    distributed_workers: Tuple[str, ...] = field(default=(), compare=False)
+
+    # Minimum number of targets including a header for it to be precompiled,
+    # see `precompiled_headers.py`. Disabled if 0. Precompiled headers do not
+    # change the objects, only the time it takes to compile them.
+    pch_threshold: int = field(default=10, compare=False)
+
+    # Compile the sources of each module in batches of up to `unity_batch_size`
+    # translation units, see `unity.py`. Sources that are compiled already are
+    # compiled on their own, hence it only affects the first or forced builds.
+    unity: bool = field(default=False, compare=False)
+    unity_batch_size: int = field(default=8, compare=False)
+
+    # Linker that the compiler driver links with through `-fuse-ld`, the
+    # default one if None, see `linker_selection.py`.
+    linker: Optional[str] = field(default=None, compare=False)
+
+    # Build and run only the tests affected by the changes since the previous
+    # build if empty, or by the changes of a git revision range, e.g.
+    # `main..HEAD`. All tests are built if None.
+    affected: Optional[str] = field(default=None, compare=False)
@@ -0,0 +1,390 @@
+"""Indexed on-disk database of the build state, backed by sqlite."""
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+from tools.build_system.typing import OptString, StringList
+
+# Bump the version whenever the schema below changes. Databases with another
+# version are discarded and created from scratch, as they only hold a cache.
+SCHEMA_VERSION = 8
+
+SCHEMA = (
+    """
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE targets (
+        name TEXT PRIMARY KEY,
+        source_file TEXT NOT NULL,
+        source_checksum TEXT NOT NULL,
+        source_type TEXT NOT NULL,
+        include_checksums TEXT NOT NULL,
+        own_header TEXT,
+        internal_headers TEXT NOT NULL,
+        external_headers TEXT NOT NULL,
+        linked INTEGER NOT NULL DEFAULT 0,
+        dependencies TEXT,
+        objfile TEXT
+    )
+    """,
+    "CREATE INDEX targets_by_source_checksum ON targets (source_checksum)",
+    """
+    CREATE TABLE file_checksums (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        inode INTEGER NOT NULL,
+        checksum TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE header_closures (
+        header TEXT PRIMARY KEY,
+        checksum TEXT NOT NULL,
+        direct TEXT NOT NULL,
+        closure TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE precompiled_headers (
+        name TEXT PRIMARY KEY,
+        dependencies TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE libraries (
+        name TEXT PRIMARY KEY,
+        objfiles TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE passed_tests (
+        name TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        inputs TEXT NOT NULL
+    )
+    """,
+)
+
+
+@dataclass(frozen=True)
+class TargetRecord:
+    """Database row of a target, as of its last successful compilation."""
+
+    name: str
+    source_file: str
+    source_checksum: str
+    source_type: str
+    include_checksums: FrozenSet[str]
+    own_header: OptString
+    internal_headers: Tuple[str, ...]
+    external_headers: Tuple[str, ...]
+
+
+FileChecksumRow = Tuple[str, int, int, int, str]
+FileChecksums = Dict[str, str]
+HeaderClosureRow = Tuple[str, str, FrozenSet[str], FrozenSet[str]]
+
+
+def _dump_set(values: Iterable[str]) -> str:
+    return json.dumps(sorted(values))
+
+
+def _load_set(value: str) -> FrozenSet[str]:
+    return frozenset(json.loads(value))
+
+
+class BuildDatabase:
+    """Build state, stored in a sqlite database in the build directory.
+
+    Each target, file checksum and header closure is a row indexed by its name,
+    so that lookups do not depend on the number of rows and only the rows that
+    changed are written.
+    """
+
+    FILE_NAME = "kioku_build.db"
+
+    def __init__(self, build_directory: Path):
+        """Create an instance, creating the database file if necessary."""
+        build_directory.mkdir(exist_ok=True, parents=True)
+        self._path = build_directory / BuildDatabase.FILE_NAME
+        self._connection = sqlite3.connect(str(self._path))
+        self._in_transaction = False
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._ensure_schema()
+
+    @property
+    def path(self) -> Path:
+        """Get the path to the database file."""
+        return self._path
+
+    def close(self):
+        """Close the connection to the database."""
+        self._connection.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group writes, committing them together or rolling them back on error.
+
+        Nested transactions are merged into the outermost one.
+        """
+        if self._in_transaction:
+            yield self._connection
+            return
+
+        self._in_transaction = True
+        try:
+            with self._connection:
+                yield self._connection
+        finally:
+            self._in_transaction = False
+
+    def get_meta(self, key: str) -> OptString:
+        """Get a metadata value."""
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        """Set a metadata value."""
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def get_targets(self) -> Dict[str, TargetRecord]:
+        """Get all target records, keyed by target name."""
+        rows = self._connection.execute(
+            "SELECT name, source_file, source_checksum, source_type, include_checksums,"
+            " own_header, internal_headers, external_headers FROM targets"
+        )
+        return {
+            row[0]: TargetRecord(
+                name=row[0],
+                source_file=row[1],
+                source_checksum=row[2],
+                source_type=row[3],
+                include_checksums=_load_set(row[4]),
+                own_header=row[5],
+                internal_headers=tuple(json.loads(row[6])),
+                external_headers=tuple(json.loads(row[7])),
+            )
+            for row in rows
+        }
+
+    def get_source_types(self) -> Dict[str, str]:
+        """Get names of the source types of all targets, keyed by source checksum."""
+        return dict(
+            self._connection.execute("SELECT source_checksum, source_type FROM targets")
+        )
+
+    def put_targets(self, records: Iterable[TargetRecord]):
+        """Insert or update target records, keeping their linkage and dependencies."""
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT INTO targets (name, source_file, source_checksum, source_type,"
+                " include_checksums, own_header, internal_headers, external_headers)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET"
+                " source_file = excluded.source_file,"
+                " source_checksum = excluded.source_checksum,"
+                " source_type = excluded.source_type,"
+                " include_checksums = excluded.include_checksums,"
+                " own_header = excluded.own_header,"
+                " internal_headers = excluded.internal_headers,"
+                " external_headers = excluded.external_headers",
+                [
+                    (
+                        record.name,
+                        record.source_file,
+                        record.source_checksum,
+                        record.source_type,
+                        _dump_set(record.include_checksums),
+                        record.own_header,
+                        json.dumps(list(record.internal_headers)),
+                        json.dumps(list(record.external_headers)),
+                    )
+                    for record in records
+                ],
+            )
+
+    def get_unlinked_target_names(self) -> FrozenSet[str]:
+        """Get names of the targets that are not linked since their last compilation."""
+        rows = self._connection.execute("SELECT name FROM targets WHERE linked = 0")
+        return frozenset(row[0] for row in rows)
+
+    def set_linked(self, name: str, linked: bool):
+        """Set the linkage status of a target."""
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE targets SET linked = ? WHERE name = ?", (int(linked), name)
+            )
+
+    def get_target_dependencies(self) -> Dict[str, FileChecksums]:
+        """Get checksums of the files that each target depended on when compiled.
+
+        Targets whose dependencies are not recorded are omitted.
+        """
+        rows = self._connection.execute(
+            "SELECT name, dependencies FROM targets WHERE dependencies IS NOT NULL"
+        )
+        return {name: json.loads(dependencies) for name, dependencies in rows}
+
+    def set_target_dependencies(self, name: str, dependencies: FileChecksums):
+        """Set checksums of the files that a target depended on when compiled."""
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE targets SET dependencies = ? WHERE name = ?",
+                (json.dumps(dependencies, sort_keys=True), name),
+            )
+
+    def get_target_objfiles(self) -> Dict[str, str]:
+        """Get the object files that targets are compiled into, if shared.
+
+        Targets compiled into their own object file are omitted.
+        """
+        rows = self._connection.execute(
+            "SELECT name, objfile FROM targets WHERE objfile IS NOT NULL"
+        )
+        return dict(rows)
+
+    def set_target_objfile(self, name: str, objfile: OptString):
+        """Set the object file that a target is compiled into, None if its own."""
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE targets SET objfile = ? WHERE name = ?", (objfile, name)
+            )
+
+    def delete_targets(self, names: Iterable[str]):
+        """Delete target records by name."""
+        with self.transaction() as connection:
+            connection.executemany(
+                "DELETE FROM targets WHERE name = ?", [(name,) for name in names]
+            )
+
+    def clear_targets(self):
+        """Delete all target records."""
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM targets")
+
+    def get_file_checksums(self) -> Dict[str, FileChecksumRow]:
+        """Get all file checksum rows, keyed by path."""
+        rows = self._connection.execute(
+            "SELECT path, mtime_ns, size, inode, checksum FROM file_checksums"
+        )
+        return {row[0]: row for row in rows}
+
+    def put_file_checksums(self, rows: Iterable[FileChecksumRow]):
+        """Insert or replace file checksum rows."""
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO file_checksums VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def get_header_closures(self) -> Dict[str, HeaderClosureRow]:
+        """Get all header closure rows, keyed by header."""
+        rows = self._connection.execute(
+            "SELECT header, checksum, direct, closure FROM header_closures"
+        )
+        return {
+            row[0]: (row[0], row[1], _load_set(row[2]), _load_set(row[3]))
+            for row in rows
+        }
+
+    def clear_header_closures(self):
+        """Delete all header closure rows."""
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM header_closures")
+
+    def put_header_closures(self, rows: Iterable[HeaderClosureRow]):
+        """Insert or replace header closure rows."""
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO header_closures VALUES (?, ?, ?, ?)",
+                [
+                    (header, checksum, _dump_set(direct), _dump_set(closure))
+                    for header, checksum, direct, closure in rows
+                ],
+            )
+
+    def get_precompiled_header_dependencies(self, name: str) -> Optional[FileChecksums]:
+        """Get checksums of the files that a precompiled header was compiled from."""
+        row = self._connection.execute(
+            "SELECT dependencies FROM precompiled_headers WHERE name = ?", (name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_precompiled_header_dependencies(
+        self, name: str, dependencies: FileChecksums
+    ):
+        """Set checksums of the files that a precompiled header was compiled from."""
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO precompiled_headers VALUES (?, ?)",
+                (name, json.dumps(dependencies, sort_keys=True)),
+            )
+
+    def get_library_objfiles(self) -> Dict[str, Tuple[str, ...]]:
+        """Get the object files that each library was built from."""
+        rows = self._connection.execute("SELECT name, objfiles FROM libraries")
+        return {name: tuple(json.loads(objfiles)) for name, objfiles in rows}
+
+    def set_library_objfiles(self, name: str, objfiles: Iterable[str]):
+        """Set the object files that a library was built from."""
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO libraries VALUES (?, ?)",
+                (name, json.dumps(list(objfiles))),
+            )
+
+    def delete_library(self, name: str):
+        """Forget a library, until it is built again."""
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM libraries WHERE name = ?", (name,))
+
+    def get_passed_tests(self) -> Dict[str, Tuple[StringList, FileChecksums]]:
+        """Get the commands and the checksums of the inputs of passed tests."""
+        rows = self._connection.execute(
+            "SELECT name, command, inputs FROM passed_tests"
+        )
+        return {
+            name: (json.loads(command), json.loads(inputs))
+            for name, command, inputs in rows
+        }
+
+    def set_test_passed(self, name: str, command: StringList, inputs: FileChecksums):
+        """Record that a test passed, run by a command with inputs of checksums."""
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO passed_tests VALUES (?, ?, ?)",
+                (name, json.dumps(command), json.dumps(inputs, sort_keys=True)),
+            )
+
+    def delete_passed_test(self, name: str):
+        """Forget that a test passed, until it passes again."""
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM passed_tests WHERE name = ?", (name,))
+
+    def _ensure_schema(self):
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+
+        with self.transaction() as connection:
+            tables = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()
+            for (table,) in tables:
+                connection.execute(f"DROP TABLE {table}")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
@@ -1,21 +1,36 @@
 """C++ program builder module."""
+import sys
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
 from tools.build_system.build_config import BuildConfig
+from tools.build_system.build_database import BuildDatabase, FileChecksums
 from tools.build_system.cache import Cache
+from tools.build_system.code_util import get_changed_files, parse_depfile
 from tools.build_system.dependencies import Dependencies
-from tools.build_system.fancy import (
-    MessageType,
-    fancy_print,
-    fancy_run,
-    fancy_separator,
+from tools.build_system.distributed import DistributedCompiler
+from tools.build_system.fancy import MessageType, fancy_print
+from tools.build_system.linker_selection import make_linker_flags
+from tools.build_system.object_cache import ObjectCache
+from tools.build_system.parallel import (
+    Job,
+    JobKey,
+    JobResult,
+    report_failures,
+    run_jobs,
+)
+from tools.build_system.precompiled_headers import HeaderSet, PrecompiledHeaders
+from tools.build_system.remote_cache import RemoteCache
+from tools.build_system.target import (
+    ModuleLibrary,
+    SourceType,
+    Target,
+    TargetExploration,
 )
-from tools.build_system.target import SourceType, Target, TargetExploration
 from tools.build_system.typing import StringList
+from tools.build_system.unity import UnityBatch, UnityBuild
 
 # todo,
-# parallel build
 # in-line log formatting (\r\n)
 
 
@@ -23,10 +38,11 @@ class Builder:
     """C++ program builder."""
 
     BIN_DIR = "bin"
+    LIB_DIR = "lib"
     OBJ_DIR = "obj"
     SO_DIR = "so"
     TEST_DIR = "test"
-    BUILD_DIR = [BIN_DIR, OBJ_DIR, SO_DIR, TEST_DIR]
+    BUILD_DIR = [BIN_DIR, LIB_DIR, OBJ_DIR, SO_DIR, TEST_DIR]
 
     def __init__(self, config: BuildConfig):
         """Create an instance."""
@@ -35,20 +51,441 @@ class Builder:
         # Prepare third party dependencies for compiler and linker.
         deps = Dependencies(config.thirdparty_dep_directory)
 
+        # Open the state of previous builds, so that unchanged files are not
+        # hashed, parsed or classified again.
+        self._database = BuildDatabase(config.build_directory)
+
         # Explore targets from current state of the repo.
-        target_explorer = TargetExploration(config)
+        target_explorer = TargetExploration(config, self._database)
         self._targets = target_explorer.scan_targets()
+        self._targets_by_name = {str(target.name): target for target in self._targets}
+
+        # Targets compiled in unity batches share their object files, see
+        # `unity.py`. These are as of the previous build.
+        recorded_objfiles = self._database.get_target_objfiles()
+
+        # Compare with the previous build to extract a build list. Executables
+        # whose linkage has not succeeded since their compilation are relinked.
+        self._cache = Cache(config, self._database)
+        self._changelist = self._cache.get_target_changelist(self._targets)
+        self._unlinked = [
+            target
+            for target in self._cache.get_unlinked_targets(self._targets)
+            if target not in self._changelist
+        ]
+
+        # Unity batches are compiled only from targets that are not compiled
+        # yet, and from targets whose batch is outdated by another target.
+        self._unity = (
+            UnityBuild(config.build_directory, config.unity_batch_size)
+            if config.unity
+            else None
+        )
+        self._unity_batches: Dict[str, UnityBatch] = {}
+        self._compiled_names = (
+            set() if config.force_build else set(self._database.get_targets())
+        )
+        self._rebatched = self._find_rebatched_targets(recorded_objfiles)
+
+        # Object files compiled by any build directory with the same inputs.
+        self._object_cache = (
+            ObjectCache(config.object_cache_directory, config.object_cache_size)
+            if config.object_cache_directory
+            else None
+        )
+
+        # Objects and executables built by other machines with the same inputs.
+        self._remote_cache = (
+            RemoteCache(
+                config.remote_cache_url,
+                config.remote_cache_mode,
+                config.remote_cache_timeout,
+            )
+            if config.remote_cache_url
+            else None
+        )
+
+        # Workers to offload compilation to, in addition to the local jobs.
+        self._distributed_compiler = (
+            DistributedCompiler(list(config.distributed_workers), config.jobs)
+            if config.distributed_workers
+            else None
+        )
 
-        # Read and update the cache, then compare with current targets to extract a build list.
-        self._changelist = Cache(config).get_target_changelist(self._targets)
+        # Content hashes of the compilations and executables, keyed by target
+        # name, and the checksums of the files that the compilations read.
+        self._object_keys: Dict[str, str] = {}
+        self._executable_keys: Dict[str, str] = {}
+        self._recorded_dependencies: Dict[str, FileChecksums] = {}
 
-        self._compiler = Compiler(config, deps)
-        self._linker = Linker(config, deps)
+        self._config = config
+        # Headers included by many targets are compiled once for all of them.
+        self._compiler = Compiler(
+            config,
+            deps,
+            PrecompiledHeaders(
+                config.build_directory, self._database, config.pch_threshold
+            ),
+        )
+        self._compiler.assign_precompiled_headers(self._targets)
+        self._compiler.restore_shared_objfiles(recorded_objfiles)
+        # Module sources are linked from static libraries, or shared objects.
+        self._libraries = LibraryBuilder(config, self._compiler, self._database)
+        self._libraries.assign_libraries(
+            TargetExploration.scan_shared_object_libs(self._targets)
+            if config.shared_objects
+            else TargetExploration.scan_static_libs(self._targets)
+        )
+        self._linker = Linker(config, deps, self._compiler, self._libraries)
+
+        # Tests that are not affected by the changes are neither built nor run.
+        self._affected_tests: Optional[List[Target]] = None
+        self._outdated_tests: List[Target] = []
+        if config.affected is not None:
+            self._select_affected_tests(config.affected)
 
     def build(self):
-        """Build C++ programs and libraries based on requested config."""
-        self._compiler.build_translation_units(self._changelist)
-        self._linker.link_translation_units(self._changelist)
+        """Build C++ programs and libraries based on requested config.
+
+        Compilation and linkage jobs are scheduled together as a dependency
+        graph, so that an executable is linked as soon as its own object files
+        are compiled, without waiting for the rest of the changelist.
+
+        The outcome of each job is committed to the cache as soon as the job
+        finishes, so that only failed or interrupted targets are built again.
+        Object files found in the object cache, and executables found in the
+        remote cache, are not built at all.
+        """
+        self._cache.invalidate([*self._changelist, *self._rebatched])
+
+        compiled_targets = [*self._changelist, *self._rebatched]
+        compile_jobs = self._compiler.make_jobs(compiled_targets)
+        compile_jobs = self._fetch_cached_objects(compile_jobs)
+        compile_jobs = self._batch_compile_jobs(compile_jobs)
+        link_jobs = self._linker.make_jobs(
+            [*self._changelist, *self._unlinked], self._targets, compiled_targets
+        )
+        # Executables relinked for the changes of others are relinked again
+        # if interrupted.
+        self._cache.invalidate_linkage(
+            [
+                *(self._targets_by_name[job.name] for job in link_jobs),
+                *self._outdated_tests,
+            ]
+        )
+        jobs = [
+            *self._compiler.make_precompiled_header_jobs(compile_jobs),
+            *compile_jobs,
+            *self._libraries.make_jobs(compiled_targets),
+            *self._fetch_cached_executables(link_jobs),
+        ]
+        pool_sizes = {
+            Compiler.PCH_POOL: self._config.jobs,
+            Compiler.POOL: self._config.jobs,
+            LibraryBuilder.POOL: self._config.jobs,
+            Linker.POOL: self._config.link_jobs,
+        }
+        runners = {}
+        if self._distributed_compiler:
+            pool_sizes[Compiler.POOL] += self._distributed_compiler.capacity
+            runners[Compiler.POOL] = self._distributed_compiler.run_job
+
+        failures = run_jobs(
+            jobs, pool_sizes, on_result=self._record_job_result, runners=runners
+        )
+        if self._object_cache:
+            self._object_cache.evict()
+        if self._remote_cache:
+            self._remote_cache.close()
+        if failures:
+            report_failures(failures, "Build failed for the following targets:")
+            sys.exit(-1)
+
+        fancy_print(
+            "All targets are up-to-date.",
+            msg_type=MessageType.SUCCESS,
+            flash=True,
+        )
+
+    def get_link_commands(self) -> List[StringList]:
+        """Get the commands that link all the executables, once they are built."""
+        jobs = self._linker.make_jobs(self._targets, self._targets, [])
+        return [job.cmd for job in jobs]
+
+    def get_affected_test_paths(self) -> Optional[List[Path]]:
+        """Get the paths of the affected test executables, None if all are built."""
+        if self._affected_tests is None:
+            return None
+        return [
+            self._linker.make_executable_path(target) for target in self._affected_tests
+        ]
+
+    def _select_affected_tests(self, revisions: str):
+        """Drop the tests that neither changed nor link or load a changed target.
+
+        The changes are those of a git revision range, or of the change list if
+        `revisions` is empty. Targets change with any header in their closure.
+        """
+        if revisions:
+            changed_targets = TargetExploration.find_changed_targets(
+                self._targets, get_changed_files(revisions)
+            )
+        else:
+            changed_targets = [*self._changelist, *self._unlinked]
+
+        # Unaffected tests that link compiled targets are not relinked now, so
+        # their linkage is invalidated for the build that selects them again.
+        self._affected_tests, self._outdated_tests = self._linker.select_affected_tests(
+            changed_targets, [*self._changelist, *self._rebatched], self._targets
+        )
+        fancy_print(f"{len(self._affected_tests)} tests are affected by the changes.")
+
+        affected_names = {str(target.name) for target in self._affected_tests}
+
+        def is_selected(target: Target) -> bool:
+            return (
+                target.source_type != SourceType.TEST
+                or str(target.name) in affected_names
+            )
+
+        self._targets = list(filter(is_selected, self._targets))
+        self._changelist = list(filter(is_selected, self._changelist))
+        self._unlinked = list(filter(is_selected, self._unlinked))
+
+    def _find_rebatched_targets(
+        self, recorded_objfiles: Dict[str, str]
+    ) -> List[Target]:
+        """Find unchanged targets whose unity batch holds a changed or removed target.
+
+        The object file of such a batch is outdated, so they are compiled again.
+        """
+        changed_names = {str(target.name) for target in self._changelist}
+        outdated_objfiles = {
+            objfile
+            for name, objfile in recorded_objfiles.items()
+            if name in changed_names or name not in self._targets_by_name
+        }
+        return [
+            target
+            for target in self._targets
+            if str(target.name) not in changed_names
+            and recorded_objfiles.get(str(target.name)) in outdated_objfiles
+        ]
+
+    def _batch_compile_jobs(self, compile_jobs: List[Job]) -> List[Job]:
+        """Replace compile jobs with unity batches, if requested.
+
+        Targets that are compiled already are compiled on their own, so that
+        editing a source file does not compile its whole batch again.
+        """
+        if not self._unity:
+            return compile_jobs
+
+        rebatched_names = {str(target.name) for target in self._rebatched}
+        batches = self._unity.make_batches(
+            [
+                self._targets_by_name[job.name]
+                for job in compile_jobs
+                if job.name not in self._compiled_names or job.name in rebatched_names
+            ]
+        )
+        self._unity_batches = {batch.name: batch for batch in batches}
+        batched_names = {
+            str(target.name) for batch in batches for target in batch.targets
+        }
+        return [
+            *self._compiler.make_unity_jobs(batches),
+            *(job for job in compile_jobs if job.name not in batched_names),
+        ]
+
+    def _fetch_cached_objects(self, compile_jobs: List[Job]) -> List[Job]:
+        """Place cached object files in the build directory, return remaining jobs.
+
+        Object files are looked up in the local object cache first, then in the
+        remote cache. A remote object file is used only if the files that its
+        manifest lists still have the same checksums.
+        """
+        if not self._object_cache and not self._remote_cache:
+            return compile_jobs
+
+        remaining_jobs = []
+        for job in compile_jobs:
+            target = self._targets_by_name[job.name]
+            key = self._object_key(target)
+            objfile = self._compiler.make_objfile_path(target)
+            dependencies = (
+                self._object_cache.fetch(key, objfile) if self._object_cache else None
+            )
+            if dependencies is not None:
+                self._cache.record_compiled(target, dependencies)
+                continue
+
+            # The previous object file may be shared with the object cache
+            # through a hard link, it must not be overwritten in place.
+            if objfile.exists():
+                objfile.unlink()
+            remaining_jobs.append(job)
+
+        local_count = len(compile_jobs) - len(remaining_jobs)
+        remote_count = 0
+        if self._remote_cache and remaining_jobs:
+            manifests = self._remote_cache.get_all(
+                RemoteCache.MANIFESTS,
+                {
+                    self._object_key(self._targets_by_name[job.name])
+                    for job in remaining_jobs
+                },
+            )
+            # Object files are looked up by the checksums of their manifests.
+            objfile_keys: Dict[str, Tuple[str, StringList]] = {}
+            objfiles = {}
+            for job in remaining_jobs:
+                target = self._targets_by_name[job.name]
+                key = self._object_key(target)
+                dependencies = ObjectCache.read_manifest(manifests.get(key, b""))
+                if dependencies is not None:
+                    objfile_key = ObjectCache.make_object_key(key, dependencies)
+                    objfile_keys[job.name] = (objfile_key, list(dependencies))
+                    objfiles[objfile_key] = self._compiler.make_objfile_path(target)
+            fetched_keys = self._remote_cache.fetch_all(RemoteCache.OBJECTS, objfiles)
+            remote_count = len(fetched_keys)
+
+            missed_jobs, remaining_jobs = remaining_jobs, []
+            for job in missed_jobs:
+                objfile_key, dependencies = objfile_keys.get(job.name, ("", []))
+                if objfile_key not in fetched_keys:
+                    remaining_jobs.append(job)
+                    continue
+                target = self._targets_by_name[job.name]
+                self._cache.record_compiled(target, dependencies)
+                if self._object_cache:
+                    self._object_cache.store(
+                        self._object_key(target), objfiles[objfile_key], dependencies
+                    )
+
+        if local_count or remote_count:
+            fancy_print(
+                f"Fetched {local_count} object file(s) from the object cache and"
+                f" {remote_count} from the remote cache.",
+                msg_type=MessageType.OTHER,
+            )
+        return remaining_jobs
+
+    def _fetch_cached_executables(self, link_jobs: List[Job]) -> List[Job]:
+        """Download executables from the remote cache, return remaining jobs.
+
+        Only executables whose object files are all known by their content,
+        i.e. compiled before or fetched from a cache, are looked up.
+        """
+        if not self._remote_cache or not link_jobs:
+            return link_jobs
+
+        # Unchanged targets and fetched ones, the others are about to be compiled.
+        self._recorded_dependencies = self._database.get_target_dependencies()
+        executables = {}
+        for job in link_jobs:
+            key = self._executable_key(job)
+            if key:
+                executables[key] = self._linker.make_executable_path(
+                    self._targets_by_name[job.name]
+                )
+        fetched_keys = self._remote_cache.fetch_all(
+            RemoteCache.EXECUTABLES, executables
+        )
+
+        remaining_jobs = []
+        for job in link_jobs:
+            key = self._executable_key(job)
+            if key in fetched_keys:
+                executables[key].chmod(0o755)
+                self._cache.record_linked(self._targets_by_name[job.name])
+            else:
+                remaining_jobs.append(job)
+
+        if fetched_keys:
+            fancy_print(
+                f"Fetched {len(fetched_keys)} executable(s) from the remote cache.",
+                msg_type=MessageType.OTHER,
+            )
+        return remaining_jobs
+
+    def _object_key(self, target: Target) -> str:
+        name = str(target.name)
+        if name not in self._object_keys:
+            self._object_keys[name] = ObjectCache.make_key(
+                target, self._compiler.make_command(target)
+            )
+        return self._object_keys[name]
+
+    def _executable_key(self, link_job: Job) -> Optional[str]:
+        """Get the key of an executable, None while an object file is unknown."""
+        if link_job.name not in self._executable_keys:
+            object_keys = []
+            for target in self._linker.get_linked_targets(link_job.name):
+                dependencies = self._recorded_dependencies.get(str(target.name))
+                if dependencies is None:
+                    return None
+                object_keys.append(
+                    ObjectCache.make_object_key(self._object_key(target), dependencies)
+                )
+            self._executable_keys[link_job.name] = ObjectCache.make_executable_key(
+                object_keys, link_job.cmd
+            )
+        return self._executable_keys[link_job.name]
+
+    def _record_job_result(self, job_result: JobResult):
+        if not job_result.success:
+            # Failed targets are already invalidated, nothing to record.
+            return
+
+        if job_result.job.pool == Compiler.PCH_POOL:
+            self._compiler.record_precompiled_header(job_result.job.name)
+            return
+        if job_result.job.pool == LibraryBuilder.POOL:
+            self._libraries.record_built(job_result.job.name)
+            return
+
+        batch = self._unity_batches.get(job_result.job.name)
+        if batch:
+            objfile = self._compiler.make_unity_objfile_path(batch)
+            with self._database.transaction():
+                for target in batch.targets:
+                    checksums = self._cache.record_compiled(target, objfile=objfile)
+                    self._recorded_dependencies[str(target.name)] = checksums
+            return
+
+        target = self._targets_by_name[job_result.job.name]
+        if job_result.job.pool == Compiler.POOL:
+            dependencies = self._compiler.read_dependencies(target)
+            checksums = self._cache.record_compiled(target, dependencies)
+            self._recorded_dependencies[str(target.name)] = checksums
+            if dependencies is None:
+                # Without a depfile, the object file cannot be shared.
+                return
+            key = self._object_key(target)
+            objfile = self._compiler.make_objfile_path(target)
+            if self._object_cache:
+                self._object_cache.store(key, objfile, dependencies)
+            if self._remote_cache:
+                self._remote_cache.upload(
+                    RemoteCache.OBJECTS,
+                    ObjectCache.make_object_key(key, checksums),
+                    objfile,
+                )
+                self._remote_cache.upload_content(
+                    RemoteCache.MANIFESTS, key, ObjectCache.make_manifest(checksums)
+                )
+        elif job_result.job.pool == Linker.POOL:
+            self._cache.record_linked(target)
+            if not self._remote_cache:
+                return
+            key = self._executable_key(job_result.job)
+            if key:
+                self._remote_cache.upload(
+                    RemoteCache.EXECUTABLES,
+                    key,
+                    self._linker.make_executable_path(target),
+                )
 
     @staticmethod
     def _create_build_dir(config: BuildConfig):
@@ -65,66 +502,271 @@ class Compiler:
 
     # pylint: disable=too-few-public-methods
 
-    def __init__(self, config: BuildConfig, deps: Dependencies):
+    POOL = "compile"
+    PCH_POOL = "pch"
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        deps: Dependencies,
+        precompiled_headers: Optional[PrecompiledHeaders] = None,
+    ):
         """Create an instance."""
         self._config = config
         self._deps = deps
+        self._precompiled_headers = precompiled_headers
+        self._pch_headers: Dict[str, HeaderSet] = {}
+        # Object files of unity batches, keyed by the names of their targets.
+        self._shared_objfiles: Dict[str, Path] = {}
+        # Names of the targets of each object file of a unity batch, as an
+        # index of the above, built when needed.
+        self._objfile_sharers: Optional[Dict[Path, StringList]] = None
+        self._pch_includepaths: Dict[HeaderSet, StringList] = {}
 
-    def build_translation_units(self, changelist: List[Target], parallel: bool = False):
-        """Build all translation units provided in the change list."""
-        target_list = (
+    def assign_precompiled_headers(self, targets: List[Target]):
+        """Decide on the precompiled headers to compile the targets with."""
+        if not self._precompiled_headers:
+            return
+
+        self._pch_headers = self._precompiled_headers.assign(targets)
+        # Any target including all the headers of a precompiled header has the
+        # include paths that are needed to compile it.
+        for target in sorted(targets, key=lambda t: str(t.name)):
+            headers = self._pch_headers.get(str(target.name))
+            if headers and headers not in self._pch_includepaths:
+                self._pch_includepaths[headers] = self._query_all_includepaths(target)
+
+    def make_precompiled_header_jobs(self, compile_jobs: List[Job]) -> List[Job]:
+        """Make jobs for the outdated precompiled headers used by compile jobs."""
+        jobs = []
+        used_headers = {self._pch_headers.get(job.name) for job in compile_jobs}
+        for headers in sorted(filter(None, used_headers)):
+            name = self._pch_name(headers)
+            if not self._precompiled_headers.prepare(
+                name, headers, self._config.compiler
+            ):
+                continue
+            jobs.append(
+                Job(
+                    name=name,
+                    cmd=[
+                        self._config.compiler,
+                        "-o",
+                        str(
+                            self._precompiled_headers.make_output_path(
+                                name, self._config.compiler
+                            )
+                        ),
+                        "-x",
+                        "c++-header",
+                        "-MMD",
+                        "-MF",
+                        str(self._precompiled_headers.make_depfile_path(name)),
+                        *self._assemble_codegen_flags(),
+                        *self._pch_includepaths[headers],
+                        str(self._precompiled_headers.make_header_path(name)),
+                    ],
+                    error_message=f"Precompilation of headers {name} failed.",
+                    pool=Compiler.PCH_POOL,
+                )
+            )
+        return jobs
+
+    def record_precompiled_header(self, name: str):
+        """Record a successful compilation of a precompiled header."""
+        self._precompiled_headers.record(name)
+
+    def restore_shared_objfiles(self, objfiles: Dict[str, str]):
+        """Restore the object files that targets share since a previous build."""
+        self._shared_objfiles = {
+            name: Path(objfile) for name, objfile in objfiles.items()
+        }
+        self._objfile_sharers = None
+
+    def job_key(self, target: Target) -> JobKey:
+        """Get the key of the job that compiles the object file of a target."""
+        objfile = self._shared_objfiles.get(str(target.name))
+        return (Compiler.POOL, objfile.stem if objfile else str(target.name))
+
+    def make_jobs(self, changelist: List[Target]) -> List[Job]:
+        """Make compilation jobs for all translation units in the change list."""
+        target_list = list(
             changelist
             if self._config.test
             else filter(lambda x: not x.source_type == SourceType.TEST, changelist)
         )
 
         for target in target_list:
-            self._compile_target(target)
+            self._shared_objfiles.pop(str(target.name), None)
+        self._objfile_sharers = None
+        return [self._make_compile_job(target) for target in target_list]
 
-        fancy_print(
-            "All compilation targets are up-to-date.",
-            msg_type=MessageType.SUCCESS,
-            flash=True,
+    def make_unity_jobs(self, batches: List[UnityBatch]) -> List[Job]:
+        """Make jobs compiling each batch of targets into a single object file.
+
+        The targets of the batches must not be compiled by other jobs.
+        """
+        jobs = []
+        for batch in batches:
+            objfile = self.make_unity_objfile_path(batch)
+            for target in batch.targets:
+                self._shared_objfiles[str(target.name)] = objfile
+            self._objfile_sharers = None
+            jobs.append(
+                Job(
+                    name=batch.name,
+                    cmd=self._assemble_unity_compile_command(batch),
+                    error_message=f"Compilation of unity batch {batch.name} failed.",
+                    pool=Compiler.POOL,
+                )
+            )
+        return jobs
+
+    def get_objfile_sharers(self, target: Target) -> StringList:
+        """Get the names of the other targets in the object file of a target."""
+        objfile = self._shared_objfiles.get(str(target.name))
+        if objfile is None:
+            return []
+        if self._objfile_sharers is None:
+            self._objfile_sharers = {}
+            for name, shared_objfile in self._shared_objfiles.items():
+                self._objfile_sharers.setdefault(shared_objfile, []).append(name)
+        return [
+            name for name in self._objfile_sharers[objfile] if name != str(target.name)
+        ]
+
+    def make_objfile_path(self, target: Target) -> Path:
+        """Make the path of the object file compiled from a target alone."""
+        return target.make_objfile_path(self._config.build_directory / Builder.OBJ_DIR)
+
+    def make_unity_objfile_path(self, batch: UnityBatch) -> Path:
+        """Make the path of the object file compiled from a unity batch."""
+        return self._config.build_directory / Builder.OBJ_DIR / f"{batch.name}.o"
+
+    def make_linked_objfile_path(self, target: Target) -> Path:
+        """Make the path of the object file to link a target from.
+
+        It is the object file of a unity batch if the target was compiled in one.
+        """
+        return self._shared_objfiles.get(
+            str(target.name), self.make_objfile_path(target)
         )
 
-    def _compile_target(self, target: Target):
-        compile_cmd = self._assemble_compile_command(target)
-        fancy_separator()
-        # todo: invalidate cache entry for this target, if compilation fails.
-        fancy_run(compile_cmd, f"Compilation of target {target.name} failed.")
+    def make_depfile_path(self, target: Target) -> Path:
+        """Make the path of the depfile that lists the files read by a compilation."""
+        return self.make_objfile_path(target).with_suffix(".d")
 
-    def _assemble_compile_command(self, target: Target) -> StringList:
-        includepaths = self._query_all_includepaths(target)
+    def read_dependencies(self, target: Target) -> Optional[StringList]:
+        """Read the files that the last compilation of a target depended on."""
+        try:
+            dependencies = parse_depfile(self.make_depfile_path(target))
+        except FileNotFoundError:
+            return None
 
+        # Files read through a precompiled header are not listed by compilers.
+        headers = self._pch_headers.get(str(target.name))
+        if headers:
+            dependencies += self._precompiled_headers.dependencies(
+                self._pch_name(headers)
+            )
+        return dependencies
+
+    def make_command(self, target: Target) -> StringList:
+        """Make the command line to compile a target."""
+        return self._assemble_compile_command(target)
+
+    def _make_compile_job(self, target: Target) -> Job:
+        headers = self._pch_headers.get(str(target.name))
+        return Job(
+            name=str(target.name),
+            cmd=self.make_command(target),
+            error_message=f"Compilation of target {target.name} failed.",
+            pool=Compiler.POOL,
+            dependencies=(
+                ((Compiler.PCH_POOL, self._pch_name(headers)),) if headers else ()
+            ),
+        )
+
+    def _assemble_unity_compile_command(self, batch: UnityBatch) -> StringList:
+        # Each target of the batch is recorded with its included headers, as
+        # a depfile of the batch would not tell which target read which file.
+        includepaths = sorted(
+            {
+                includepath
+                for target in batch.targets
+                for includepath in self._query_all_includepaths(target)
+            }
+        )
+        return [
+            self._config.compiler,
+            "-o",
+            str(self.make_unity_objfile_path(batch)),
+            "-c",
+            *self._assemble_codegen_flags(),
+            *includepaths,
+            str(batch.source_file),
+        ]
+
+    def _pch_name(self, headers: HeaderSet) -> str:
+        return PrecompiledHeaders.make_name(
+            headers, [self._config.compiler, *self._assemble_codegen_flags()]
+        )
+
+    def _assemble_codegen_flags(self) -> StringList:
+        """Assemble the flags that must be the same for precompiled headers."""
         flags = [
-            f"-W{flag}"
-            for flag in ("all", "error", "extra", "pedantic", "no-missing-braces")
+            f"-std=c++{self._config.cpp_standard}",
+            *[
+                f"-W{flag}"
+                for flag in ("all", "error", "extra", "pedantic", "no-missing-braces")
+            ],
         ]
-        cpp_standard = f"-std=c++{self._config.cpp_standard}"
-        output_path = str(
-            target.make_objfile_path(self._config.build_directory / Builder.OBJ_DIR)
+
+        if self._config.debug:
+            flags.append("-ggdb3")
+        if self._config.optimize:
+            flags.append("-O3")
+        # TODO: -O3 is not added to the tests, figure out why.
+        if self._config.shared_objects:
+            flags.append("-fPIC")
+
+        return flags
+
+    def _assemble_compile_command(self, target: Target) -> StringList:
+        includepaths = self._query_all_includepaths(target)
+
+        headers = self._pch_headers.get(str(target.name))
+        pch_statement = (
+            [
+                "-include",
+                str(
+                    self._precompiled_headers.make_header_path(self._pch_name(headers))
+                ),
+            ]
+            if headers
+            else []
         )
+
+        output_path = str(self.make_objfile_path(target))
         cmd = [
             self._config.compiler,
             "-o",
             output_path,
             "-c",
-            cpp_standard,
-            # todo: add fPIC / fPIE when .so file is requested.
-            *flags,
+            # List the headers that are actually read in a depfile, except for
+            # system headers.
+            "-MMD",
+            "-MF",
+            str(self.make_depfile_path(target)),
+            *self._assemble_codegen_flags(),
+            *pch_statement,
             *includepaths,
             target.source_file,
         ]
 
-        if self._config.debug:
-            cmd.append("-ggdb3")
-        if self._config.optimize:
-            cmd.append("-O3")
-        # TODO: -O3 is not added to the tests, figure out why.
-
         return cmd
 
-    def _query_all_includepaths(self, target: Target) -> set:
+    def _query_all_includepaths(self, target: Target) -> StringList:
         includepaths = set()
 
         if target.source_type == SourceType.SRC:
@@ -135,7 +777,9 @@ class Compiler:
             self._scan_external_targets_for_includepath_statements(target)
         )
 
-        return includepaths
+        # Sorted, so that the same target is always compiled with the very same
+        # command, which is a part of the object cache keys.
+        return sorted(includepaths)
 
     def _scan_external_targets_for_includepath_statements(self, target: Target) -> set:
         external_includepaths = set()
@@ -147,91 +791,349 @@ class Compiler:
         return external_includepaths
 
 
+class LibraryBuilder:
+    """C++ library builder.
+
+    Archives the object files of each module into a static library, or links
+    them into a shared object if requested.
+    """
+
+    POOL = "library"
+    ARCHIVER = "ar"
+
+    def __init__(
+        self, config: BuildConfig, compiler: Compiler, database: BuildDatabase
+    ):
+        """Create an instance, building from the object files compiled by `compiler`."""
+        self._config = config
+        self._compiler = compiler
+        self._database = database
+        self._libraries: List[ModuleLibrary] = []
+        self._libraries_by_target: Dict[str, ModuleLibrary] = {}
+        self._objfiles: Dict[str, StringList] = {}
+
+    def assign_libraries(self, libraries: List[ModuleLibrary]):
+        """Set the libraries to build the targets into."""
+        self._libraries = libraries
+        self._libraries_by_target = {
+            str(target.name): library
+            for library in libraries
+            for target in library.targets
+        }
+
+    def get_library(self, target: Target) -> Optional[ModuleLibrary]:
+        """Get the library that a target is built into, if any."""
+        return self._libraries_by_target.get(str(target.name))
+
+    @staticmethod
+    def job_key(library: ModuleLibrary) -> JobKey:
+        """Get the key of the job building a library."""
+        return (LibraryBuilder.POOL, library.name)
+
+    def make_library_path(self, library: ModuleLibrary) -> Path:
+        """Make the path of a library."""
+        if self._config.shared_objects:
+            return (
+                self._config.build_directory / Builder.SO_DIR / f"lib{library.name}.so"
+            )
+        return self._config.build_directory / Builder.LIB_DIR / f"lib{library.name}.a"
+
+    def make_jobs(self, compiled_targets: List[Target]) -> List[Job]:
+        """Make jobs building the libraries whose object files changed.
+
+        A library is built again if any of its targets is compiled, or if its
+        object files are not the ones it was built from, e.g. after a unity
+        build. Each job depends on the compilation of those targets.
+        """
+        compiled_names = {str(target.name) for target in compiled_targets}
+        recorded_objfiles = self._database.get_library_objfiles()
+
+        jobs = []
+        for library in self._libraries:
+            objfiles = list(
+                dict.fromkeys(
+                    str(self._compiler.make_linked_objfile_path(target))
+                    for target in library.targets
+                )
+            )
+            self._objfiles[library.name] = objfiles
+
+            library_path = self.make_library_path(library)
+            if (
+                recorded_objfiles.get(library.name) == tuple(objfiles)
+                and library_path.is_file()
+                and not any(str(t.name) in compiled_names for t in library.targets)
+            ):
+                continue
+
+            # Archiving adds to an existing library, so outdated members would
+            # be kept.
+            self._database.delete_library(library.name)
+            if library_path.exists():
+                library_path.unlink()
+            jobs.append(
+                Job(
+                    name=library.name,
+                    cmd=self._assemble_library_command(library_path, objfiles),
+                    error_message=f"Building of library {library.name} failed.",
+                    pool=LibraryBuilder.POOL,
+                    dependencies=tuple(
+                        dict.fromkeys(map(self._compiler.job_key, library.targets))
+                    ),
+                )
+            )
+        return jobs
+
+    def record_built(self, name: str):
+        """Record a successful build of a library."""
+        self._database.set_library_objfiles(name, self._objfiles[name])
+
+    def _assemble_library_command(
+        self, library_path: Path, objfiles: StringList
+    ) -> StringList:
+        if self._config.shared_objects:
+            # Symbols of other modules are resolved when executables are linked.
+            return [
+                self._config.compiler,
+                *make_linker_flags(self._config.linker),
+                "-shared",
+                "-o",
+                str(library_path),
+                *objfiles,
+            ]
+        return [LibraryBuilder.ARCHIVER, "rcs", str(library_path), *objfiles]
+
+
 class Linker:
     """C++ program linker.
 
     Converts object code files to executables or shared object files.
     """
 
-    def __init__(self, config: BuildConfig, deps: Dependencies):
-        """Create an instance."""
+    # pylint: disable=too-few-public-methods
+
+    POOL = "link"
+
+    def __init__(
+        self,
+        config: BuildConfig,
+        deps: Dependencies,
+        compiler: Compiler,
+        libraries: LibraryBuilder,
+    ):
+        """Create an instance, linking the files compiled and built by others."""
         self._config = config
         self._deps = deps
+        self._compiler = compiler
+        self._libraries = libraries
+        self._linked_targets: Dict[str, List[Target]] = {}
+        self._targets_by_name: Dict[str, Target] = {}
+        self._targets_by_own_header: Dict[str, List[Target]] = {}
+
+    def make_jobs(
+        self,
+        changelist: List[Target],
+        all_targets: List[Target],
+        compiled_targets: List[Target],
+    ) -> List[Job]:
+        """Make linkage jobs for the executables affected by the change list.
 
-    def link_translation_units(self, changelist: List[Target]):
-        """Link all the object files, sources of which were compiled in changelist."""
+        An executable is affected if it is in the change list itself, or if it
+        links the object file of a compiled target, unless that is linked from
+        a shared object at run time. Executables are looked up by the targets
+        they link through a reverse index, so that exactly the affected ones
+        are linked.
+
+        Each job depends on the jobs building the files it links. Object files
+        are looked up among all targets, since the ones that are not in the
+        change list are already compiled by a previous build.
+        """
         # filter out source modules, only keeping tests and executables
         # with main entrypoints.
-        target_list = filter(
+        executables = filter(
             lambda t: t.source_type != SourceType.SRC,
-            changelist,
+            all_targets,
         )
 
         # furthermore, filter out tests if not requested.
-        target_list = (
-            target_list
-            if self._config.test
-            else filter(lambda t: not t.source_type == SourceType.TEST, target_list)
-        )
+        executables = [
+            target
+            for target in executables
+            if self._config.test or target.source_type != SourceType.TEST
+        ]
 
-        for target in target_list:
-            link_cmd = self._assemble_link_command(target, changelist)
-            fancy_separator()
-            fancy_run(
-                link_cmd, error_message=f"Linkage of target {target.name} failed."
+        self._index_targets(all_targets)
+        linked_dependees = {
+            str(target.name): self._assemble_linked_dependees(target)
+            for target in executables
+        }
+        linking_executables: Dict[str, Set[str]] = {}
+        for name, dependees in linked_dependees.items():
+            for dependee in dependees:
+                linking_executables.setdefault(str(dependee.name), set()).add(name)
+
+        affected_names = {str(target.name) for target in changelist}
+        for target in compiled_targets:
+            if self._config.shared_objects and self._libraries.get_library(target):
+                continue
+            affected_names.update(linking_executables.get(str(target.name), ()))
+
+        jobs = []
+        for target in executables:
+            if str(target.name) not in affected_names:
+                continue
+            dependees = linked_dependees[str(target.name)]
+            self._linked_targets[str(target.name)] = [target, *dependees]
+            jobs.append(
+                Job(
+                    name=str(target.name),
+                    cmd=self._assemble_link_command(target, dependees),
+                    error_message=f"Linkage of target {target.name} failed.",
+                    pool=Linker.POOL,
+                    dependencies=tuple(
+                        dict.fromkeys(
+                            [
+                                self._compiler.job_key(target),
+                                *map(self._dependee_job_key, dependees),
+                            ]
+                        )
+                    ),
+                )
             )
+        return jobs
 
-        fancy_print(
-            "All executable targets are up-to-date.",
-            msg_type=MessageType.SUCCESS,
-            flash=True,
-        )
+    def find_affected_executables(
+        self, changed_targets: List[Target], all_targets: List[Target]
+    ) -> List[Target]:
+        """Find the executables that are changed or link any changed target.
 
-    def _assemble_link_command(self, target: Target, all_targets: List[Target]):
-        """Assemble command line arguments for linking a target.
+        Unlike in `make_jobs`, targets linked from shared objects count as well,
+        since they are loaded at run time.
+        """
+        self._index_targets(all_targets)
+        changed_names = {str(target.name) for target in changed_targets}
+        return [
+            target
+            for target in all_targets
+            if target.source_type != SourceType.SRC
+            and (
+                str(target.name) in changed_names
+                or any(
+                    str(dependee.name) in changed_names
+                    for dependee in self._assemble_linked_dependees(target)
+                )
+            )
+        ]
 
-        Raises:
-            AssertionError: If `target` is not one of the types SourceType.{MAIN, TEST}.
+    def select_affected_tests(
+        self,
+        changed_targets: List[Target],
+        compiled_targets: List[Target],
+        all_targets: List[Target],
+    ) -> Tuple[List[Target], List[Target]]:
+        """Split off the tests affected by the changed targets.
+
+        Returns the affected tests, and the unaffected tests that link or load a
+        compiled target. The latter are outdated once the targets are compiled.
         """
-        assert target.source_type in [SourceType.MAIN, SourceType.TEST]
+        affected_tests = [
+            target
+            for target in self.find_affected_executables(changed_targets, all_targets)
+            if target.source_type == SourceType.TEST
+        ]
+        affected_names = {str(target.name) for target in affected_tests}
+        outdated_tests = [
+            target
+            for target in self.find_affected_executables(compiled_targets, all_targets)
+            if target.source_type == SourceType.TEST
+            and str(target.name) not in affected_names
+        ]
+        return affected_tests, outdated_tests
 
+    def get_linked_targets(self, name: str) -> List[Target]:
+        """Get the targets whose object files a link job of `make_jobs` links."""
+        return self._linked_targets[name]
+
+    def make_executable_path(self, target: Target) -> Path:
+        """Make the path of the executable linked from a target."""
         out_subdir = (
             Builder.BIN_DIR
             if target.source_type == SourceType.MAIN
             else Builder.TEST_DIR
         )
+        return target.make_executable_path(self._config.build_directory / out_subdir)
 
-        out_executable_path = target.make_executable_path(
-            self._config.build_directory / out_subdir
-        )
+    def _assemble_link_command(self, target: Target, dependees: List[Target]):
+        """Assemble command line arguments for linking a target.
 
-        object_files_to_be_linked = [
-            str(
-                target.make_objfile_path(self._config.build_directory / Builder.OBJ_DIR)
+        Raises:
+            AssertionError: If `target` is not one of the types SourceType.{MAIN, TEST}.
+        """
+        assert target.source_type in [SourceType.MAIN, SourceType.TEST]
+
+        out_executable_path = self.make_executable_path(target)
+
+        # Dependees are linked from the libraries of their modules.
+        object_files_to_be_linked = list(
+            dict.fromkeys(
+                str(self._compiler.make_linked_objfile_path(t))
+                for t in [target, *dependees]
+                if t == target or not self._libraries.get_library(t)
+            )
+        )
+        module_libraries = list(
+            dict.fromkeys(
+                str(self._libraries.make_library_path(library))
+                for library in map(self._libraries.get_library, dependees)
+                if library
             )
-        ]
-        object_files_to_be_linked.extend(
-            [
-                str(dependee_path)
-                for dependee_path in self._assemble_dependee_list_of_target(
-                    target, all_targets
-                )
-            ]
+        )
+        module_libraries_statement = self._assemble_module_libraries_statement(
+            module_libraries
         )
 
         libs_statement = self._assemble_libraries_statement(target)
 
         link_cmd = [
             self._config.compiler,
+            *make_linker_flags(self._config.linker),
             "-o",
             str(out_executable_path),
             *object_files_to_be_linked,
+            *module_libraries_statement,
             *libs_statement,
             "-pthread",
         ]
 
         return link_cmd
 
+    def _assemble_module_libraries_statement(
+        self, module_libraries: StringList
+    ) -> StringList:
+        if not module_libraries:
+            return []
+
+        if self._config.shared_objects:
+            # Shared objects depend on each other, but not explicitly, so all
+            # of them must be loaded along with the executable. The toolchain's
+            # default for the libraries that follow is restored afterwards.
+            so_directory = self._config.build_directory / Builder.SO_DIR
+            return [
+                f"-Wl,-rpath,{so_directory}",
+                "-Wl,--push-state,--no-as-needed",
+                *module_libraries,
+                "-Wl,--pop-state",
+            ]
+
+        # Static libraries may depend on each other in any order.
+        return ["-Wl,--start-group", *module_libraries, "-Wl,--end-group"]
+
+    def _dependee_job_key(self, dependee: Target) -> JobKey:
+        library = self._libraries.get_library(dependee)
+        if library:
+            return LibraryBuilder.job_key(library)
+        return self._compiler.job_key(dependee)
+
     def _assemble_libraries_statement(self, target: Target) -> StringList:
         libs_statement = []
         for external_header in target.includes.external:
@@ -249,20 +1151,45 @@ class Linker:
             libs_statement.extend(libraries)
         return libs_statement
 
-    def _assemble_dependee_list_of_target(
-        self, target: Target, all_targets: List[Target]
-    ) -> StringList:
+    def _index_targets(self, all_targets: List[Target]):
+        self._targets_by_name = {str(target.name): target for target in all_targets}
+        self._targets_by_own_header: Dict[str, List[Target]] = {}
+        for target in all_targets:
+            if target.includes.own:
+                self._targets_by_own_header.setdefault(target.includes.own, []).append(
+                    target
+                )
+
+    def _assemble_linked_dependees(self, target: Target) -> List[Target]:
+        """Assemble the targets whose object files are linked into a target.
+
+        An object file of a unity batch brings in all the targets of the batch,
+        so the dependees of each of them are linked as well.
+        """
+        dependees = {
+            str(dependee.name): dependee
+            for dependee in self._assemble_dependee_list_of_target(target)
+        }
+        pending = list(dependees.values())
+        while pending:
+            for name in self._compiler.get_objfile_sharers(pending.pop()):
+                sharer = self._targets_by_name.get(name)
+                if sharer is None:
+                    continue
+                for dependee in [
+                    sharer,
+                    *self._assemble_dependee_list_of_target(sharer),
+                ]:
+                    dependee_name = str(dependee.name)
+                    if dependee_name not in dependees and dependee_name != str(
+                        target.name
+                    ):
+                        dependees[dependee_name] = dependee
+                        pending.append(dependee)
+        return list(dependees.values())
+
+    def _assemble_dependee_list_of_target(self, target: Target) -> List[Target]:
         dependees = []
         for internal_header in target.includes.internal:
-            for internal_dependency in filter(
-                lambda other_target: other_target.includes.own == internal_header,
-                all_targets,
-            ):
-                dependees.append(
-                    str(
-                        internal_dependency.make_objfile_path(
-                            self._config.build_directory / Builder.OBJ_DIR
-                        )
-                    )
-                )
+            dependees.extend(self._targets_by_own_header.get(internal_header, ()))
         return dependees
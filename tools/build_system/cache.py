@@ -1,90 +1,141 @@
 """Cache utilities to achieve build avoidance."""
-from __future__ import annotations
-
-import pickle
-from dataclasses import dataclass
-from typing import List
+import json
+from dataclasses import fields
+from pathlib import Path
+from typing import List, Optional
 
 from tools.build_system.build_config import BuildConfig
+from tools.build_system.build_database import BuildDatabase, FileChecksums
+from tools.build_system.code_util import calculate_checksums, checksums_match
+from tools.build_system.source_resolution import SourceType
 from tools.build_system.target import Target
+from tools.build_system.typing import StringList
 
 
-@dataclass(frozen=True)
-class CacheState:
-    """An instantaneous state representation of the repository."""
-
-    valid: bool
-    targets: List[Target]
-    # targets_previous_build_successful: List[bool] # todo, implement
-    build_config: BuildConfig
-
-    def diff(self, other: CacheState) -> List[Target]:
-        """Get the difference between two cache states."""
-        changed_targets = []
-
-        if (
-            self.build_config != other.build_config
-            or self.build_config.force_build
-            or not other.valid
-        ):
-            changed_targets = self.targets
-        else:
-            for current_target in self.targets:
-                match = list(
-                    filter(lambda t: t.name == current_target.name, other.targets)
-                )
-                if not match:
-                    # this is a newly added target
-                    changed_targets.append(current_target)
-                    continue
-
-                assert (
-                    len(match) == 1
-                ), f"Faulty cache, more than 1 targets with same exact name: {current_target.name}"
-
-                old_target = match[0]
-                if not current_target.checksums_match(old_target):
-                    changed_targets.append(current_target)
-        return changed_targets
+def _fingerprint(build_config: BuildConfig) -> str:
+    """Serialize the fields of a build config that take part in equality comparison."""
+    return json.dumps(
+        {
+            field.name: str(getattr(build_config, field.name))
+            for field in fields(build_config)
+            if field.compare
+        },
+        sort_keys=True,
+    )
 
 
 class Cache:
-    """Build cache."""
+    """Build cache, backed by the build database."""
 
-    CACHE_FILE_NAME = "kioku_cache.pkl"
+    BUILD_CONFIG_KEY = "build_config"
 
-    def __init__(self, build_config: BuildConfig):
+    def __init__(self, build_config: BuildConfig, database: BuildDatabase):
         """Create an instance."""
         self._build_config = build_config
-        self._cache_file_path = (
-            self._build_config.build_directory / Cache.CACHE_FILE_NAME
-        )
-
-        self._build_config.build_directory.mkdir(exist_ok=True)
-
-    def _load_cache(self) -> CacheState:
-        """Deserialize a previous cache state from disk."""
-        if self._cache_file_path.exists():
-            with open(self._cache_file_path, "rb") as f_handle:
-                cache_state = pickle.load(f_handle)
-            print(f"Successfully loaded cache file: {self._cache_file_path}")
-            assert isinstance(
-                cache_state, CacheState
-            ), "[Cache] Load: Faulty cache file"
-        else:
-            cache_state = CacheState(False, [], BuildConfig())
-            print("Cache file does not exist, it will be created.")
-        return cache_state
-
-    def _save_cache(self, cache_state: CacheState):
-        """Serialize the current cache state to disk."""
-        with open(self._cache_file_path, "wb") as f:
-            pickle.dump(cache_state, f)
+        self._database = database
 
     def get_target_changelist(self, targets: List[Target]) -> List[Target]:
-        """Compare the current list of targets with a previous version to get the difference."""
-        previous_cache_state = self._load_cache()
-        current_cache_state = CacheState(True, targets, self._build_config)
-        self._save_cache(current_cache_state)
+        """Compare the current targets with the previous build to get the difference.
+
+        The database holds the state of each target as of its last successful
+        compilation, therefore failed or interrupted targets are part of the
+        difference until they are built successfully. A target is also part of
+        the difference if any file it depended on in that compilation, as
+        reported by the compiler, has changed.
+        """
+        fingerprint = _fingerprint(self._build_config)
+        previous_fingerprint = self._database.get_meta(Cache.BUILD_CONFIG_KEY)
+
+        if previous_fingerprint is None:
+            print("Build database is empty, it will be populated.")
+        else:
+            print(f"Successfully loaded build database: {self._database.path}")
+
+        if previous_fingerprint != fingerprint:
+            # Targets built with another configuration are of no use.
+            self._database.clear_targets()
+            self._database.set_meta(Cache.BUILD_CONFIG_KEY, fingerprint)
+
+        previous_records = self._database.get_targets()
+        previous_dependencies = self._database.get_target_dependencies()
+
+        changed_targets, updated_records = [], []
+        for target in targets:
+            record = target.to_record()
+            previous_record = previous_records.get(record.name)
+
+            if (
+                self._build_config.force_build
+                or not previous_record
+                or previous_record.source_checksum != record.source_checksum
+                or previous_record.include_checksums != record.include_checksums
+                or not checksums_match(previous_dependencies.get(record.name, {}))
+            ):
+                changed_targets.append(target)
+            elif record != previous_record:
+                # Same content, e.g. a moved header, no need to build again.
+                updated_records.append(record)
+
+        current_names = {str(target.name) for target in targets}
+        removed_names = [
+            name
+            for name, record in previous_records.items()
+            if name not in current_names and not Path(record.source_file).exists()
+        ]
+
+        self._database.put_targets(updated_records)
+        self._database.delete_targets(removed_names)
+
+        return changed_targets
 
-        return current_cache_state.diff(previous_cache_state)
+    def get_unlinked_targets(self, targets: List[Target]) -> List[Target]:
+        """Get executable targets that are compiled but not linked successfully."""
+        unlinked_names = self._database.get_unlinked_target_names()
+        return [
+            target
+            for target in targets
+            if target.source_type != SourceType.SRC
+            and str(target.name) in unlinked_names
+        ]
+
+    def invalidate(self, targets: List[Target]):
+        """Forget targets that are about to be built, until they are built successfully.
+
+        This way a target interrupted while being built is built again next time.
+        """
+        self._database.delete_targets(str(target.name) for target in targets)
+
+    def invalidate_linkage(self, targets: List[Target]):
+        """Forget linkages that are about to be done again, until they succeed."""
+        with self._database.transaction():
+            for target in targets:
+                self._database.set_linked(str(target.name), False)
+
+    def record_compiled(
+        self,
+        target: Target,
+        dependencies: Optional[StringList] = None,
+        objfile: Optional[Path] = None,
+    ) -> FileChecksums:
+        """Record a successful compilation of a target, return the recorded checksums.
+
+        `dependencies` are the files that the compilation read, as reported by
+        the compiler or by the manifest of a cached object. If they are not
+        known, the source file and the included headers are recorded, so that
+        the dependencies of a target are never empty.
+        `objfile` is the object file shared with other targets, if any.
+        """
+        files = dependencies or [target.source_file, *target.includes.all]
+        checksums = calculate_checksums(files)
+        with self._database.transaction():
+            self._database.put_targets([target.to_record()])
+            self._database.set_linked(str(target.name), False)
+            self._database.set_target_dependencies(str(target.name), checksums)
+            self._database.set_target_objfile(
+                str(target.name), str(objfile) if objfile else None
+            )
+        return checksums
+
+    def record_linked(self, target: Target):
+        """Record a successful linkage of an executable target."""
+        self._database.set_linked(str(target.name), True)
@@ -1,9 +1,17 @@
 """Source code utilities."""
+from __future__ import annotations
+
 import hashlib
+import os
+import re
 import subprocess
+import time
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
 
+from tools.build_system.build_database import BuildDatabase
 from tools.build_system.constants import (
     HEADER_EXTENSIONS,
     PY_EXTENSION,
@@ -23,11 +31,142 @@ def get_commit_hash():
     return subprocess.check_output(["git", "rev-parse", "HEAD"]).decode("utf-8").strip()
 
 
-def calculate_checksum(file: PathString):
+def get_changed_files(revisions: str, repo: PathString = REPO_ROOT) -> StringList:
+    """Get full paths to the files changed by a git revision range, e.g. `A..B`.
+
+    A single revision is compared with the working tree.
+    """
+    output = subprocess.check_output(
+        ["git", "diff", "--name-only", revisions, "--"], cwd=repo
+    )
+    return [str(Path(repo) / name) for name in output.decode("utf-8").splitlines()]
+
+
+CHECKSUM_CHUNK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class FileStat:
+    """Stat information that changes whenever the content of a file changes."""
+
+    mtime_ns: int
+    size: int
+    inode: int
+
+    @classmethod
+    def of(cls, file: PathString) -> FileStat:
+        """Get the stat information of a file."""
+        stat = os.stat(file)
+        return cls(stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class ChecksumCache:
+    """Checksums of files, reused while the stat information of a file is unchanged.
+
+    A file modified within the same timestamp granularity as it was hashed would
+    keep its stat information, therefore checksums of recently modified files are
+    not persisted.
+    """
+
+    RACY_WINDOW_NS = 2 * 10**9
+
+    def __init__(self, entries: Optional[Dict[str, Tuple[FileStat, str]]] = None):
+        """Create an instance."""
+        self._entries: Dict[str, Tuple[FileStat, str]] = entries or {}
+        self._changed: Set[str] = set()
+
+    @classmethod
+    def load(cls, database: BuildDatabase) -> ChecksumCache:
+        """Load checksums of previous runs from the build database."""
+        return cls(
+            {
+                path: (FileStat(mtime_ns, size, inode), checksum)
+                for path, mtime_ns, size, inode, checksum in (
+                    database.get_file_checksums().values()
+                )
+            }
+        )
+
+    def save(self, database: BuildDatabase):
+        """Store checksums calculated in this run, except for recent modifications."""
+        racy_since_ns = time.time_ns() - ChecksumCache.RACY_WINDOW_NS
+        rows = []
+        for path in self._changed:
+            stat, checksum = self._entries[path]
+            if stat.mtime_ns < racy_since_ns:
+                rows.append((path, stat.mtime_ns, stat.size, stat.inode, checksum))
+        database.put_file_checksums(rows)
+        self._changed.clear()
+
+    def checksum(self, file: PathString) -> str:
+        """Get the md5 checksum of a file, hashing it only if it has changed."""
+        stat = FileStat.of(file)
+        entry = self._entries.get(str(file))
+        if entry and entry[0] == stat:
+            return entry[1]
+
+        md5 = hashlib.md5()
+        with open(file, "rb") as f_handle:
+            for chunk in iter(lambda: f_handle.read(CHECKSUM_CHUNK_SIZE), b""):
+                md5.update(chunk)
+
+        self._entries[str(file)] = (stat, md5.hexdigest())
+        self._changed.add(str(file))
+        return md5.hexdigest()
+
+
+_checksum_cache = ChecksumCache()
+
+
+def load_checksum_cache(database: BuildDatabase):
+    """Load persisted checksums, to be used by `calculate_checksum` in this run."""
+    global _checksum_cache  # pylint: disable=global-statement,invalid-name
+    _checksum_cache = ChecksumCache.load(database)
+
+
+def save_checksum_cache(database: BuildDatabase):
+    """Persist checksums calculated in this run."""
+    _checksum_cache.save(database)
+
+
+def calculate_checksum(file: PathString) -> str:
     """Calculate the md5 checksum of a file."""
-    with open(file) as f:
-        file_content = f.read()
-    return hashlib.md5(file_content.encode("utf-8")).hexdigest()
+    return _checksum_cache.checksum(file)
+
+
+def calculate_checksums(files: Iterable[PathString]) -> Dict[str, str]:
+    """Calculate the checksums of the existing files among the given ones, keyed by path."""
+    return {
+        str(file): calculate_checksum(file) for file in files if Path(file).is_file()
+    }
+
+
+def checksums_match(checksums: Dict[str, str]) -> bool:
+    """Check if files still have the given checksums, keyed by file path."""
+    try:
+        return all(
+            calculate_checksum(file) == checksum for file, checksum in checksums.items()
+        )
+    except FileNotFoundError:
+        return False
+
+
+def parse_depfile(depfile: PathString) -> StringList:
+    """Parse the prerequisites of a make rule, as written by the compiler with -MD.
+
+    Raises:
+        FileNotFoundError: If the depfile does not exist.
+    """
+    with open(depfile) as depfile_handle:
+        content = depfile_handle.read().replace("\\\n", " ")
+
+    _, _, prerequisites = content.partition(": ")
+    # Spaces in file names are escaped with a backslash.
+    return [
+        str(Path(word.replace("\\ ", " ")).resolve())
+        for word in re.split(r"(?<!\\)\s+", prerequisites)
+        if word
+    ]
 
 
 @lru_cache(maxsize=None)
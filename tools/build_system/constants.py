@@ -39,7 +39,9 @@ BOLDBLUE = f"{BOLD}{BLUE}"
 
 IN_DOCKER_BUILD_DIR = "/kioku_build"
 IN_DOCKER_DEPS_DIR = "/kioku_dependencies"
+IN_DOCKER_DEPS_MIRROR_DIR = "/kioku_dependency_mirrors"
 IN_DOCKER_SRC_DIR = "/kioku_src"
+IN_DOCKER_OBJECT_CACHE_DIR = "/kioku_object_cache"
 IN_DOCKER_ENV_VAR_KEY = "KIOKU_IN_DOCKER"
 IN_DOCKER_ENV_VAR_VAL = "true"
 
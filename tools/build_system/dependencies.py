@@ -1,10 +1,16 @@
 """Module for managing and maintaining repo dependencies."""
+import json
 import os
-from dataclasses import dataclass, field
+import shutil
+import subprocess
+import sys
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from tools.build_system.fancy import fancy_run, fancy_separator
+from tools.build_system.dependency_cache import DependencyCache
+from tools.build_system.fancy import fancy_print
+from tools.build_system.parallel import Job, report_failures, run_jobs
 from tools.build_system.typing import StringList
 
 
@@ -25,6 +31,9 @@ class Dependency:
     built_files_debug: StringList = field(default_factory=lambda: [])
     additional_flags: StringList = field(default_factory=lambda: [])
 
+    # Branch, tag or commit to check out, the default branch if empty.
+    revision: str = ""
+
     @property
     def header_relpath(self) -> Path:
         """Get the relative path to the main header file."""
@@ -55,10 +64,29 @@ class Dependencies:
 
     DEFAULT_BUILD_DIR = Path("build")
     DEFAULT_DEBUG_BUILD_DIR = Path("build_debug")
+    BUILD_STAMP = ".kioku_build_stamp"
+    # Build directories and the build types of the builds in them.
+    BUILDS = ((DEFAULT_BUILD_DIR, "Release"), (DEFAULT_DEBUG_BUILD_DIR, "Debug"))
+    POOL = "dependency"
+    # Builds running at the same time, which share the cores among themselves.
+    CONCURRENT_BUILDS = 2
+    FETCH_POOL = "fetch"
+
+    def __init__(
+        self,
+        path: Path,
+        mirror_path: Optional[Path] = None,
+        cache: Optional[DependencyCache] = None,
+    ) -> None:
+        """Make an instance.
 
-    def __init__(self, path: Path) -> None:
-        """Make an instance."""
+        Dependencies are fetched from the bare repositories named `<name>.git`
+        in `mirror_path`, if there are any, instead of their remotes. Built
+        files are unpacked from `cache` instead of building them, if stored.
+        """
         self._path = path
+        self._mirror_path = mirror_path
+        self._cache = cache
         self._path.mkdir(exist_ok=True)
 
         self._deps = [
@@ -98,58 +126,190 @@ class Dependencies:
         return self._deps
 
     def build(self):
-        """Build all the dependencies."""
-        current_dir = Path.cwd()
-        os.chdir(str(self._path))
-        for dep_dir in self._path.iterdir():
-            os.chdir(dep_dir)
-            if dep_dir.name == "googletest":
-                (Path.cwd() / self.DEFAULT_BUILD_DIR).mkdir(exist_ok=True)
-                os.chdir(self.DEFAULT_BUILD_DIR)
-
-                fancy_separator()
-                fancy_run(["cmake", ".."])
-                fancy_run(["make", "-j2"])
-
-                os.chdir(
-                    ".."
-                )  # todo, add context manager for changing the directory temporarily
-                (Path.cwd() / self.DEFAULT_DEBUG_BUILD_DIR).mkdir(exist_ok=True)
-                os.chdir(self.DEFAULT_DEBUG_BUILD_DIR)
-
-                fancy_separator()
-                fancy_run(["cmake", "-DCMAKE_BUILD_TYPE=Debug", ".."])
-                fancy_run(["make", "-j2"])
-
-        os.chdir(current_dir)
+        """Build all the dependencies, release and debug builds concurrently.
+
+        A dependency is skipped if its checked out commit and the toolchain
+        match those of its last successful build, and is unpacked from the
+        cache if they match those of a cached build.
+        """
+        generator = "Ninja" if shutil.which("ninja") else "Unix Makefiles"
+        toolchain = _identify_toolchain(generator)
+        jobs = []
+        built_deps = []
+        for dep in self._deps:
+            if not dep.built_files or not (self._path / dep.name).is_dir():
+                continue
+            stamp = {"commit": _get_commit(self._path / dep.name), **toolchain}
+            last_stamp = self._read_build_stamp(dep)
+            if last_stamp == stamp:
+                fancy_print(f"{dep.name} is up-to-date.")
+                continue
+            if any(last_stamp.get(tool) != value for tool, value in toolchain.items()):
+                # Build trees can not switch their generator or compiler.
+                for build_dir in (self.DEFAULT_BUILD_DIR, self.DEFAULT_DEBUG_BUILD_DIR):
+                    shutil.rmtree(self._path / dep.name / build_dir, ignore_errors=True)
+
+            configure_flags = [
+                self._make_configure_flags(generator, build_type)
+                for _, build_type in self.BUILDS
+            ]
+            cache_key = DependencyCache.make_key(dep.name, [stamp, configure_flags])
+            if self._cache and self._cache.load(cache_key, self._path / dep.name):
+                fancy_print(f"{dep.name} is unpacked from the dependency cache.")
+                self._write_build_stamp(dep, stamp)
+                continue
+            jobs.extend(self.make_build_jobs(dep, generator))
+            built_deps.append((dep, stamp, cache_key))
+
+        failures = run_jobs(jobs, {self.POOL: self.CONCURRENT_BUILDS})
+        if failures:
+            report_failures(failures, "Build failed for the following dependencies:")
+            sys.exit(-1)
+        for dep, stamp, cache_key in built_deps:
+            if self._cache:
+                self._cache.store(
+                    cache_key, self._path / dep.name, self._list_built_files(dep)
+                )
+            self._write_build_stamp(dep, stamp)
+
+    def make_build_jobs(self, dep: Dependency, generator: str) -> List[Job]:
+        """Make the jobs to configure and build the release and debug builds."""
+        source_dir = self._path / dep.name
+        jobs = []
+        for build_dir, build_type in self.BUILDS:
+            name = f"{dep.name}/{build_dir}"
+            configure = Job(
+                name=f"{name}/configure",
+                cmd=[
+                    "cmake",
+                    "-S",
+                    str(source_dir),
+                    "-B",
+                    str(source_dir / build_dir),
+                    *self._make_configure_flags(generator, build_type),
+                ],
+                error_message=f"Failed to configure {name}.",
+                pool=self.POOL,
+            )
+            build = Job(
+                name=name,
+                cmd=[
+                    "cmake",
+                    "--build",
+                    str(source_dir / build_dir),
+                    "--parallel",
+                    str(max(1, (os.cpu_count() or 1) // self.CONCURRENT_BUILDS)),
+                ],
+                error_message=f"Failed to build {name}.",
+                pool=self.POOL,
+                dependencies=(configure.key,),
+            )
+            jobs.extend([configure, build])
+        return jobs
+
+    @staticmethod
+    def _make_configure_flags(generator: str, build_type: str) -> StringList:
+        return ["-G", generator, f"-DCMAKE_BUILD_TYPE={build_type}"]
+
+    def _list_built_files(self, dep: Dependency) -> List[Path]:
+        """List the built files of the release and debug builds of a dependency."""
+        built_files = []
+        for debug_build in (False, True):
+            built_files_dir, file_names = dep.make_objfiles_dir_and_list(
+                self._path, debug_build
+            )
+            built_files.extend(
+                (built_files_dir / name).relative_to(self._path / dep.name)
+                for name in file_names
+            )
+        return built_files
+
+    def _write_build_stamp(self, dep: Dependency, stamp: Dict[str, str]):
+        self._build_stamp_path(dep).write_text(json.dumps(stamp, indent=4))
+
+    def _build_stamp_path(self, dep: Dependency) -> Path:
+        return self._path / dep.name / self.BUILD_STAMP
+
+    def _read_build_stamp(self, dep: Dependency) -> Dict[str, str]:
+        try:
+            return json.loads(self._build_stamp_path(dep).read_text())
+        except (OSError, ValueError):
+            return {}
 
     def fetch(self):
         """Fetch the mandatory dependencies."""
-        current_dir = Path.cwd()
-        os.chdir(str(self._path))
-        dir_content = [dep_dir.name for dep_dir in self._path.iterdir()]
-        for dep in self._deps:
-            if dep.name not in dir_content:
-                cmd = ["git", "clone", dep.github_url]
-                fancy_separator()
-                fancy_run(cmd)
-            else:
-                os.chdir(dep.name)
-                cmd = ["git", "checkout", dep.default_branch]
-                fancy_separator()
-                fancy_run(cmd)
-                cmd = ["git", "pull", "origin", dep.default_branch]
-                fancy_separator()
-                fancy_run(cmd)
-            os.chdir(str(self._path))
-        os.chdir(current_dir)
+        self._fetch(self._deps)
 
     def fetch_misc_deps(self):
         """Fetch the dependencies in misc list."""
-        current_dir = Path.cwd()
-        os.chdir(str(self._path))
-        for dep in self.misc_deps:
-            cmd = ["git", "clone", dep.github_url]
-            fancy_separator()
-            fancy_run(cmd)
-        os.chdir(current_dir)
+        self._fetch(self.misc_deps)
+
+    def make_fetch_jobs(self, dep: Dependency) -> List[Job]:
+        """Make the jobs to fetch only the pinned revision of a dependency.
+
+        The mirror of the dependency is fetched from, if there is one.
+        """
+        repo = self._path / dep.name
+        revision = dep.revision or dep.default_branch
+        source = dep.github_url
+        if self._mirror_path and (self._mirror_path / f"{dep.name}.git").is_dir():
+            # Local repositories are fetched from shallowly only through urls.
+            source = (self._mirror_path / f"{dep.name}.git").resolve().as_uri()
+
+        fetch = Job(
+            name=f"{dep.name}/fetch",
+            cmd=["git", "-C", str(repo), "fetch", "--depth", "1", source, revision],
+            error_message=f"Failed to fetch {revision} of {dep.name} from {source}.",
+            pool=self.FETCH_POOL,
+        )
+        checkout = Job(
+            name=f"{dep.name}/checkout",
+            cmd=["git", "-C", str(repo), "checkout", "--detach", "FETCH_HEAD"],
+            error_message=f"Failed to check out {revision} of {dep.name}.",
+            pool=self.FETCH_POOL,
+            dependencies=(fetch.key,),
+        )
+        if (repo / ".git").exists():
+            return [fetch, checkout]
+
+        init = Job(
+            name=f"{dep.name}/init",
+            cmd=["git", "init", str(repo)],
+            error_message=f"Failed to create the repository of {dep.name}.",
+            pool=self.FETCH_POOL,
+        )
+        return [init, replace(fetch, dependencies=(init.key,)), checkout]
+
+    def _fetch(self, deps: List[Dependency]):
+        """Fetch dependencies concurrently."""
+        jobs = [job for dep in deps for job in self.make_fetch_jobs(dep)]
+        failures = run_jobs(jobs, {self.FETCH_POOL: len(deps)})
+        if failures:
+            report_failures(failures, "Fetch failed for the following dependencies:")
+            sys.exit(-1)
+
+
+def _get_commit(repo: Path) -> str:
+    """Get the checked out commit of a repository."""
+    return (
+        subprocess.check_output(["git", "-C", str(repo), "rev-parse", "HEAD"])
+        .decode("utf-8")
+        .strip()
+    )
+
+
+def _identify_toolchain(generator: str) -> Dict[str, str]:
+    """Identify the tools that dependencies are built with by their versions."""
+    toolchain = {"generator": generator}
+    for tool in ("cmake", "c++", "cc"):
+        try:
+            # pylint: disable=subprocess-run-check
+            result = subprocess.run(
+                [tool, "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+            )
+        except FileNotFoundError:
+            # Builds that do not need the tool still succeed without it.
+            toolchain[tool] = "absent"
+            continue
+        toolchain[tool] = result.stdout.decode("utf-8", errors="replace")
+    return toolchain
@@ -0,0 +1,106 @@
+"""Cache of the built files of dependencies, shared by dependency directories."""
+import hashlib
+import json
+import os
+import tarfile
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, List
+
+
+class DependencyCache:
+    """Store of the packaged built files of dependencies, keyed by their inputs.
+
+    Each entry is a gzipped tarball of the built files of a dependency, named
+    relative to the directory of the dependency.
+    """
+
+    DEPENDENCIES_DIR = "dependencies"
+    ENTRY_SUFFIX = ".tar.gz"
+
+    class InvalidArchive(Exception):
+        """Exception to be raised when an archive holds unexpected contents."""
+
+    def __init__(self, directory: Path):
+        """Create an instance, creating the store directory if necessary."""
+        self._directory = Path(directory) / DependencyCache.DEPENDENCIES_DIR
+        self._directory.mkdir(exist_ok=True, parents=True)
+
+    @staticmethod
+    def make_key(name: str, key_content: Any) -> str:
+        """Make the key of the built files of a dependency from their inputs."""
+        digest = hashlib.sha256(json.dumps(key_content, sort_keys=True).encode())
+        return f"{name}-{digest.hexdigest()}"
+
+    def load(self, key: str, dep_dir: Path) -> bool:
+        """Unpack an entry into the directory of a dependency, if it is stored.
+
+        Corrupt entries count as not stored, they are replaced once built.
+        """
+        entry = self._entry_path(key)
+        if not entry.is_file():
+            return False
+        try:
+            with tarfile.open(entry) as tar:
+                tar.extractall(dep_dir, members=_check_members(tar.getmembers()))
+        # Truncated entries fail to decompress rather than to unpack.
+        except (
+            tarfile.TarError,
+            EOFError,
+            OSError,
+            zlib.error,
+            DependencyCache.InvalidArchive,
+        ):
+            return False
+        return True
+
+    def store(self, key: str, dep_dir: Path, built_files: List[Path]):
+        """Pack the built files of a dependency, given relative to its directory."""
+        with tempfile.NamedTemporaryFile(dir=self._directory, delete=False) as tmp:
+            with tarfile.open(fileobj=tmp, mode="w:gz") as tar:
+                for built_file in built_files:
+                    tar.add(dep_dir / built_file, arcname=str(built_file))
+        # Replacing is atomic, so concurrent readers never see partial entries.
+        os.replace(tmp.name, self._entry_path(key))
+
+    def export_archive(self, archive: Path) -> int:
+        """Pack all entries into an archive, returning the number of entries."""
+        entries = sorted(self._directory.glob(f"*{DependencyCache.ENTRY_SUFFIX}"))
+        with tarfile.open(archive, "w") as tar:
+            for entry in entries:
+                tar.add(entry, arcname=entry.name)
+        return len(entries)
+
+    def import_archive(self, archive: Path) -> int:
+        """Unpack the entries of an exported archive, returning their number.
+
+        Raises:
+            InvalidArchive: If the archive holds no entries.
+        """
+        with tarfile.open(archive) as tar:
+            entries = [
+                member
+                for member in tar.getmembers()
+                if member.isfile()
+                and member.name == Path(member.name).name
+                and member.name.endswith(DependencyCache.ENTRY_SUFFIX)
+            ]
+            if not entries:
+                raise DependencyCache.InvalidArchive(
+                    f"{archive} holds no dependency cache entries."
+                )
+            tar.extractall(self._directory, members=entries)
+        return len(entries)
+
+    def _entry_path(self, key: str) -> Path:
+        return self._directory / f"{key}{DependencyCache.ENTRY_SUFFIX}"
+
+
+def _check_members(members: List[tarfile.TarInfo]) -> List[tarfile.TarInfo]:
+    """Check that the members of an entry are regular files below its directory."""
+    for member in members:
+        path = Path(member.name)
+        if not member.isfile() or path.is_absolute() or ".." in path.parts:
+            raise DependencyCache.InvalidArchive(f"Unexpected entry: {member.name}")
+    return members
@@ -0,0 +1,288 @@
+"""Distributed compilation, offloading compile jobs to worker agents over TCP.
+
+Translation units are preprocessed locally, so that workers need nothing but
+the same compiler: the preprocessed unit is sent to a worker together with the
+flags that are not consumed by the preprocessor, and the object file is sent
+back. See `distributed_worker.py` for the worker agent.
+
+Messages are a json header and a binary payload, each prefixed by its length.
+"""
+import json
+import os
+import socket
+import struct
+import subprocess
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from tools.build_system.fancy import MessageType, fancy_print
+from tools.build_system.parallel import Job, JobResult, report_job, run_job
+from tools.build_system.typing import StringList
+
+DEFAULT_WORKER_PORT = 3632
+
+_LENGTHS = struct.Struct("!II")
+
+# Flags that only affect preprocessing, hence not sent to workers. Depfiles are
+# written while preprocessing too.
+_PREPROCESSOR_FLAG_PREFIXES = ("-I", "-D", "-U", "-M")
+
+
+@lru_cache(maxsize=None)
+def compiler_version(compiler: str) -> str:
+    """Get the version output of a compiler, which must match on the workers."""
+    # pylint: disable=subprocess-run-check
+    result = subprocess.run(
+        [compiler, "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b""):
+    """Send a message through a socket."""
+    encoded_header = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTHS.pack(len(encoded_header), len(payload)))
+    sock.sendall(encoded_header)
+    sock.sendall(payload)
+
+
+def receive_message(sock: socket.socket) -> Tuple[dict, bytes]:
+    """Receive a message from a socket.
+
+    Raises:
+        ConnectionError: If the connection is closed before the whole message.
+    """
+    header_length, payload_length = _LENGTHS.unpack(
+        _receive_exactly(sock, _LENGTHS.size)
+    )
+    header = json.loads(_receive_exactly(sock, header_length).decode("utf-8"))
+    return header, _receive_exactly(sock, payload_length)
+
+
+def _receive_exactly(sock: socket.socket, length: int) -> bytes:
+    chunks = []
+    while length:
+        chunk = sock.recv(min(length, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed in the middle of a message.")
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b"".join(chunks)
+
+
+@dataclass(frozen=True)
+class SplitCompileCommand:
+    """A compile command, split into its local and remote parts."""
+
+    preprocess_cmd: StringList
+    remote_args: StringList
+    output: str
+
+
+def split_compile_command(cmd: StringList) -> SplitCompileCommand:
+    """Split a compile command into a local preprocessing and a remote compilation.
+
+    The remote arguments exclude the compiler, the output path, the source file
+    and the flags that only affect preprocessing.
+    """
+    preprocess_cmd, remote_args = [cmd[0]], []
+    output = ""
+    args = iter(cmd[1:])
+    for arg in args:
+        if arg == "-o":
+            output = next(args)
+        elif arg == "-include":
+            preprocess_cmd.extend((arg, next(args)))
+        elif arg == "-c":
+            remote_args.append(arg)
+        elif arg.startswith(_PREPROCESSOR_FLAG_PREFIXES) or not arg.startswith("-"):
+            preprocess_cmd.append(arg)
+        else:
+            # Flags such as the language standard affect both steps.
+            preprocess_cmd.append(arg)
+            remote_args.append(arg)
+    preprocess_cmd.append("-E")
+    return SplitCompileCommand(preprocess_cmd, remote_args, output)
+
+
+def _parse_compile_response(response: dict) -> Tuple[int, int, str]:
+    """Get the running jobs, return code and output from a compile response.
+
+    Raises:
+        ValueError: If the worker reports an error or the response is malformed.
+    """
+    try:
+        error = response.get("error")
+        if not error:
+            return (
+                int(response["running"]),
+                int(response["returncode"]),
+                str(response["output"]),
+            )
+    except (AttributeError, KeyError, TypeError) as malformed:
+        raise ValueError(f"Malformed response: {malformed!r}") from malformed
+    raise ValueError(error)
+
+
+class Worker:
+    """Connection details and load of a worker agent."""
+
+    CONNECT_TIMEOUT = 5.0
+    COMPILE_TIMEOUT = 600.0
+
+    def __init__(self, address: str):
+        """Create an instance from a `host[:port]` address."""
+        host, _, port = address.partition(":")
+        self.address = (host, int(port) if port else DEFAULT_WORKER_PORT)
+        self.slots = 0
+        # Jobs running on the worker for other builds.
+        self.external_load = 0
+
+    def __str__(self) -> str:
+        """Get the address of the worker."""
+        return f"{self.address[0]}:{self.address[1]}"
+
+    def request(self, header: dict, payload: bytes = b"") -> Tuple[dict, bytes]:
+        """Send a request to the worker and wait for its response."""
+        with socket.create_connection(
+            self.address, timeout=Worker.CONNECT_TIMEOUT
+        ) as sock:
+            sock.settimeout(Worker.COMPILE_TIMEOUT)
+            send_message(sock, header, payload)
+            return receive_message(sock)
+
+
+class DistributedCompiler:
+    """Runs compile jobs on worker agents, falling back to local compilation.
+
+    Each job goes to the worker with the lowest load relative to its number of
+    slots, counting the jobs of this build and the jobs of other builds that
+    the worker reports in each response. If all workers are busy, the job is compiled
+    locally. Jobs whose remote compilation fails for any reason, including a
+    compile error, are retried locally, so that diagnostics come from the same
+    machine and workers can never fail the build by themselves.
+
+    Jobs are scheduled for the local jobs and the worker slots together, so
+    local compilations are limited to `local_jobs` on their own, whatever the
+    number of jobs that fall back from the workers.
+    """
+
+    def __init__(self, worker_addresses: List[str], local_jobs: int):
+        """Create an instance, querying the workers for their capacity."""
+        self._lock = threading.Lock()
+        self._local_slots = threading.Semaphore(local_jobs)
+        self._workers: List[Worker] = []
+        self._in_flight: Dict[Worker, int] = {}
+
+        for address in worker_addresses:
+            # Malformed addresses and status responses skip the worker as well.
+            try:
+                worker = Worker(address)
+                status, _ = worker.request({"type": "status"})
+                worker.slots = status["slots"]
+                worker.external_load = status["running"]
+            except (OSError, ValueError, KeyError) as error:
+                fancy_print(
+                    f"Worker {address} is not usable, it will not be used: {error}",
+                    msg_type=MessageType.WARNING,
+                )
+                continue
+            self._workers.append(worker)
+            self._in_flight[worker] = 0
+
+    @property
+    def capacity(self) -> int:
+        """Get the number of jobs that the workers can run concurrently."""
+        return sum(worker.slots for worker in self._workers)
+
+    def run_job(self, job: Job) -> JobResult:
+        """Run a compile job on a worker, or locally if that is not possible."""
+        worker = self._acquire_worker()
+        if worker is None:
+            return self._run_locally(job)
+
+        try:
+            job_result = self._run_remotely(worker, job)
+        finally:
+            self._release_worker(worker)
+
+        if job_result is None or not job_result.success:
+            return self._run_locally(job)
+
+        report_job(job_result)
+        return job_result
+
+    def _run_locally(self, job: Job) -> JobResult:
+        with self._local_slots:
+            return run_job(job)
+
+    def _acquire_worker(self) -> Optional[Worker]:
+        with self._lock:
+            available = [
+                worker
+                for worker in self._workers
+                if self._in_flight[worker] < worker.slots
+            ]
+            if not available:
+                return None
+            worker = min(
+                available,
+                key=lambda w: (self._in_flight[w] + w.external_load) / w.slots,
+            )
+            self._in_flight[worker] += 1
+            return worker
+
+    def _release_worker(self, worker: Worker):
+        with self._lock:
+            self._in_flight[worker] -= 1
+
+    def _disable_worker(self, worker: Worker, reason: str):
+        with self._lock:
+            if worker not in self._workers:
+                return
+            self._workers.remove(worker)
+        fancy_print(
+            f"Worker {worker} failed, it will not be used anymore: {reason}",
+            msg_type=MessageType.WARNING,
+        )
+
+    def _run_remotely(self, worker: Worker, job: Job) -> Optional[JobResult]:
+        split_cmd = split_compile_command(job.cmd)
+
+        # pylint: disable=subprocess-run-check
+        preprocessed = subprocess.run(
+            split_cmd.preprocess_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        if preprocessed.returncode != 0:
+            return None
+
+        try:
+            response, objfile = worker.request(
+                {
+                    "type": "compile",
+                    "compiler": job.cmd[0],
+                    "compiler_version": compiler_version(job.cmd[0]),
+                    "args": split_cmd.remote_args,
+                },
+                preprocessed.stdout,
+            )
+            running, returncode, output = _parse_compile_response(response)
+        except (OSError, ValueError) as error:
+            self._disable_worker(worker, str(error))
+            return None
+
+        # The worker reports the other jobs it is running, which includes the
+        # other jobs of this build.
+        with self._lock:
+            worker.external_load = max(0, running - (self._in_flight[worker] - 1))
+        if returncode != 0:
+            return None
+
+        staging = f"{split_cmd.output}.{os.getpid()}.tmp"
+        with open(staging, "wb") as staging_file:
+            staging_file.write(objfile)
+        os.replace(staging, split_cmd.output)
+
+        return JobResult(job, returncode, f"Compiled on {worker}.\n{output}")
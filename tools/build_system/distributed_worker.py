@@ -0,0 +1,129 @@
+"""Worker agent of distributed compilation, compiling preprocessed units over TCP.
+
+Run one agent per machine, or several on one machine for testing, e.g.
+
+    python3 -m tools.build_system.distributed_worker --port 3632 --slots 8
+
+and then build with `--distribute localhost:3632`. The agent compiles whatever
+it receives, therefore it must only be reachable from trusted machines.
+"""
+import argparse
+import os
+import socketserver
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from tools.build_system.constants import COMPILERS
+from tools.build_system.distributed import (
+    DEFAULT_WORKER_PORT,
+    compiler_version,
+    receive_message,
+    send_message,
+)
+
+# Only flags that affect code generation and diagnostics are accepted, the
+# ones that pass options to other tools or load plugins are not.
+_ALLOWED_FLAG_PREFIXES = ("-W", "-std=", "-O", "-g", "-f", "-m", "-c", "-pthread")
+_FORBIDDEN_FLAG_PREFIXES = ("-Wl,", "-Wa,", "-Wp,", "-fplugin", "-wrapper")
+
+
+def _is_allowed_flag(flag: str) -> bool:
+    return flag.startswith(_ALLOWED_FLAG_PREFIXES) and not flag.startswith(
+        _FORBIDDEN_FLAG_PREFIXES
+    )
+
+
+class WorkerRequestHandler(socketserver.BaseRequestHandler):
+    """Answer status requests and compile preprocessed units."""
+
+    server: "WorkerServer"
+
+    def handle(self):
+        """Handle a single request of a connection."""
+        header, payload = receive_message(self.request)
+        if header["type"] == "status":
+            send_message(
+                self.request,
+                {"slots": self.server.slots, "running": self.server.running},
+            )
+        elif header["type"] == "compile":
+            self._compile(header, payload)
+        else:
+            send_message(self.request, {"error": f"Unknown request {header['type']}"})
+
+    def _compile(self, header: dict, preprocessed: bytes):
+        compiler, args = header["compiler"], header["args"]
+        if compiler not in COMPILERS or not all(map(_is_allowed_flag, args)):
+            send_message(self.request, {"error": f"Rejected flags of {compiler}."})
+            return
+        if compiler_version(compiler) != header["compiler_version"]:
+            send_message(self.request, {"error": f"Different version of {compiler}."})
+            return
+
+        with self.server.slot_semaphore, tempfile.TemporaryDirectory() as tmp_dir:
+            with self.server.running_lock:
+                self.server.running += 1
+            try:
+                unit = Path(tmp_dir) / "unit.ii"
+                objfile = Path(tmp_dir) / "unit.o"
+                unit.write_bytes(preprocessed)
+                # pylint: disable=subprocess-run-check
+                result = subprocess.run(
+                    [compiler, *args, "-x", "c++-cpp-output", str(unit)]
+                    + ["-o", str(objfile)],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                )
+                content = objfile.read_bytes() if result.returncode == 0 else b""
+            finally:
+                with self.server.running_lock:
+                    self.server.running -= 1
+
+            send_message(
+                self.request,
+                {
+                    "returncode": result.returncode,
+                    "output": result.stdout.decode("utf-8", errors="replace"),
+                    "running": self.server.running,
+                },
+                content,
+            )
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    """TCP server of a worker agent, compiling at most `slots` units at a time."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, slots: int):
+        """Create an instance."""
+        super().__init__(address, WorkerRequestHandler)
+        self.slots = slots
+        self.slot_semaphore = threading.BoundedSemaphore(slots)
+        self.running = 0
+        self.running_lock = threading.Lock()
+
+
+def main():
+    """Run the worker agent until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", default=DEFAULT_WORKER_PORT, type=int)
+    parser.add_argument("--slots", default=os.cpu_count() or 1, type=int)
+    args = parser.parse_args()
+
+    server = WorkerServer((args.host, args.port), args.slots)
+    print(f"Compiling with {args.slots} slot(s) at {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -57,6 +57,11 @@ def fancy_separator(length: Optional[int] = 0):
     fancy_print("=" * length, msg_type=MessageType.OTHER)
 
 
+def fancy_print_command(cmd: StringList):
+    """Print a command line to stdout in a nice format."""
+    fancy_print(_format_line(cmd), MessageType.NONE)
+
+
 def fancy_run(
     cmd: Union[str, StringList],
     error_message: Optional[str] = "",
@@ -72,8 +77,7 @@ def fancy_run(
     # TODO: no longer necessary in python3.8, convert to subprocess.run(capture_output=True)
     suppressing_kwargs = {}
     if not silent:
-        msg = _format_line(cmd)
-        fancy_print(msg, MessageType.NONE)
+        fancy_print_command(cmd)
     else:
         suppressing_kwargs = {
             "stdout": subprocess.DEVNULL,
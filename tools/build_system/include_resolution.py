@@ -1,14 +1,22 @@
 """Tools for representing included headers and extracting them from source files."""
 from __future__ import annotations
 
-import re
+import hashlib
+from collections import defaultdict
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
 
-from tools.build_system.code_util import get_all_headers
-from tools.build_system.constants import CPP_INCLUDE_STR, HEADER_EXTENSIONS
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.code_util import calculate_checksum, get_all_headers
+from tools.build_system.constants import HEADER_EXTENSIONS
 from tools.build_system.dependencies import Dependencies
-from tools.build_system.source_resolution import SourceType, resolve_source_file_type
+from tools.build_system.source_resolution import (
+    SourceType,
+    resolve_source_file_type,
+    scan_source_file,
+)
 from tools.build_system.typing import OptString, PathString, StringList
 
 
@@ -24,6 +32,225 @@ class HeaderFileDoesNotExist(Exception):
     """Exception to be raised when a header file could not be found in the repository."""
 
 
+class AmbigousHeader(Exception):
+    """Exception to be raised when an include statement matches multiple headers."""
+
+
+class HeaderIndex:
+    """Index of header files, keyed by the include statements that refer to them.
+
+    A header `/a/b/include/b/c.h` is indexed by each of its path suffixes,
+    i.e. `c.h`, `b/c.h`, `include/b/c.h` and so on, so that looking up an
+    include statement takes a single dictionary access.
+    """
+
+    def __init__(self, headers: Iterable[str]):
+        """Create an instance."""
+        self._headers_by_suffix: Dict[str, StringList] = defaultdict(list)
+        for header in headers:
+            parts = Path(header).parts
+            for idx in range(1, len(parts)):
+                self._headers_by_suffix["/".join(parts[idx:])].append(header)
+
+    def find(self, include_statement: str) -> OptString:
+        """Find the header that an include statement refers to.
+
+        Raises:
+            AmbigousHeader: If the include statement matches multiple headers.
+        """
+        key = "/".join(Path(include_statement).parts)
+        candidates = self._headers_by_suffix.get(key, [])
+        if len(candidates) > 1:
+            raise AmbigousHeader(
+                f"Inclusion {include_statement} matches multiple headers:\n"
+                f"\t{', '.join(candidates)}."
+            )
+        return candidates[0] if candidates else None
+
+
+@lru_cache(maxsize=1)
+def get_header_index() -> HeaderIndex:
+    """Get the index of all headers in the repository, built once per run."""
+    return HeaderIndex(get_all_headers())
+
+
+@dataclass(frozen=True)
+class HeaderClosureRecord:
+    """Inclusions of a header, as of the header's content with the given checksum."""
+
+    checksum: str
+    direct: FrozenSet[str]
+    closure: FrozenSet[str]
+
+
+class HeaderClosures:
+    """Transitive closures of the headers included by each header.
+
+    A closure is computed at most once per run and shared by all the sources
+    including the header. Closures are persisted across runs, and a persisted
+    closure is reused as long as neither the header itself nor any header in its
+    closure has changed. A changed header is re-parsed, while the direct
+    inclusions of an unchanged one are reused even if its closure is outdated.
+    Persisted closures are discarded once headers are added or removed, since
+    inclusions may resolve to other headers then.
+    """
+
+    HEADERS_KEY = "header_closures.headers"
+
+    def __init__(self, records: Optional[Dict[str, HeaderClosureRecord]] = None):
+        """Create an instance."""
+        self._records: Dict[str, HeaderClosureRecord] = records or {}
+        self._closures: Dict[str, FrozenSet[str]] = {}
+        self._checksums: Dict[str, str] = {}
+        self._changed: Set[str] = set()
+
+    @classmethod
+    def load(
+        cls, database: BuildDatabase, headers: Optional[Iterable[str]] = None
+    ) -> HeaderClosures:
+        """Load closures of previous runs from the build database.
+
+        Closures are only loaded if the headers of the repository, or the given
+        `headers`, are the same as in the run that stored them.
+        """
+        fingerprint = _fingerprint_headers(headers)
+        if database.get_meta(HeaderClosures.HEADERS_KEY) != fingerprint:
+            database.clear_header_closures()
+            database.set_meta(HeaderClosures.HEADERS_KEY, fingerprint)
+            return cls()
+
+        return cls(
+            {
+                header: HeaderClosureRecord(checksum, direct, closure)
+                for header, checksum, direct, closure in (
+                    database.get_header_closures().values()
+                )
+            }
+        )
+
+    def save(self, database: BuildDatabase):
+        """Store closures that were recomputed in this run."""
+        rows = []
+        for header in self._changed:
+            record = self._records[header]
+            rows.append((header, record.checksum, record.direct, record.closure))
+        database.put_header_closures(rows)
+        self._changed.clear()
+
+    def closure(self, header: str) -> FrozenSet[str]:
+        """Get all headers that are included by a header, directly or transitively."""
+        if header not in self._closures and not self._restore_closure(header):
+            self._compute_closures(header)
+        return self._closures[header]
+
+    def _restore_closure(self, header: str) -> bool:
+        """Reuse the persisted closure of a header, if nothing in it has changed."""
+        record = self._records.get(header)
+        if (
+            record
+            and self._is_unchanged(header)
+            and all(map(self._is_unchanged, record.closure))
+        ):
+            self._closures[header] = record.closure
+            return True
+        return False
+
+    def _compute_closures(self, root: str):
+        """Compute the closures of the headers reachable from a header.
+
+        Headers that include each other have the same closure, so closures are
+        computed per strongly connected component of the inclusion graph with
+        Tarjan's algorithm. A closure is only stored once its component is
+        complete, never while a circular inclusion is still being followed.
+        """
+        indices: Dict[str, int] = {}
+        low_links: Dict[str, int] = {}
+        direct_inclusions: Dict[str, FrozenSet[str]] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+
+        def visit(header: str):
+            indices[header] = low_links[header] = len(indices)
+            stack.append(header)
+            on_stack.add(header)
+
+            record = self._records.get(header)
+            direct_inclusions[header] = (
+                record.direct
+                if record and self._is_unchanged(header)
+                else self._parse_direct_inclusions(header)
+            )
+            for included in direct_inclusions[header]:
+                if included in on_stack:
+                    low_links[header] = min(low_links[header], indices[included])
+                elif included in self._closures or self._restore_closure(included):
+                    # Computed in a previous component, or restored.
+                    continue
+                else:
+                    visit(included)
+                    low_links[header] = min(low_links[header], low_links[included])
+
+            if low_links[header] != indices[header]:
+                return
+
+            component = set()
+            while header not in component:
+                member = stack.pop()
+                on_stack.remove(member)
+                component.add(member)
+
+            closure: Set[str] = set()
+            for member in component:
+                for included in direct_inclusions[member]:
+                    closure.add(included)
+                    if included not in component:
+                        closure.update(self._closures[included])
+            for member in component:
+                self._closures[member] = frozenset(closure)
+                self._records[member] = HeaderClosureRecord(
+                    self._checksum(member),
+                    direct_inclusions[member],
+                    frozenset(closure),
+                )
+                self._changed.add(member)
+
+        visit(root)
+
+    def _is_unchanged(self, header: str) -> bool:
+        record = self._records.get(header)
+        if not record:
+            return False
+        try:
+            return record.checksum == self._checksum(header)
+        except FileNotFoundError:
+            return False
+
+    def _checksum(self, header: str) -> str:
+        if header not in self._checksums:
+            self._checksums[header] = calculate_checksum(header)
+        return self._checksums[header]
+
+    @staticmethod
+    def _parse_direct_inclusions(header: str) -> FrozenSet[str]:
+        found = map(
+            _find_header_relpath_with_include_statement,
+            _parse_include_statements(header),
+        )
+        return frozenset(filter(None, found))
+
+
+def _fingerprint_headers(headers: Optional[Iterable[str]]) -> str:
+    """Fingerprint a set of headers, all headers of the repository by default."""
+    headers = get_all_headers() if headers is None else headers
+    return hashlib.sha256("\n".join(sorted(headers)).encode()).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_header_closures() -> HeaderClosures:
+    """Get closures shared within a run, for callers without persisted ones."""
+    return HeaderClosures()
+
+
 @dataclass(frozen=True)
 class IncludedHeaders:
     """Full paths to included headers in a source file."""
@@ -35,7 +262,7 @@ class IncludedHeaders:
     @property
     def all(self) -> StringList:
         """Get a complete list of included headers."""
-        return [*self.internal, *self.external] + [self.own] if self.own else []
+        return [*self.internal, *self.external, *([self.own] if self.own else [])]
 
     def __str__(self) -> str:
         """Get a nice string representation of this target."""
@@ -50,9 +277,13 @@ class IncludedHeaders:
 
     @classmethod
     def get(
-        cls, source_file_path: PathString, dependencies: Dependencies
+        cls,
+        source_file_path: PathString,
+        dependencies: Dependencies,
+        closures: Optional[HeaderClosures] = None,
     ) -> IncludedHeaders:
         """Get list of full paths to internal and external headers included in a source file."""
+        closures = closures or get_header_closures()
         own_header_candidates: StringList = []
         internal_includes_paths, external_includes_paths = [], []
 
@@ -67,7 +298,7 @@ class IncludedHeaders:
             if found_external:
                 external_includes_paths.append(found_external)
 
-            found_internals = _search_for_internal_headers(include_statement)
+            found_internals = _search_for_internal_headers(include_statement, closures)
             if found_internals:
                 internal_includes_paths.extend(found_internals)
 
@@ -91,57 +322,34 @@ class IncludedHeaders:
 
 
 def _parse_include_statements(source_file_path: PathString) -> StringList:
-    headers = []
-    with open(source_file_path, "r") as f:
-        for line in f.read().splitlines():
-            header_exts_regex_group = "(" + "|".join(HEADER_EXTENSIONS) + ")"
-            include_candidate = re.match(
-                rf'^{CPP_INCLUDE_STR} ".*\.{header_exts_regex_group}"$', line
-            )
-            if include_candidate:
-                header = include_candidate.string
-                for substr_to_remove in [CPP_INCLUDE_STR, '"']:
-                    header = header.replace(substr_to_remove, "")
-                headers.append(header.strip())
-    return headers
+    return list(scan_source_file(source_file_path).includes)
 
 
 def _find_header_relpath_with_include_statement(include_statement: str) -> OptString:
-    for header in get_all_headers():
-        if include_statement in header:  # check for substring
-            return header
-    return None
+    return get_header_index().find(include_statement)
 
 
 def _search_for_own_header(
     source_file_path: PathString, include_statement: str
 ) -> OptString:
     """Scan include statement that would match the source file's name."""
+    included_name = Path(include_statement).name
     for ext in HEADER_EXTENSIONS:
         own_header_candidate = Path(source_file_path).with_suffix(f".{ext}").name
-        if own_header_candidate in include_statement:  # check for substring
+        if own_header_candidate == included_name:
             return _find_header_relpath_with_include_statement(include_statement)
     return None
 
 
-def _search_for_internal_headers(include_statement: str) -> StringList:
-    """Accumulate a list of headers by recursively searching all inclusions."""
-
-    def collect_headers_recursively(header_file_path: str):
-        inclusions = _parse_include_statements(header_file_path)
-        for inc in inclusions:
-            inc_relpath = _find_header_relpath_with_include_statement(inc)
-            all_found_headers.add(inc_relpath)
-            collect_headers_recursively(inc_relpath)
-
-    all_found_headers = set()
-
+def _search_for_internal_headers(
+    include_statement: str, closures: HeaderClosures
+) -> StringList:
+    """Accumulate a list of the included header and all headers it includes."""
     found_header = _find_header_relpath_with_include_statement(include_statement)
-    if found_header:
-        all_found_headers.add(found_header)
-        collect_headers_recursively(found_header)
+    if not found_header:
+        return []
 
-    return sorted(all_found_headers)
+    return sorted({found_header, *closures.closure(found_header)})
 
 
 def _search_for_external_headers(
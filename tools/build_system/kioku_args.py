@@ -1,7 +1,11 @@
 """Argument parsing types and utilities."""
 import argparse
+import os
 
 from tools.build_system.constants import CLANG_LATEST, COMPILERS, CPP_STANDARDS
+from tools.build_system.kioku_config import DEPENDENCY_MIRROR_DIR_KEY
+from tools.build_system.linker_selection import LINKER_CHOICES
+from tools.build_system.remote_cache import RemoteCacheMode
 
 STORE_TRUE = "store_true"
 
@@ -9,6 +13,7 @@ STORE_TRUE = "store_true"
 class Modes:
     """Running modes for the main program."""
 
+    BENCH_LINK = "bench-link"
     BUILD = "build"
     BUILD_DOCKER = "build_docker"
     DEBUG = "debug"
@@ -23,39 +28,173 @@ def parse_args() -> argparse.Namespace:
     subparsers = parser.add_subparsers(help="", dest="subparser")
 
     # =========
-    parser_build = subparsers.add_parser(Modes.BUILD, help="Build targets.")
+    # Options of the modes that build, i.e. build and bench-link.
+    build_options = argparse.ArgumentParser(add_help=False)
 
-    parser_build.add_argument(
+    build_options.add_argument(
         "-t",
         "--target",
         default=".",
         help="Path to directory that contains targets to build.",
     )
 
-    parser_build.add_argument("--compiler", default=CLANG_LATEST, choices=COMPILERS)
+    build_options.add_argument("--compiler", default=CLANG_LATEST, choices=COMPILERS)
 
-    parser_build.add_argument(
+    build_options.add_argument(
         "-d", "--debug", action=STORE_TRUE, help="Add debug symbols to the build."
     )
 
-    parser_build.add_argument(
+    build_options.add_argument(
         "--optimize", action=STORE_TRUE, help="Allow compiler optimizations."
     )
 
-    parser_build.add_argument(
+    build_options.add_argument(
         "-f",
         "--force-build",
         action=STORE_TRUE,
         help="Forcefully build the target, ignoring the cache.",
     )
 
-    parser_build.add_argument(
+    build_options.add_argument(
         "--test",
         action=STORE_TRUE,
         help="Compile and run all tests that are associated with the requested target.",
     )
 
-    parser_build.add_argument("--cpp-standard", default="17", choices=CPP_STANDARDS)
+    build_options.add_argument(
+        "--test-jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of tests to run concurrently, large gtest executables are "
+        "split into shards that run concurrently.",
+    )
+
+    build_options.add_argument(
+        "--test-timeout",
+        type=float,
+        default=None,
+        help="Time in seconds after which a running test fails.",
+    )
+
+    build_options.add_argument(
+        "--affected",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="REVISIONS",
+        help="Build and run only the tests affected by the changes since the "
+        "previous build, or by a git revision range, e.g. main..HEAD.",
+    )
+
+    build_options.add_argument(
+        "--rerun-tests",
+        action=STORE_TRUE,
+        help="Run the tests that passed before, even if they are unchanged.",
+    )
+
+    build_options.add_argument("--cpp-standard", default="17", choices=CPP_STANDARDS)
+
+    build_options.add_argument(
+        "--shared-objects",
+        action=STORE_TRUE,
+        help="Link modules as shared objects, so that changing one relinks only it.",
+    )
+
+    build_options.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of translation units to compile concurrently.",
+    )
+
+    build_options.add_argument(
+        "--link-jobs",
+        type=int,
+        default=max(1, (os.cpu_count() or 1) // 4),
+        help="Number of executables to link concurrently.",
+    )
+
+    build_options.add_argument(
+        "--no-object-cache",
+        action=STORE_TRUE,
+        help="Compile all translation units, without using the shared object cache.",
+    )
+
+    build_options.add_argument(
+        "--object-cache-size",
+        type=int,
+        default=5 * 1024,
+        help="Size limit of the shared object cache in MiB.",
+    )
+
+    build_options.add_argument(
+        "--remote-cache",
+        default=None,
+        help="Url of a remote build cache to fetch objects and executables from.",
+    )
+
+    build_options.add_argument(
+        "--remote-cache-mode",
+        default=RemoteCacheMode.READ_ONLY,
+        choices=(RemoteCacheMode.READ_ONLY, RemoteCacheMode.READ_WRITE),
+        help="Whether to upload built objects and executables to the remote cache.",
+    )
+
+    build_options.add_argument(
+        "--remote-cache-timeout",
+        type=float,
+        default=5.0,
+        help="Timeout of remote cache requests in seconds.",
+    )
+
+    build_options.add_argument(
+        "--distribute",
+        nargs="+",
+        default=[],
+        metavar="HOST[:PORT]",
+        help="Worker agents to distribute compilation to, in addition to -j jobs.",
+    )
+    build_options.add_argument(
+        "--pch-threshold",
+        default=10,
+        type=int,
+        metavar="TARGETS",
+        help="Precompile headers included by at least this many targets, 0 disables.",
+    )
+    build_options.add_argument(
+        "--unity",
+        action=STORE_TRUE,
+        help="Compile module sources in batches, unless they are compiled already.",
+    )
+    build_options.add_argument(
+        "--unity-batch-size",
+        default=8,
+        type=int,
+        metavar="SOURCES",
+        help="Maximum number of sources in a unity batch.",
+    )
+    build_options.add_argument(
+        "--linker",
+        choices=LINKER_CHOICES,
+        help="Linker to link executables with, the one saved by bench-link or auto"
+        " by default, which selects the fastest available one.",
+    )
+
+    subparsers.add_parser(Modes.BUILD, parents=[build_options], help="Build targets.")
+
+    # =========
+    parser_bench_link = subparsers.add_parser(
+        Modes.BENCH_LINK,
+        parents=[build_options],
+        help="Time the available linkers on the tests, save the fastest in the config.",
+    )
+    parser_bench_link.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="Number of times to link the tests with each linker.",
+    )
 
     # =========
     subparsers.add_parser(
@@ -76,7 +215,28 @@ def parse_args() -> argparse.Namespace:
     parser_code_qual.add_argument("--py-test", action=STORE_TRUE)
 
     # =========
-    subparsers.add_parser(Modes.DEPS, help="Manage dependencies.")
+    parser_deps = subparsers.add_parser(Modes.DEPS, help="Manage dependencies.")
+    parser_deps.add_argument(
+        "--mirror",
+        dest=DEPENDENCY_MIRROR_DIR_KEY,
+        default=None,
+        help="Directory of bare repositories named <dependency>.git to fetch "
+        "dependencies from, instead of their remotes.",
+    )
+    parser_deps.add_argument(
+        "--import-cache",
+        default=None,
+        metavar="ARCHIVE",
+        help="Import prebuilt dependencies from an archive before building them, "
+        "an absolute path or one relative to the repo root.",
+    )
+    parser_deps.add_argument(
+        "--export-cache",
+        default=None,
+        metavar="ARCHIVE",
+        help="Export all prebuilt dependencies into an archive after building them, "
+        "an absolute path or one relative to the repo root.",
+    )
 
     # =========
     subparsers.add_parser(Modes.BUILD_DOCKER, help="Build the kioku docker image.")
@@ -1,7 +1,8 @@
 """Utilities to parse the kioku config file."""
 import json
+import os
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Optional
 
 from tools.build_system.code_util import REPO_ROOT
 from tools.build_system.typing import PathString
@@ -10,6 +11,19 @@ KIOKU_CONFIG_FILE_NAME = ".kioku"
 KIOKU_CONFIG_SCHEMA_FILE_NAME = ".kiokuschema.json"
 CONFIG_SCHEMA_PATH = Path(REPO_ROOT) / KIOKU_CONFIG_SCHEMA_FILE_NAME
 
+# Optional config file key, the object cache is shared by all build directories.
+OBJECT_CACHE_DIR_KEY = "object_cache_directory"
+DEFAULT_OBJECT_CACHE_DIR = (
+    Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "kioku"
+)
+
+
+# Optional config file key, the linker saved by the bench-link mode.
+LINKER_KEY = "linker"
+
+# Optional config file key, bare repositories to fetch dependencies from.
+DEPENDENCY_MIRROR_DIR_KEY = "dependency_mirror_directory"
+
 
 class HostConfigKeys:
     """Configuration file keys."""
@@ -43,3 +57,29 @@ def parse_host_config(custom_config: Optional[PathString] = None):
     assert Path(conf[HostConfigKeys.DEPENDENCIES_DIR]).is_dir()
 
     return conf
+
+
+def read_config_value(key: str) -> Any:
+    """Read a value from the config file, None if it is not set.
+
+    Unlike `parse_host_config`, the config is not validated, so that it can be
+    read inside docker, where the host paths it holds do not exist.
+    """
+    config_file = Path(REPO_ROOT) / KIOKU_CONFIG_FILE_NAME
+    if not config_file.is_file():
+        return None
+    with open(config_file) as c_file:
+        return json.load(c_file).get(key)
+
+
+def write_config_value(key: str, value: Any):
+    """Write a value into the config file, keeping the other values."""
+    config_file = Path(REPO_ROOT) / KIOKU_CONFIG_FILE_NAME
+    conf = {}
+    if config_file.is_file():
+        with open(config_file) as c_file:
+            conf = json.load(c_file)
+    conf[key] = value
+    with open(config_file, "w") as c_file:
+        json.dump(conf, c_file, indent=4)
+        c_file.write("\n")
@@ -0,0 +1,98 @@
+"""Selection of the linker that compiler drivers link executables with."""
+import shutil
+import subprocess
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tools.build_system.typing import StringList
+
+# Linkers that can replace the default one through `-fuse-ld`, fastest first.
+FAST_LINKERS = ("mold", "lld", "gold")
+
+# Link with whatever the compiler driver links with by default.
+DEFAULT_LINKER = "default"
+AUTO_LINKER = "auto"
+LINKER_CHOICES = (AUTO_LINKER, DEFAULT_LINKER, *FAST_LINKERS)
+
+_FUSE_LD_PREFIX = "-fuse-ld="
+
+
+@lru_cache(maxsize=None)
+def is_linker_available(compiler: str, linker: str) -> bool:
+    """Check whether a compiler driver can link with a linker."""
+    if not shutil.which(compiler):
+        return False
+    # pylint: disable=subprocess-run-check
+    result = subprocess.run(
+        [compiler, f"{_FUSE_LD_PREFIX}{linker}", "-Wl,--version"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return result.returncode == 0
+
+
+def find_available_linkers(compiler: str) -> StringList:
+    """Find the fast linkers that a compiler driver can link with, fastest first."""
+    return [linker for linker in FAST_LINKERS if is_linker_available(compiler, linker)]
+
+
+def select_linker(compiler: str, requested: str = AUTO_LINKER) -> Optional[str]:
+    """Select the linker to link with, None for the default one.
+
+    A requested linker that is not available falls back to the automatic
+    selection, which is the fastest available one.
+    """
+    if requested == DEFAULT_LINKER:
+        return None
+    if requested != AUTO_LINKER and is_linker_available(compiler, requested):
+        return requested
+
+    available = find_available_linkers(compiler)
+    return available[0] if available else None
+
+
+def make_linker_flags(linker: Optional[str]) -> StringList:
+    """Make the flags that select a linker, None for the default one."""
+    return [f"{_FUSE_LD_PREFIX}{linker}"] if linker else []
+
+
+def benchmark_linkers(
+    link_commands: List[StringList], linkers: StringList, repeat: int = 3
+) -> Dict[str, float]:
+    """Measure the time it takes to run all link commands with each linker.
+
+    Commands must select no linker, and their outputs are redirected into a
+    temporary directory. The best time of `repeat` runs is kept per linker.
+    Linkers that fail to link any of the commands are left out.
+    """
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for linker in linkers:
+            linker_flags = make_linker_flags(
+                None if linker == DEFAULT_LINKER else linker
+            )
+            commands = []
+            for index, command in enumerate(link_commands):
+                command = [command[0], *linker_flags, *command[1:]]
+                command[command.index("-o") + 1] = str(Path(tmp_dir) / str(index))
+                commands.append(command)
+
+            elapsed = [_time_commands(commands) for _ in range(repeat)]
+            if None not in elapsed:
+                timings[linker] = min(elapsed)
+    return timings
+
+
+def _time_commands(commands: List[StringList]) -> Optional[float]:
+    start = time.perf_counter()
+    for command in commands:
+        # pylint: disable=subprocess-run-check
+        result = subprocess.run(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        if result.returncode != 0:
+            return None
+    return time.perf_counter() - start
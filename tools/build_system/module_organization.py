@@ -63,6 +63,15 @@ class ModuleOrganization(abc.ABC):
 
         raise ModuleOrganization.InvalidOrganization
 
+    @staticmethod
+    def module_directory(source_file: PathString, header_file: OptPathString) -> Path:
+        """Get the base directory of the module that a source file belongs to."""
+        if not header_file:
+            return Path(source_file).parent
+        return ModuleOrganization._find_common_base_path(
+            Path(source_file), Path(header_file)
+        )
+
     @staticmethod
     def _find_common_base_path(first: Path, second: Path) -> Path:
         first_dir = first.parent
@@ -0,0 +1,216 @@
+"""Content-addressed store of compiled object files, shared across build directories."""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from tools.build_system.build_database import FileChecksums
+from tools.build_system.code_util import calculate_checksums, checksums_match
+from tools.build_system.target import Target
+from tools.build_system.typing import StringList
+
+
+@lru_cache(maxsize=None)
+def _compiler_identity(compiler: str) -> str:
+    """Identify a compiler by its resolved executable and version output."""
+    executable = shutil.which(compiler)
+    if not executable:
+        return compiler
+
+    executable = os.path.realpath(executable)
+    stat = os.stat(executable)
+    result = subprocess.run(
+        [executable, "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    return json.dumps(
+        [
+            executable,
+            stat.st_mtime_ns,
+            stat.st_size,
+            result.stdout.decode("utf-8", errors="replace"),
+        ]
+    )
+
+
+def _normalize_command(cmd: StringList) -> StringList:
+    """Drop the paths into the build directory, which do not affect the outputs.
+
+    Output paths are dropped, precompiled headers are named after their content.
+    """
+    normalized = list(cmd)
+    for output_flag in ("-o", "-MF"):
+        if output_flag in normalized:
+            start = normalized.index(output_flag)
+            # The flag and the path that follows it.
+            end = start + 2
+            del normalized[start:end]
+    if "-include" in normalized:
+        header_index = normalized.index("-include") + 1
+        normalized[header_index] = Path(normalized[header_index]).name
+    return normalized
+
+
+class ObjectCache:
+    """Object files stored by the hash of everything that determines their content.
+
+    The key of a compilation covers the content of its source file, the
+    content of all the headers it includes transitively, the identity of the
+    compiler and the compile command without its output path. Each key has a
+    manifest of the files that its last compilation read according to the
+    depfile, which also lists headers included with `<...>` or conditionally,
+    and the object file is stored by the key together with their checksums.
+    Therefore an object file compiled in one build directory, branch or
+    configuration is reused by any other build that would produce the same
+    object file.
+
+    Entries are hard linked into the build directory when possible, so object
+    files must be removed before they are compiled again in place. Entries are
+    touched whenever they are used, and the least recently used ones are evicted
+    once the store grows beyond its size limit.
+    """
+
+    OBJECTS_DIR = "objects"
+
+    # Eviction frees some room below the limit, so that it does not happen
+    # again on every single store.
+    EVICTION_RATIO = 0.9
+
+    def __init__(self, directory: Path, max_size: int):
+        """Create an instance, creating the store directory if necessary."""
+        self._directory = Path(directory) / ObjectCache.OBJECTS_DIR
+        self._directory.mkdir(exist_ok=True, parents=True)
+        self._max_size = max_size
+
+    @staticmethod
+    def make_key(target: Target, cmd: StringList) -> str:
+        """Make the key of the object file compiled from a target with a command."""
+        key_content = json.dumps(
+            [
+                target.source_checksum,
+                sorted(target.include_checksums),
+                _compiler_identity(cmd[0]),
+                _normalize_command(cmd),
+            ]
+        )
+        return hashlib.sha256(key_content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_object_key(key: str, dependencies: FileChecksums) -> str:
+        """Make the key of an object file compiled with a key from dependencies."""
+        key_content = json.dumps([key, sorted(dependencies.items())])
+        return hashlib.sha256(key_content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_manifest(dependencies: FileChecksums) -> bytes:
+        """Make the manifest of a key from the checksums of its dependencies."""
+        return json.dumps(dependencies, sort_keys=True).encode("utf-8")
+
+    @staticmethod
+    def read_manifest(manifest: bytes) -> Optional[FileChecksums]:
+        """Read the checksums of a manifest, None unless they match the files."""
+        try:
+            dependencies = json.loads(manifest)
+        except ValueError:
+            return None
+        if not isinstance(dependencies, dict) or not checksums_match(dependencies):
+            return None
+        return dependencies
+
+    @staticmethod
+    def make_executable_key(object_keys: StringList, cmd: StringList) -> str:
+        """Make the key of an executable linked from objects with a command.
+
+        Object files, including those archived into static libraries, are
+        identified by their keys rather than their paths.
+        """
+        key_content = json.dumps(
+            [
+                sorted(object_keys),
+                _compiler_identity(cmd[0]),
+                [
+                    arg
+                    for arg in _normalize_command(cmd)
+                    if not arg.endswith((".o", ".a"))
+                ],
+            ]
+        )
+        return hashlib.sha256(key_content.encode("utf-8")).hexdigest()
+
+    def fetch(self, key: str, output: Path) -> Optional[StringList]:
+        """Place a stored object file at the output path, if there is one.
+
+        Returns the files that the compilation depended on, or None if there is
+        no object file for their current content.
+        """
+        manifest = self._manifest_path(key)
+        try:
+            dependencies = ObjectCache.read_manifest(manifest.read_bytes())
+        except OSError:
+            return None
+        if dependencies is None:
+            return None
+
+        entry = self._entry_path(ObjectCache.make_object_key(key, dependencies))
+        if not entry.is_file():
+            return None
+
+        if output.exists():
+            output.unlink()
+        try:
+            os.link(entry, output)
+        except OSError:
+            shutil.copyfile(entry, output)
+
+        # Entries are evicted by their modification time.
+        os.utime(entry)
+        os.utime(manifest)
+        return list(dependencies)
+
+    def store(self, key: str, output: Path, dependencies: StringList):
+        """Store a compiled object file with the files its compilation depended on."""
+        checksums = calculate_checksums(dependencies)
+        entry = self._entry_path(ObjectCache.make_object_key(key, checksums))
+        entry.parent.mkdir(exist_ok=True)
+
+        # Replace atomically, as other builds may use the store concurrently.
+        staging = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+        try:
+            os.link(output, staging)
+        except OSError:
+            shutil.copyfile(output, staging)
+        os.replace(staging, entry)
+
+        # The manifest is written last, so that it never refers to a missing entry.
+        manifest = self._manifest_path(key)
+        manifest.parent.mkdir(exist_ok=True)
+        staging = manifest.with_name(f"{manifest.name}.{os.getpid()}.tmp")
+        staging.write_bytes(ObjectCache.make_manifest(checksums))
+        os.replace(staging, manifest)
+
+    def evict(self):
+        """Remove least recently used entries while the store exceeds its size limit."""
+        entries: List[Tuple[int, int, Path]] = []
+        for entry in self._directory.glob("*/*"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        if size <= self._max_size:
+            return
+
+        for _, entry_size, entry in sorted(entries):
+            if size <= self._max_size * ObjectCache.EVICTION_RATIO:
+                break
+            if entry.exists():
+                entry.unlink()
+            size -= entry_size
+
+    def _entry_path(self, key: str) -> Path:
+        return self._directory / key[:2] / f"{key[2:]}.o"
+
+    def _manifest_path(self, key: str) -> Path:
+        return self._directory / key[:2] / f"{key[2:]}.json"
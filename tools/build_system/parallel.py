@@ -0,0 +1,226 @@
+"""Utilities to run shell commands concurrently, respecting their dependencies."""
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from tools.build_system.fancy import (
+    MessageType,
+    fancy_print,
+    fancy_print_command,
+    fancy_separator,
+)
+from tools.build_system.typing import StringList
+
+DEFAULT_POOL = "default"
+
+JobKey = Tuple[str, str]
+
+# Serializes console output of the concurrently running jobs, so that the
+# command line and the output of a job are always printed together.
+_PRINT_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Job:
+    """A shell command to be run as a unit of work.
+
+    Jobs are run in a pool, each pool having its own concurrency limit. A job
+    is started only after all of its dependencies, given as keys of other jobs,
+    have finished successfully. Dependencies that are not scheduled in the same
+    run are considered to be satisfied.
+    """
+
+    name: str
+    cmd: StringList
+    error_message: str = ""
+    pool: str = DEFAULT_POOL
+    dependencies: Tuple[JobKey, ...] = ()
+
+    @property
+    def key(self) -> JobKey:
+        """Get the unique key of this job."""
+        return (self.pool, self.name)
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """Outcome of a finished job."""
+
+    job: Job
+    returncode: int
+    output: str
+
+    @property
+    def success(self) -> bool:
+        """Check if the job has finished successfully."""
+        return self.returncode == 0
+
+
+class JobGraph:
+    """Dependency graph of jobs, which yields the jobs that are ready to run."""
+
+    class CyclicDependency(Exception):
+        """Exception to be raised when jobs depend on each other circularly."""
+
+    def __init__(self, jobs: Iterable[Job]):
+        """Create an instance."""
+        self._jobs: Dict[JobKey, Job] = {job.key: job for job in jobs}
+        self._dependents: Dict[JobKey, List[JobKey]] = {key: [] for key in self._jobs}
+        self._blocking: Dict[JobKey, int] = {}
+
+        for key, job in self._jobs.items():
+            scheduled_deps = {dep for dep in job.dependencies if dep in self._jobs}
+            self._blocking[key] = len(scheduled_deps)
+            for dep in scheduled_deps:
+                self._dependents[dep].append(key)
+
+        # Prefer jobs that unblock many others, e.g. objects linked by many
+        # executables, so that downstream work can start as early as possible.
+        ready = [key for key, count in self._blocking.items() if count == 0]
+        ready.sort(key=lambda k: len(self._dependents[k]), reverse=True)
+        self._ready: Dict[str, Deque[JobKey]] = {}
+        for key in ready:
+            self._ready_queue(key[0]).append(key)
+
+        self._verify_acyclic()
+
+    @property
+    def pools(self) -> Set[str]:
+        """Get the names of all pools that the jobs run in."""
+        return {job.pool for job in self._jobs.values()}
+
+    def pop_ready(self, pool: str) -> Optional[Job]:
+        """Pop a job that is ready to run in a pool, if any."""
+        queue = self._ready_queue(pool)
+        return self._jobs[queue.popleft()] if queue else None
+
+    def mark_done(self, job: Job):
+        """Mark a job as successfully finished, releasing its dependents."""
+        for dependent in self._dependents[job.key]:
+            self._blocking[dependent] -= 1
+            if self._blocking[dependent] == 0:
+                self._ready_queue(dependent[0]).append(dependent)
+
+    def _ready_queue(self, pool: str) -> Deque[JobKey]:
+        return self._ready.setdefault(pool, deque())
+
+    def _verify_acyclic(self):
+        """Verify that all jobs are reachable, i.e. there are no cycles.
+
+        Raises:
+            CyclicDependency: If a job can never become ready.
+        """
+        blocking = dict(self._blocking)
+        visit = [key for key, count in blocking.items() if count == 0]
+        visited = 0
+        while visit:
+            key = visit.pop()
+            visited += 1
+            for dependent in self._dependents[key]:
+                blocking[dependent] -= 1
+                if blocking[dependent] == 0:
+                    visit.append(dependent)
+
+        if visited != len(self._jobs):
+            cyclic = sorted(key[1] for key, count in blocking.items() if count)
+            raise JobGraph.CyclicDependency(
+                f"Jobs with circular dependencies: {', '.join(cyclic)}"
+            )
+
+
+def run_job(job: Job) -> JobResult:
+    """Run a job, capturing its output and printing it when the job is done."""
+    # pylint: disable=subprocess-run-check
+    result = subprocess.run(
+        job.cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    job_result = JobResult(job, result.returncode, result.stdout.decode("utf-8"))
+    report_job(job_result)
+    return job_result
+
+
+def report_job(job_result: JobResult):
+    """Print the command line and the captured output of a finished job."""
+    with _PRINT_LOCK:
+        fancy_separator()
+        fancy_print_command(job_result.job.cmd)
+        if job_result.output:
+            print(job_result.output, end="")
+        if not job_result.success:
+            fancy_print(job_result.job.error_message, msg_type=MessageType.ERROR)
+
+
+def run_jobs(
+    jobs: Iterable[Job],
+    pool_sizes: Dict[str, int],
+    on_result: Optional[Callable[[JobResult], None]] = None,
+    runners: Optional[Dict[str, Callable[[Job], JobResult]]] = None,
+    keep_going: bool = False,
+) -> List[JobResult]:
+    """Run jobs concurrently as soon as their dependencies are done.
+
+    At most `pool_sizes[pool]` jobs of a pool run at the same time. New jobs
+    are not scheduled once a job fails, unless `keep_going` is set, however
+    the jobs that are already running are waited for, so that all failures
+    are reported together. Dependents of failed jobs are never run.
+
+    `on_result` is called with the result of each job as soon as it finishes,
+    always from the calling thread. Jobs of the pools in `runners` are run by
+    the given functions instead of `run_job`, from worker threads.
+
+    Returns:
+        Results of the failed jobs, empty if all jobs were successful.
+    """
+    graph = JobGraph(jobs)
+    runners = runners or {}
+    limits = {pool: max(1, pool_sizes.get(pool, 1)) for pool in graph.pools}
+    failures = []
+
+    if not limits:
+        return failures
+
+    with ThreadPoolExecutor(max_workers=sum(limits.values())) as executor:
+        running: Dict[Future, Job] = {}
+        running_per_pool = {pool: 0 for pool in limits}
+
+        def schedule_ready_jobs():
+            for pool, limit in limits.items():
+                while running_per_pool[pool] < limit:
+                    job = graph.pop_ready(pool)
+                    if job is None:
+                        break
+                    runner = runners.get(pool, run_job)
+                    running[executor.submit(runner, job)] = job
+                    running_per_pool[pool] += 1
+
+        schedule_ready_jobs()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                running_per_pool[job.pool] -= 1
+                job_result = future.result()
+                if on_result:
+                    on_result(job_result)
+                if job_result.success:
+                    graph.mark_done(job)
+                else:
+                    failures.append(job_result)
+
+            if keep_going or not failures:
+                schedule_ready_jobs()
+
+    return failures
+
+
+def report_failures(failures: List[JobResult], title: str):
+    """Print a summary of all failed jobs."""
+    msg = f"{title}\n"
+    for failure in failures:
+        msg += f"- {failure.job.name}: {failure.returncode}\n"
+    fancy_print(msg, msg_type=MessageType.ERROR)
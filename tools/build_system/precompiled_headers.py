@@ -0,0 +1,123 @@
+"""Precompiled headers for the headers that many translation units include."""
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.code_util import (
+    calculate_checksum,
+    checksums_match,
+    parse_depfile,
+)
+from tools.build_system.target import Target
+from tools.build_system.typing import StringList
+
+HeaderSet = Tuple[str, ...]
+
+
+class PrecompiledHeaders:
+    """Precompiled headers, selected by the number of targets including each header.
+
+    Headers that are included by at least `threshold` targets, directly or
+    transitively, are precompiled. Each target is compiled with a precompiled
+    header of the selected headers that it includes itself, so that no target
+    sees a header that it would not include otherwise.
+
+    A precompiled header is named after the compiler, the flags and the headers
+    it is compiled from, and it is compiled again only when any of the files
+    that it was compiled from, as reported by the compiler, has changed.
+    """
+
+    DIR = "pch"
+
+    # Precompiling a header pays off only if it is used more than once.
+    MIN_TARGETS = 2
+
+    def __init__(self, build_directory: Path, database: BuildDatabase, threshold: int):
+        """Create an instance, a threshold of 0 disables precompiled headers."""
+        self._directory = build_directory / PrecompiledHeaders.DIR
+        self._directory.mkdir(exist_ok=True, parents=True)
+        self._database = database
+        self._threshold = threshold
+
+    def assign(self, targets: List[Target]) -> Dict[str, HeaderSet]:
+        """Select headers to precompile for each target, keyed by target name."""
+        if self._threshold <= 0:
+            return {}
+
+        included = {
+            str(target.name): set(target.includes.internal + target.includes.external)
+            for target in targets
+        }
+        counts = Counter(header for headers in included.values() for header in headers)
+        selected = {
+            header for header, count in counts.items() if count >= self._threshold
+        }
+
+        assignment = {
+            name: tuple(sorted(headers & selected))
+            for name, headers in included.items()
+        }
+        users = Counter(assignment.values())
+        return {
+            name: headers
+            for name, headers in assignment.items()
+            if headers and users[headers] >= PrecompiledHeaders.MIN_TARGETS
+        }
+
+    @staticmethod
+    def make_name(headers: HeaderSet, flags: StringList) -> str:
+        """Make the name of a precompiled header of headers, compiled with flags."""
+        content = json.dumps([list(flags), list(headers)])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    def make_header_path(self, name: str) -> Path:
+        """Make the path of the header that includes the headers to precompile."""
+        return self._directory / f"{name}.h"
+
+    def make_output_path(self, name: str, compiler: str) -> Path:
+        """Make the path of the precompiled header, where the compiler looks for it."""
+        suffix = ".gch" if "g++" in compiler else ".pch"
+        return self._directory / f"{name}.h{suffix}"
+
+    def make_depfile_path(self, name: str) -> Path:
+        """Make the path of the depfile listing the files a header is compiled from."""
+        return self._directory / f"{name}.d"
+
+    def prepare(self, name: str, headers: HeaderSet, compiler: str) -> bool:
+        """Write the header to precompile, return whether it needs to be compiled."""
+        header_path = self.make_header_path(name)
+        content = "".join(f'#include "{header}"\n' for header in headers)
+        if not header_path.is_file() or header_path.read_text() != content:
+            header_path.write_text(content)
+
+        output_path = self.make_output_path(name, compiler)
+        recorded = self._database.get_precompiled_header_dependencies(name)
+        if recorded is not None and output_path.is_file() and checksums_match(recorded):
+            return False
+
+        # Compilers do not verify the content of a precompiled header, an
+        # outdated one must never be left in place.
+        if output_path.exists():
+            output_path.unlink()
+        return True
+
+    def dependencies(self, name: str) -> StringList:
+        """Get the files that a precompiled header was compiled from."""
+        try:
+            return parse_depfile(self.make_depfile_path(name))
+        except FileNotFoundError:
+            return []
+
+    def record(self, name: str):
+        """Record a successful compilation of a precompiled header."""
+        self._database.set_precompiled_header_dependencies(
+            name,
+            {
+                file: calculate_checksum(file)
+                for file in self.dependencies(name)
+                if Path(file).is_file()
+            },
+        )
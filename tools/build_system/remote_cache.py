@@ -0,0 +1,147 @@
+"""Client of a remote build cache, shared by multiple machines over HTTP.
+
+The protocol is plain HTTP: an artifact of a kind is read with `GET` and
+written with `PUT` at `<url>/<kind>/<key>`, where the key is a content hash.
+A missing artifact is answered with 404. See `remote_cache_server.py` for a
+reference server.
+"""
+import http.client
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+from tools.build_system.fancy import MessageType, fancy_print
+
+
+class RemoteCacheMode:
+    """Access modes of the remote cache."""
+
+    READ_ONLY = "ro"
+    READ_WRITE = "rw"
+
+
+class RemoteCache:
+    """Remote store of compiled objects, their manifests and linked executables.
+
+    A manifest lists the files that the compilation of an object read, with
+    their checksums, see `ObjectCache`.
+
+    The remote cache is an optimization only, therefore misses, timeouts and
+    any other errors are treated as cache misses. After the first connection
+    error the cache is not contacted again, so that an unreachable server
+    slows a build down only once.
+    """
+
+    OBJECTS = "objects"
+    MANIFESTS = "manifests"
+    EXECUTABLES = "executables"
+    KINDS = (OBJECTS, MANIFESTS, EXECUTABLES)
+
+    CONCURRENT_REQUESTS = 8
+
+    def __init__(
+        self, url: str, mode: str = RemoteCacheMode.READ_ONLY, timeout: float = 5.0
+    ):
+        """Create an instance."""
+        assert mode in (RemoteCacheMode.READ_ONLY, RemoteCacheMode.READ_WRITE)
+        self._url = url.rstrip("/")
+        self._writable = mode == RemoteCacheMode.READ_WRITE
+        self._timeout = timeout
+        self._available = True
+        self._availability_lock = threading.Lock()
+        self._uploads = ThreadPoolExecutor(max_workers=RemoteCache.CONCURRENT_REQUESTS)
+
+    def get(self, kind: str, key: str) -> Optional[bytes]:
+        """Download an artifact, return None if it is not available."""
+        return self._send(self._make_url(kind, key), "GET")
+
+    def put(self, kind: str, key: str, content: bytes):
+        """Upload an artifact, if the cache is writable."""
+        if not self._writable:
+            return
+        self._send(self._make_url(kind, key), "PUT", content)
+
+    def get_all(self, kind: str, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Download artifacts concurrently, return the available ones by key."""
+        keys = list(keys)
+        with ThreadPoolExecutor(RemoteCache.CONCURRENT_REQUESTS) as executor:
+            contents = list(executor.map(lambda key: self.get(kind, key), keys))
+        return {
+            key: content for key, content in zip(keys, contents) if content is not None
+        }
+
+    def fetch_all(self, kind: str, outputs: Dict[str, Path]) -> Set[str]:
+        """Download artifacts concurrently to their output paths.
+
+        Args:
+            kind: Kind of the artifacts.
+            outputs: Output paths, keyed by the keys of the artifacts.
+
+        Returns:
+            Keys of the downloaded artifacts.
+        """
+        fetched = set()
+        for key, content in self.get_all(kind, outputs).items():
+            output = outputs[key]
+            staging = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+            staging.write_bytes(content)
+            os.replace(staging, output)
+            fetched.add(key)
+        return fetched
+
+    def upload(self, kind: str, key: str, path: Path):
+        """Upload a file in the background, if the cache is writable."""
+        if self._writable and self._available:
+            # Read right away, the file may be rebuilt before the upload starts.
+            self.upload_content(kind, key, path.read_bytes())
+
+    def upload_content(self, kind: str, key: str, content: bytes):
+        """Upload an artifact in the background, if the cache is writable."""
+        if self._writable and self._available:
+            self._uploads.submit(self.put, kind, key, content)
+
+    def close(self):
+        """Wait for the pending uploads to finish."""
+        self._uploads.shutdown(wait=True)
+
+    def _make_url(self, kind: str, key: str) -> str:
+        assert kind in RemoteCache.KINDS
+        return f"{self._url}/{kind}/{key}"
+
+    def _send(
+        self, url: str, method: str, data: Optional[bytes] = None
+    ) -> Optional[bytes]:
+        if not self._available:
+            return None
+
+        try:
+            request = urllib.request.Request(url, data=data, method=method)
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as error:
+            if error.code != 404:
+                fancy_print(
+                    f"Remote cache request {url} failed: {error}",
+                    msg_type=MessageType.WARNING,
+                )
+        except (
+            urllib.error.URLError,
+            http.client.HTTPException,
+            OSError,
+            ValueError,
+        ) as error:
+            # Invalid URLs and malformed responses disable the cache like
+            # unreachable servers do.
+            with self._availability_lock:
+                was_available, self._available = self._available, False
+            if was_available:
+                fancy_print(
+                    f"Remote cache {self._url} is not usable, it will not be"
+                    f" used in this build: {error}",
+                    msg_type=MessageType.WARNING,
+                )
+        return None
@@ -0,0 +1,108 @@
+"""Reference server of the remote build cache, storing artifacts in a directory.
+
+It is meant for local testing and small setups, e.g.
+
+    python3 -m tools.build_system.remote_cache_server --directory /tmp/cache
+
+and then building with `--remote-cache http://localhost:8080 --remote-cache-mode rw`.
+"""
+import argparse
+import os
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from tools.build_system.remote_cache import RemoteCache
+
+DEFAULT_PORT = 8080
+
+_ARTIFACT_PATH_PATTERN = re.compile(
+    rf"^/({'|'.join(RemoteCache.KINDS)})/([0-9a-f]{{16,128}})$"
+)
+
+
+class RemoteCacheRequestHandler(BaseHTTPRequestHandler):
+    """Serve GET and PUT requests of artifacts from the directory of the server."""
+
+    server: "RemoteCacheServer"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send an artifact."""
+        path = self._artifact_path()
+        if path is None:
+            self.send_error(HTTPStatus.BAD_REQUEST)
+        elif not path.is_file():
+            self.send_error(HTTPStatus.NOT_FOUND)
+        else:
+            content = path.read_bytes()
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Store an artifact."""
+        path = self._artifact_path()
+        if path is None:
+            self.send_error(HTTPStatus.BAD_REQUEST)
+            return
+
+        content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path.parent.mkdir(exist_ok=True, parents=True)
+        staging = path.with_name(f"{path.name}.{os.getpid()}.{id(self)}.tmp")
+        staging.write_bytes(content)
+        os.replace(staging, path)
+
+        self.send_response(HTTPStatus.CREATED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Log requests only if the server is verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _artifact_path(self) -> Optional[Path]:
+        match = _ARTIFACT_PATH_PATTERN.match(self.path)
+        if not match:
+            return None
+        kind, key = match.groups()
+        return self.server.directory / kind / key[:2] / key[2:]
+
+
+class RemoteCacheServer(ThreadingHTTPServer):
+    """HTTP server of the remote build cache."""
+
+    daemon_threads = True
+
+    def __init__(self, address, directory: Path, verbose: bool = False):
+        """Create an instance, serving artifacts stored in the directory."""
+        super().__init__(address, RemoteCacheRequestHandler)
+        self.directory = Path(directory)
+        self.verbose = verbose
+
+
+def main():
+    """Run the server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directory", required=True, type=Path)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", default=DEFAULT_PORT, type=int)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = RemoteCacheServer((args.host, args.port), args.directory, args.verbose)
+    print(f"Serving the remote build cache at http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 """Utilities to represent and determine source file type."""
+import mmap
+import os
 import re
+from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+from typing import Pattern, Tuple
 
 from tools.build_system.constants import (
     CPP_INCLUDE_STR,
@@ -30,52 +35,70 @@ class SourceType(Enum):
         """Exception to be raised when a source extension is not valid."""
 
 
-def _is_main_entrypoint(source_file_path: PathString) -> bool:
-    """Determine if a source file contains a main entrypoint."""
-    with open(source_file_path, "r") as f:
-        re_query = f"^({'|'.join(CPP_MAIN_RETURN_TYPES)}) {CPP_MAIN_STR}{MATCHING_FUNC_PARENTHESIS_REGEXP}"
-        for line in f.read().splitlines():
-            if re.match(re_query, line):
-                return True
-    return False
-
-
-def _is_gtest_file(source_file_path: PathString) -> bool:
-    """Determine if a source file is a googletest file."""
-    with open(source_file_path, "r") as f:
-        for line in f.read().splitlines():
-            re_query = (
-                f"^({'|'.join(GTEST_TEST_MACROS)}){MATCHING_FUNC_PARENTHESIS_REGEXP}.*"
-            )
-            gtest_candidate = re.match(re_query, line)
-            if gtest_candidate:
-                if "test" not in str(source_file_path):
-                    fancy_print(
-                        f"The file {source_file_path} seems to be a googletest file,"
-                        + " "
-                        + "however it does not have the prefix test_* in the filename."
-                        + " "
-                        + "Having this format is suggested as it helps kioku to resolve"
-                        + " "
-                        + "dependencies.",
-                        MessageType.WARNING,
-                    )
-                return True
-    return False
-
-
-def _is_regular_translation_unit(source_file_path: str) -> bool:
-    """Determine whether source file is a non-main, non-test file.
-
-    Assumes at least one include statement is present in the file.
+@dataclass(frozen=True)
+class SourceScan:
+    """Markers found in a source or header file by a single scan of its content."""
+
+    includes: Tuple[str, ...]
+    has_regular_include: bool
+    has_gtest_macro: bool
+    has_main_entrypoint: bool
+
+
+def _make_scan_pattern() -> Pattern[bytes]:
+    header_exts = "|".join(HEADER_EXTENSIONS)
+    gtest_macros = "|".join(GTEST_TEST_MACROS)
+    main_return_types = "|".join(CPP_MAIN_RETURN_TYPES)
+    # Alternatives are tried in order at the beginning of each line, therefore
+    # a proper include statement is captured before the looser regular include.
+    alternatives = [
+        rf'(?P<include>{CPP_INCLUDE_STR} "(?P<header>.*\.({header_exts}))"\r?$)',
+        rf'(?P<regular>{CPP_INCLUDE_STR}.*({header_exts})"\r?$)',
+        rf"(?P<gtest>({gtest_macros}){MATCHING_FUNC_PARENTHESIS_REGEXP})",
+        rf"(?P<main>({main_return_types}) {CPP_MAIN_STR}"
+        rf"{MATCHING_FUNC_PARENTHESIS_REGEXP})",
+    ]
+    return re.compile(f"^(?:{'|'.join(alternatives)})".encode(), re.MULTILINE)
+
+
+_SCAN_PATTERN = _make_scan_pattern()
+
+
+@lru_cache(maxsize=None)
+def _scan_file(file_path: str) -> SourceScan:
+    includes = []
+    has_regular_include, has_gtest_macro, has_main_entrypoint = False, False, False
+
+    with open(file_path, "rb") as f:
+        # mmap can not map empty files.
+        if os.fstat(f.fileno()).st_size == 0:
+            return SourceScan((), False, False, False)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for match in _SCAN_PATTERN.finditer(buffer):
+                if match.group("include"):
+                    includes.append(match.group("header").decode("utf-8").strip())
+                    has_regular_include = True
+                elif match.group("regular"):
+                    has_regular_include = True
+                elif match.group("gtest"):
+                    has_gtest_macro = True
+                elif match.group("main"):
+                    has_main_entrypoint = True
+
+    return SourceScan(
+        tuple(includes), has_regular_include, has_gtest_macro, has_main_entrypoint
+    )
+
+
+def scan_source_file(file_path: PathString) -> SourceScan:
+    """Scan a source or header file for include statements and source type markers.
+
+    The file is memory-mapped and matched once with a precompiled pattern. The
+    result is cached for the rest of the run, as files are not modified during
+    a build.
     """
-    with open(source_file_path, "r") as f:
-        for line in f.read().splitlines():
-            re_query = f'^{CPP_INCLUDE_STR}.*({"|".join(HEADER_EXTENSIONS)})"$'
-            regular_src_file_candidate = re.match(re_query, line)
-            if regular_src_file_candidate:
-                return True
-    return False
+    return _scan_file(str(file_path))
 
 
 def resolve_source_file_type(source_file_path: PathString) -> SourceType:
@@ -85,13 +108,26 @@ def resolve_source_file_type(source_file_path: PathString) -> SourceType:
         raise SourceType.InvalidSourceExtension(
             f"Invalid file extension for the file {source_file_path} as a target."
         )
-    # todo, the call order below matters as is_regular_translation_unit just checks
+    scan = scan_source_file(source_file_path)
+
+    # todo, the check order below matters as has_regular_include just checks
     # for regular includes.
-    if _is_gtest_file(source_file_path):
+    if scan.has_gtest_macro:
+        if "test" not in str(source_file_path):
+            fancy_print(
+                f"The file {source_file_path} seems to be a googletest file,"
+                + " "
+                + "however it does not have the prefix test_* in the filename."
+                + " "
+                + "Having this format is suggested as it helps kioku to resolve"
+                + " "
+                + "dependencies.",
+                MessageType.WARNING,
+            )
         return SourceType.TEST
-    elif _is_main_entrypoint(source_file_path):
+    elif scan.has_main_entrypoint:
         return SourceType.MAIN
-    elif _is_regular_translation_unit(source_file_path):
+    elif scan.has_regular_include:
         return SourceType.SRC
     else:
         raise SourceType.UnknownSourceType(
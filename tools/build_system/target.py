@@ -3,12 +3,20 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Set
+from typing import Dict, List, Optional, Set, Tuple
 
 from tools.build_system.build_config import BuildConfig
-from tools.build_system.code_util import REPO_ROOT, calculate_checksum, get_all_sources
+from tools.build_system.build_database import BuildDatabase, TargetRecord
+from tools.build_system.code_util import (
+    REPO_ROOT,
+    calculate_checksum,
+    checksums_match,
+    get_all_sources,
+    load_checksum_cache,
+    save_checksum_cache,
+)
 from tools.build_system.dependencies import Dependencies
-from tools.build_system.include_resolution import IncludedHeaders
+from tools.build_system.include_resolution import HeaderClosures, IncludedHeaders
 from tools.build_system.module_organization import ModuleOrganization
 from tools.build_system.source_resolution import SourceType, resolve_source_file_type
 from tools.build_system.typing import OptPathString, PathString, StringList
@@ -22,18 +30,59 @@ class Target:
     includes: IncludedHeaders
     source_checksum: str
     include_checksums: Set[str]
+    source_type: SourceType
 
     @classmethod
-    def make(cls, source_file: OptPathString, includes: IncludedHeaders):
-        """Create an instance based on the source file and included headers."""
+    def make(
+        cls,
+        source_file: OptPathString,
+        includes: IncludedHeaders,
+        known_source_types: Optional[Dict[str, SourceType]] = None,
+    ):
+        """Create an instance based on the source file and included headers.
+
+        The source file is classified only if its checksum is not found among
+        the `known_source_types`, which map source checksums to source types.
+        """
         assert source_file
+        source_checksum = calculate_checksum(source_file)
+        source_type = (known_source_types or {}).get(source_checksum)
         return cls(
             source_file=source_file,
             includes=includes,
-            source_checksum=calculate_checksum(source_file),
+            source_checksum=source_checksum,
             include_checksums=(
                 set(map(calculate_checksum, includes.all)) if includes.all else set()
             ),
+            source_type=source_type or resolve_source_file_type(source_file),
+        )
+
+    @classmethod
+    def from_record(cls, record: TargetRecord) -> Target:
+        """Create an instance from its build database record."""
+        return cls(
+            source_file=record.source_file,
+            includes=IncludedHeaders(
+                record.own_header,
+                list(record.internal_headers),
+                list(record.external_headers),
+            ),
+            source_checksum=record.source_checksum,
+            include_checksums=set(record.include_checksums),
+            source_type=SourceType[record.source_type],
+        )
+
+    def to_record(self) -> TargetRecord:
+        """Make a build database record of this target."""
+        return TargetRecord(
+            name=str(self.name),
+            source_file=str(self.source_file),
+            source_checksum=self.source_checksum,
+            source_type=self.source_type.name,
+            include_checksums=frozenset(self.include_checksums),
+            own_header=self.includes.own,
+            internal_headers=tuple(self.includes.internal),
+            external_headers=tuple(self.includes.external),
         )
 
     @property
@@ -42,11 +91,6 @@ class Target:
         base_stripped = str(Path(self.source_file).relative_to(Path(REPO_ROOT)))
         return Path(base_stripped.replace("/", "-"))
 
-    @property
-    def source_type(self) -> SourceType:
-        """Get source file type of this target."""
-        return resolve_source_file_type(self.source_file)
-
     @property
     def own_includepath_statement(self) -> str:
         """Get include statement string of this target for the associated header file."""
@@ -103,14 +147,47 @@ class Target:
         return source_match and includes_match
 
 
+@dataclass(frozen=True)
+class ModuleLibrary:
+    """Module sources, built together into a static or a shared library."""
+
+    name: str
+    targets: Tuple[Target, ...]
+
+
 class TargetExploration:
     """Explore compilable files in the repo based on the given config."""
 
-    def __init__(self, build_config: BuildConfig):
-        """Create an instance."""
+    def __init__(
+        self, build_config: BuildConfig, database: Optional[BuildDatabase] = None
+    ):
+        """Create an instance.
+
+        If a build database is given, the checksums, header closures and source
+        types it holds from previous builds are reused, and updated after scanning.
+        Targets whose source and dependencies are unchanged since their last
+        compilation are restored from the database without resolving includes.
+        """
         self._target_root = build_config.target_directory
         self._explore_tests = build_config.test
         self._dependencies = Dependencies(build_config.thirdparty_dep_directory)
+        self._database = database
+
+        self._known_source_types: Dict[str, SourceType] = {}
+        self._closures = HeaderClosures()
+        self._records: Dict[str, TargetRecord] = {}
+        self._recorded_dependencies: Dict[str, Dict[str, str]] = {}
+        if database:
+            load_checksum_cache(database)
+            self._closures = HeaderClosures.load(database)
+            self._known_source_types = {
+                checksum: SourceType[source_type]
+                for checksum, source_type in database.get_source_types().items()
+            }
+            self._records = {
+                record.source_file: record for record in database.get_targets().values()
+            }
+            self._recorded_dependencies = database.get_target_dependencies()
 
     def scan_targets(self) -> List[Target]:
         """Scan targets recursively staring from the requested root directory."""
@@ -122,20 +199,85 @@ class TargetExploration:
                 continue
             targets.append(target)
 
+        if self._database:
+            save_checksum_cache(self._database)
+            self._closures.save(self._database)
         return targets
 
-    def scan_shared_object_libs(self):
-        """Scan targets to be linked as shared objects."""
-        raise NotImplementedError
+    @staticmethod
+    def find_changed_targets(
+        targets: List[Target], changed_files: StringList
+    ) -> List[Target]:
+        """Find the targets whose source file or any included header changed."""
+        changed = set(changed_files)
+        return [
+            target
+            for target in targets
+            if str(target.source_file) in changed
+            or target.includes.own in changed
+            or changed.intersection(target.includes.internal)
+        ]
+
+    @staticmethod
+    def scan_shared_object_libs(targets: List[Target]) -> List[ModuleLibrary]:
+        """Group the module sources among targets into shared objects."""
+        return TargetExploration._scan_module_libs(targets)
+
+    @staticmethod
+    def scan_static_libs(targets: List[Target]) -> List[ModuleLibrary]:
+        """Group the module sources among targets into static libraries."""
+        return TargetExploration._scan_module_libs(targets)
 
-    def scan_static_libs(self):
-        """Scan targets to be compiled as static libraries."""
-        raise NotImplementedError
+    @staticmethod
+    def _scan_module_libs(targets: List[Target]) -> List[ModuleLibrary]:
+        """Group the module sources among targets into a library per module.
+
+        Each module directory, as determined by its organization, is a library.
+        """
+        modules: Dict[Path, List[Target]] = {}
+        for target in targets:
+            if target.source_type != SourceType.SRC:
+                continue
+            module_directory = ModuleOrganization.module_directory(
+                target.source_file, target.includes.own
+            )
+            modules.setdefault(module_directory, []).append(target)
+
+        return [
+            ModuleLibrary(
+                name=str(module_directory.relative_to(REPO_ROOT)).replace("/", "-"),
+                targets=tuple(sorted(module_targets, key=lambda t: str(t.name))),
+            )
+            for module_directory, module_targets in sorted(modules.items())
+        ]
 
     def _create_target_from_source_file(self, source_file: PathString) -> Target:
-        includes = IncludedHeaders.get(source_file, self._dependencies)
+        unchanged_target = self._restore_unchanged_target(source_file)
+        if unchanged_target:
+            return unchanged_target
+
+        includes = IncludedHeaders.get(source_file, self._dependencies, self._closures)
 
         return Target.make(
             source_file=source_file,
             includes=includes,
+            known_source_types=self._known_source_types,
         )
+
+    def _restore_unchanged_target(self, source_file: PathString) -> Optional[Target]:
+        """Restore a target from its record if none of its inputs have changed.
+
+        The inputs are the files that the compiler read in the last compilation
+        of the target, so no other header can affect it.
+        """
+        record = self._records.get(str(source_file))
+        if not record or not self._recorded_dependencies.get(record.name):
+            return None
+
+        if calculate_checksum(source_file) != record.source_checksum:
+            return None
+
+        if not checksums_match(self._recorded_dependencies[record.name]):
+            return None
+
+        return Target.from_record(record)
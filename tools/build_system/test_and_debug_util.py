@@ -1,8 +1,25 @@
+import os
+import signal
 import subprocess
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
+from tools.build_system.build_database import BuildDatabase, FileChecksums
+from tools.build_system.code_util import calculate_checksum
 from tools.build_system.fancy import MessageType, fancy_print
+from tools.build_system.parallel import Job, JobResult, report_job, run_jobs
+from tools.build_system.typing import StringList
+
+TEST_POOL = "test"
+
+# Large test executables are split into shards of at least this many tests.
+MIN_TESTS_PER_SHARD = 4
+
+LIST_TESTS_TIMEOUT = 10
+
+# Return code of tests that are killed for running too long, as `timeout` does.
+TIMEOUT_RETURNCODE = 124
 
 
 def scan_debuggable_files(directories: List[Path]) -> List[Path]:
@@ -65,8 +82,121 @@ def run_in_debugger(executable: Path):
     subprocess.run(["gdb", executable])  # pylint: disable=subprocess-run-check
 
 
-def run_tests(test_executables_directory: Path, under: str = ""):
-    # pylint: disable=subprocess-run-check
+@dataclass(frozen=True)
+class ExecutableShard:
+    """A part of the tests of an executable, run by a process of its own.
+
+    Shards of gtest executables are selected by the environment variables
+    `GTEST_TOTAL_SHARDS` and `GTEST_SHARD_INDEX`.
+    """
+
+    executable: Path
+    index: int = 0
+    total: int = 1
+
+    @property
+    def name(self) -> str:
+        """Get the name of the shard."""
+        if self.total == 1:
+            return self.executable.name
+        return f"{self.executable.name} [{self.index + 1}/{self.total}]"
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """Get the environment variables that select the tests of the shard."""
+        if self.total == 1:
+            return {}
+        return {
+            "GTEST_TOTAL_SHARDS": str(self.total),
+            "GTEST_SHARD_INDEX": str(self.index),
+        }
+
+
+def run_process_group(
+    cmd: StringList, timeout: Optional[float], **kwargs
+) -> Tuple[Optional[int], str]:
+    """Run a command, capturing its output, None as return code on timeout.
+
+    The command runs in a process group of its own, which is killed as a
+    whole on timeout, since the processes it starts would keep its output open.
+    """
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+        **kwargs,
+    ) as process:
+        try:
+            output, _ = process.communicate(timeout=timeout)
+            returncode: Optional[int] = process.returncode
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            output, _ = process.communicate()
+            returncode = None
+    return returncode, output.decode("utf-8", errors="replace")
+
+
+def count_tests(executable: Path) -> int:
+    """Count the tests of a gtest executable, 0 for other executables."""
+    try:
+        returncode, output = run_process_group(
+            [str(executable), "--gtest_list_tests"], LIST_TESTS_TIMEOUT
+        )
+    except OSError:
+        return 0
+    if returncode != 0:
+        return 0
+    # Tests are listed indented below their test suites.
+    return sum(1 for line in output.splitlines() if line.startswith("  "))
+
+
+def make_test_shards(executables: List[Path], workers: int) -> List[ExecutableShard]:
+    """Split executables into shards of at least `MIN_TESTS_PER_SHARD` tests.
+
+    Executables with more tests come first, so that they start early.
+    """
+    test_counts = {executable: count_tests(executable) for executable in executables}
+    shards = []
+    for executable in sorted(executables, key=lambda exe: -test_counts[exe]):
+        total = max(1, min(workers, test_counts[executable] // MIN_TESTS_PER_SHARD))
+        shards.extend(
+            ExecutableShard(executable, index, total) for index in range(total)
+        )
+    return shards
+
+
+def checksum_test_inputs(
+    executable: Path, runtime_directories: List[Path]
+) -> FileChecksums:
+    """Get checksums of an executable and of the files it may use when run."""
+    inputs = [executable]
+    for directory in runtime_directories:
+        if directory.is_dir():
+            inputs.extend(path for path in directory.iterdir() if path.is_file())
+    return {str(path): calculate_checksum(path) for path in inputs}
+
+
+def run_tests(
+    test_executables_directory: Path,
+    under: str = "",
+    workers: int = 1,
+    timeout: Optional[float] = None,
+    database: Optional[BuildDatabase] = None,
+    runtime_directories: Optional[List[Path]] = None,
+    rerun: bool = False,
+    executables: Optional[List[Path]] = None,
+):
+    """Run test executables concurrently, reporting each one as it finishes.
+
+    Tests that run longer than `timeout` seconds are killed and count as
+    failed. Passed tests are recorded in `database`, and are not run again
+    unless `rerun` is set, until the checksum of the executable or of a file
+    in `runtime_directories` changes, e.g. the shared objects it loads.
+    Only `executables` are run if given, all executables in the directory
+    otherwise.
+    """
+    # pylint: disable=subprocess-run-check,too-many-locals
     cmd = []
 
     # run under dynamic analysis tools; gdb, valgrind etc.
@@ -76,20 +206,73 @@ def run_tests(test_executables_directory: Path, under: str = ""):
         ), f"{under} not installed."
         cmd.append(under)
 
-    failed_tests = []
-    for test_exe in test_executables_directory.iterdir():
-        result = subprocess.run(cmd + [test_exe], cwd=test_executables_directory)
-        if result.returncode != 0:
-            failed_tests.append((str(test_exe), str(result.returncode)))
-    success = len(failed_tests) == 0
+    executables = sorted(
+        test_executables_directory.iterdir() if executables is None else executables
+    )
+    inputs = {
+        executable: checksum_test_inputs(executable, runtime_directories or [])
+        for executable in executables
+    }
+    passed = database.get_passed_tests() if database and not rerun else {}
+    cached = [exe for exe in executables if passed.get(exe.name) == (cmd, inputs[exe])]
+    for executable in cached:
+        fancy_print(f"[PASS] {executable.name} (cached)", msg_type=MessageType.SUCCESS)
+    executables = [exe for exe in executables if exe not in cached]
+
+    shards = {shard.name: shard for shard in make_test_shards(executables, workers)}
+    jobs = [
+        Job(
+            name=name,
+            cmd=cmd + [str(shard.executable)],
+            error_message=f"{name} failed.",
+            pool=TEST_POOL,
+        )
+        for name, shard in shards.items()
+    ]
+
+    def run_shard(job: Job) -> JobResult:
+        returncode, output = run_process_group(
+            job.cmd,
+            timeout,
+            cwd=test_executables_directory,
+            env={**os.environ, **shards[job.name].env},
+        )
+        if returncode is None:
+            job = replace(job, error_message=f"{job.name} timed out after {timeout}s.")
+            returncode = TIMEOUT_RETURNCODE
+        return JobResult(job, returncode, output)
+
+    def report_shard(job_result: JobResult):
+        if job_result.success:
+            fancy_print(f"[PASS] {job_result.job.name}", msg_type=MessageType.SUCCESS)
+        else:
+            report_job(job_result)
+
+    failures = run_jobs(
+        jobs,
+        {TEST_POOL: workers},
+        on_result=report_shard,
+        runners={TEST_POOL: run_shard},
+        keep_going=True,
+    )
+    success = len(failures) == 0
+
+    if database:
+        failed = {shards[failure.job.name].executable for failure in failures}
+        with database.transaction():
+            for executable in executables:
+                if executable in failed:
+                    database.delete_passed_test(executable.name)
+                else:
+                    database.set_test_passed(executable.name, cmd, inputs[executable])
 
     msg = "[Kioku Tests]: "
     if success:
         msg += "Success."
     else:
         msg += "Failed\n"
-        for test, return_code in failed_tests:
-            msg += "- " + test + ": " + return_code + "\n"
+        for failure in sorted(failures, key=lambda failure: failure.job.name):
+            msg += f"- {failure.job.name}: {failure.returncode}\n"
 
     fancy_print(msg, msg_type=(MessageType.SUCCESS if success else MessageType.ERROR))
 
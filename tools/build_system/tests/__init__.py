@@ -1 +1,48 @@
 """Test module for build_system files."""
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Iterable
+
+from tools.build_system.code_util import REPO_ROOT
+from tools.build_system.include_resolution import IncludedHeaders
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import Target
+from tools.build_system.typing import OptString
+
+
+def make_target(
+    source_file: str,
+    source_type: SourceType = SourceType.SRC,
+    own: OptString = None,
+    internal: Iterable[str] = (),
+    external: Iterable[str] = (),
+) -> Target:
+    """Make a target without reading any file.
+
+    Paths are relative to the repository root, unless they are absolute.
+    """
+
+    def full_path(path: str) -> str:
+        return str(Path(REPO_ROOT) / path)
+
+    return Target(
+        source_file=full_path(source_file),
+        includes=IncludedHeaders(
+            own and full_path(own),
+            [full_path(header) for header in internal],
+            [full_path(header) for header in external],
+        ),
+        source_checksum="source",
+        include_checksums=set(),
+        source_type=source_type,
+    )
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Test case with a temporary directory `tmp_path`, removed after each test."""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = Path(tmp_dir.name)
@@ -0,0 +1,136 @@
+import dataclasses
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.build_system.build_config import BuildConfig
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.cache import Cache
+from tools.build_system.code_util import REPO_ROOT
+from tools.build_system.include_resolution import IncludedHeaders
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import Target
+from tools.build_system.tests import TempDirTestCase
+
+SOURCES = [
+    f"{REPO_ROOT}/src/core/util/src/assert.cpp",
+    f"{REPO_ROOT}/src/core/util/src/log.cpp",
+]
+
+
+class TestCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.build_directory = self.tmp_path
+        self.database = BuildDatabase(self.build_directory)
+        self.config = BuildConfig(compiler="g++", build_directory=self.build_directory)
+        self.targets = [
+            Target.make(source, IncludedHeaders(None, [], [])) for source in SOURCES
+        ]
+
+    def tearDown(self):
+        self.database.close()
+
+    def _changelist(self, config: BuildConfig, targets=None):
+        return Cache(config, self.database).get_target_changelist(
+            targets or self.targets
+        )
+
+    def _build(self, config: BuildConfig, targets=None):
+        cache = Cache(config, self.database)
+        changelist = cache.get_target_changelist(targets or self.targets)
+        cache.invalidate(changelist)
+        for target in changelist:
+            cache.record_compiled(target)
+        return changelist
+
+    def test_unchanged_targets_are_skipped(self):
+        self.assertEqual(self._build(self.config), self.targets)
+        self.assertEqual(self._changelist(self.config), [])
+
+    def test_unbuilt_targets_are_built_again(self):
+        self.assertEqual(self._changelist(self.config), self.targets)
+        cache = Cache(self.config, self.database)
+        cache.invalidate(self.targets)
+        cache.record_compiled(self.targets[0])
+        self.assertEqual(self._changelist(self.config), [self.targets[1]])
+
+    def test_unlinked_targets(self):
+        self._build(self.config)
+        cache = Cache(self.config, self.database)
+        main = dataclasses.replace(self.targets[0], source_type=SourceType.MAIN)
+        self.assertEqual(cache.get_unlinked_targets([main, self.targets[1]]), [main])
+        cache.record_linked(main)
+        self.assertEqual(cache.get_unlinked_targets([main, self.targets[1]]), [])
+
+    def test_changed_dependency(self):
+        self.assertEqual(self._changelist(self.config), self.targets)
+        cache = Cache(self.config, self.database)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            header = Path(tmp_dir) / "a.h"
+            header.write_bytes(b"content")
+            cache.record_compiled(self.targets[0], [str(header)])
+            cache.record_compiled(self.targets[1], [])
+            self.assertEqual(self._changelist(self.config), [])
+
+            header.write_bytes(b"changed content")
+            self.assertEqual(self._changelist(self.config), [self.targets[0]])
+
+    def test_changed_header_after_cache_hit(self):
+        header = self.tmp_path / "a.h"
+        header.write_bytes(b"content")
+        main = Target.make(SOURCES[0], IncludedHeaders(None, [str(header)], []))
+        self.assertEqual(self._changelist(self.config, [main]), [main])
+
+        # A cached object may come with an incomplete list of dependencies.
+        Cache(self.config, self.database).record_compiled(main, [])
+        self.assertEqual(self._changelist(self.config, [main]), [])
+
+        header.write_bytes(b"changed content")
+        self.assertEqual(self._changelist(self.config, [main]), [main])
+
+    def test_changed_target(self):
+        self._build(self.config)
+        changed = dataclasses.replace(self.targets[0], source_checksum="changed")
+        self.assertEqual(
+            self._changelist(self.config, [changed, self.targets[1]]), [changed]
+        )
+
+    def test_force_build(self):
+        self._build(self.config)
+        forced = dataclasses.replace(self.config, force_build=True)
+        self.assertEqual(self._changelist(forced), self.targets)
+        self.assertEqual(self._changelist(self.config), [])
+
+    def test_build_config_change(self):
+        self._build(self.config)
+        debug = dataclasses.replace(self.config, debug=True)
+        self.assertEqual(self._changelist(debug), self.targets)
+
+    def test_records_round_trip(self):
+        self._build(self.config)
+        records = self.database.get_targets()
+        for target in self.targets:
+            self.assertEqual(Target.from_record(records[str(target.name)]), target)
+
+
+class TestBuildDatabase(unittest.TestCase):
+    def test_outdated_schema_is_recreated(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database_path = Path(tmp_dir) / BuildDatabase.FILE_NAME
+            connection = sqlite3.connect(str(database_path))
+            connection.execute("CREATE TABLE targets (name TEXT)")
+            connection.execute("PRAGMA user_version = 0")
+            connection.commit()
+            connection.close()
+
+            database = BuildDatabase(Path(tmp_dir))
+            database.set_meta("key", "value")
+            self.assertEqual(database.get_meta("key"), "value")
+            self.assertEqual(database.get_targets(), {})
+            database.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.code_util import (
+    ChecksumCache,
+    FileStat,
+    get_changed_files,
+    parse_depfile,
+)
+from tools.build_system.tests import TempDirTestCase
+
+
+class TestChecksumCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file = self.tmp_path / "a.h"
+        self.file.write_bytes(b"content")
+
+    def test_checksum(self):
+        checksum = ChecksumCache().checksum(self.file)
+        self.assertEqual(checksum, hashlib.md5(b"content").hexdigest())
+
+    def test_unchanged_file_is_not_hashed(self):
+        cache = ChecksumCache({str(self.file): (FileStat.of(self.file), "cached")})
+        self.assertEqual(cache.checksum(self.file), "cached")
+
+    def test_changed_file_is_hashed(self):
+        cache = ChecksumCache({str(self.file): (FileStat.of(self.file), "cached")})
+        self.file.write_bytes(b"changed content")
+        self.assertEqual(
+            cache.checksum(self.file), hashlib.md5(b"changed content").hexdigest()
+        )
+
+    def test_recently_modified_files_are_not_persisted(self):
+        database = BuildDatabase(self.tmp_path / "build")
+        old_file = self.tmp_path / "b.h"
+        old_file.write_bytes(b"old")
+        os.utime(old_file, (0, 0))
+
+        cache = ChecksumCache()
+        cache.checksum(self.file)
+        cache.checksum(old_file)
+        cache.save(database)
+
+        loaded = ChecksumCache.load(database)
+        self.assertEqual(set(loaded._entries), {str(old_file)})
+
+
+class TestParseDepfile(unittest.TestCase):
+    def test_parse_depfile(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            depfile = Path(tmp_dir) / "a.d"
+            depfile.write_text("a.o: /a/a.cpp /a/b\\ c.h \\\n /a/d.h\n")
+            self.assertEqual(parse_depfile(depfile), ["/a/a.cpp", "/a/b c.h", "/a/d.h"])
+
+
+class TestGetChangedFiles(unittest.TestCase):
+    def _git(self, *args: str):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args],
+            cwd=self.repo,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def test_files_changed_by_revision_range(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.repo = Path(tmp_dir)
+            self._git("init", "-q")
+            (self.repo / "a.h").write_text("a")
+            (self.repo / "b.h").write_text("b")
+            self._git("add", ".")
+            self._git("commit", "-q", "-m", "first")
+            (self.repo / "b.h").write_text("changed")
+            self._git("commit", "-q", "-am", "second")
+            (self.repo / "a.h").write_text("uncommitted")
+
+            self.assertEqual(
+                get_changed_files("HEAD~1..HEAD", self.repo), [str(self.repo / "b.h")]
+            )
+            self.assertEqual(
+                get_changed_files("HEAD~1", self.repo),
+                [str(self.repo / "a.h"), str(self.repo / "b.h")],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
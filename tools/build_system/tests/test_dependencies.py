@@ -0,0 +1,85 @@
+import subprocess
+import unittest
+from unittest import mock
+
+from tools.build_system.dependencies import Dependencies, _identify_toolchain
+from tools.build_system.tests import TempDirTestCase
+
+
+def _git(*args: str) -> str:
+    cmd = ["git", "-c", "user.name=kioku", "-c", "user.email=kioku@localhost", *args]
+    return subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode().strip()
+
+
+class TestDependencies(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mirror_path = self.tmp_path / "mirrors"
+        (self.tmp_path / "deps").mkdir()
+        self.deps = Dependencies(self.tmp_path / "deps", self.mirror_path)
+
+    def test_release_and_debug_builds_are_independent(self):
+        googletest = self.deps.get_list[0]
+        jobs = self.deps.make_build_jobs(googletest, "Ninja")
+        jobs = {job.name: job for job in jobs}
+
+        self.assertEqual(
+            sorted(jobs),
+            [
+                "googletest/build",
+                "googletest/build/configure",
+                "googletest/build_debug",
+                "googletest/build_debug/configure",
+            ],
+        )
+        for build_dir in ("build", "build_debug"):
+            self.assertEqual(
+                jobs[f"googletest/{build_dir}"].dependencies,
+                (jobs[f"googletest/{build_dir}/configure"].key,),
+            )
+        self.assertIn(
+            "-DCMAKE_BUILD_TYPE=Debug", jobs["googletest/build_debug/configure"].cmd
+        )
+
+    def test_concurrent_builds_share_the_cores(self):
+        googletest = self.deps.get_list[0]
+        with mock.patch("os.cpu_count", return_value=8):
+            jobs = self.deps.make_build_jobs(googletest, "Ninja")
+        build_job = next(job for job in jobs if job.name == "googletest/build")
+        self.assertEqual(build_job.cmd[-2:], ["--parallel", "4"])
+
+    def test_missing_tools_are_identified_as_absent(self):
+        with mock.patch("subprocess.run", side_effect=FileNotFoundError):
+            toolchain = _identify_toolchain("Ninja")
+        self.assertEqual(
+            toolchain,
+            {"generator": "Ninja", "cmake": "absent", "c++": "absent", "cc": "absent"},
+        )
+
+    def test_fetch_from_mirror(self):
+        upstream = self.tmp_path / "googletest"
+        mirror = self.mirror_path / "googletest.git"
+        checkout = self.tmp_path / "deps" / "googletest"
+
+        def commit(content: str):
+            (upstream / "README.md").write_text(content)
+            _git("-C", str(upstream), "add", "README.md")
+            _git("-C", str(upstream), "commit", "-m", content)
+
+        _git("init", "-b", "main", str(upstream))
+        commit("first")
+        commit("second")
+        _git("clone", "--mirror", str(upstream), str(mirror))
+        self.deps.fetch()
+        self.assertEqual((checkout / "README.md").read_text(), "second")
+
+        commit("third")
+        _git("-C", str(mirror), "fetch", "-q")
+        self.deps.fetch()
+        self.assertEqual((checkout / "README.md").read_text(), "third")
+        # Only the pinned revisions are fetched, without their history.
+        self.assertEqual(_git("-C", str(checkout), "rev-list", "--count", "HEAD"), "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
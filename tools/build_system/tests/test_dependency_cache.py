@@ -0,0 +1,62 @@
+import tarfile
+import unittest
+from pathlib import Path
+
+from tools.build_system.dependency_cache import DependencyCache
+from tools.build_system.tests import TempDirTestCase
+
+BUILT_FILES = [Path("build/lib/libdep.a"), Path("build_debug/lib/libdep.a")]
+
+
+class TestDependencyCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = DependencyCache(self.tmp_path / "cache")
+        self.dep_dir = self.tmp_path / "dep"
+        for built_file in BUILT_FILES:
+            (self.dep_dir / built_file).parent.mkdir(parents=True)
+            (self.dep_dir / built_file).write_text(str(built_file))
+
+    def test_key_depends_on_inputs(self):
+        self.assertNotEqual(
+            DependencyCache.make_key("dep", {"commit": "a"}),
+            DependencyCache.make_key("dep", {"commit": "b"}),
+        )
+
+    def test_stored_files_are_loaded(self):
+        key = DependencyCache.make_key("dep", {"commit": "a"})
+        other_dir = self.tmp_path / "other"
+        self.assertFalse(self.cache.load(key, other_dir))
+
+        self.cache.store(key, self.dep_dir, BUILT_FILES)
+        self.assertTrue(self.cache.load(key, other_dir))
+        for built_file in BUILT_FILES:
+            self.assertEqual((other_dir / built_file).read_text(), str(built_file))
+
+    def test_corrupt_entries_are_not_loaded(self):
+        key = DependencyCache.make_key("dep", {"commit": "a"})
+        self.cache.store(key, self.dep_dir, BUILT_FILES)
+        entry = next((self.tmp_path / "cache").glob("*/*.tar.gz"))
+        entry.write_bytes(entry.read_bytes()[:20])
+        self.assertFalse(self.cache.load(key, self.tmp_path / "other"))
+
+    def test_exported_entries_are_imported(self):
+        key = DependencyCache.make_key("dep", {"commit": "a"})
+        self.cache.store(key, self.dep_dir, BUILT_FILES)
+        archive = self.tmp_path / "deps.tar"
+        self.assertEqual(self.cache.export_archive(archive), 1)
+
+        other_cache = DependencyCache(self.tmp_path / "other_cache")
+        self.assertEqual(other_cache.import_archive(archive), 1)
+        self.assertTrue(other_cache.load(key, self.tmp_path / "other"))
+
+    def test_archive_without_entries_is_rejected(self):
+        archive = self.tmp_path / "deps.tar"
+        with tarfile.open(archive, "w") as tar:
+            tar.add(self.dep_dir / BUILT_FILES[0], arcname="../libdep.a")
+        with self.assertRaises(DependencyCache.InvalidArchive):
+            self.cache.import_archive(archive)
+
+
+if __name__ == "__main__":
+    unittest.main()
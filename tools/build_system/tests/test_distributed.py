@@ -0,0 +1,130 @@
+import shutil
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tools.build_system.distributed import (
+    DistributedCompiler,
+    Worker,
+    split_compile_command,
+)
+from tools.build_system.distributed_worker import WorkerServer
+from tools.build_system.parallel import Job, JobResult
+from tools.build_system.tests import TempDirTestCase
+
+
+class TestSplitCompileCommand(unittest.TestCase):
+    def test_split(self):
+        split_cmd = split_compile_command(
+            ["g++", "-o", "a.o", "-c", "-std=c++17", "-Wall", "-Iinc", "a.cpp", "-O3"]
+        )
+        self.assertEqual(
+            split_cmd.preprocess_cmd,
+            ["g++", "-std=c++17", "-Wall", "-Iinc", "a.cpp", "-O3", "-E"],
+        )
+        self.assertEqual(split_cmd.remote_args, ["-c", "-std=c++17", "-Wall", "-O3"])
+        self.assertEqual(split_cmd.output, "a.o")
+
+    def test_forced_include_is_preprocessed_only(self):
+        split_cmd = split_compile_command(
+            ["g++", "-o", "a.o", "-c", "-include", "pch/p.h", "a.cpp"]
+        )
+        self.assertEqual(
+            split_cmd.preprocess_cmd, ["g++", "-include", "pch/p.h", "a.cpp", "-E"]
+        )
+        self.assertEqual(split_cmd.remote_args, ["-c"])
+
+
+@unittest.skipUnless(shutil.which("g++"), "g++ is not available")
+class TestDistributedCompiler(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        (self.tmp_path / "a.h").write_text("int a();\n")
+        self.source = self.tmp_path / "a.cpp"
+        self.source.write_text('#include "a.h"\nint a() { return 0; }\n')
+        self.objfile = self.tmp_path / "a.o"
+
+        self.server = WorkerServer(("localhost", 0), slots=1)
+        self.address = f"localhost:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _job(self, source: Path) -> Job:
+        cmd = ["g++", "-o", str(self.objfile), "-c", f"-I{self.tmp_path}", str(source)]
+        return Job("a", cmd)
+
+    def test_compile_on_worker(self):
+        compiler = DistributedCompiler([self.address], 1)
+        self.assertEqual(compiler.capacity, 1)
+
+        job_result = compiler.run_job(self._job(self.source))
+        self.assertTrue(job_result.success)
+        self.assertIn(f"Compiled on {self.address}", job_result.output)
+        self.assertTrue(self.objfile.is_file())
+
+    def test_compile_error_is_retried_locally(self):
+        broken_source = self.tmp_path / "broken.cpp"
+        broken_source.write_text("broken\n")
+
+        job_result = DistributedCompiler([self.address], 1).run_job(
+            self._job(broken_source)
+        )
+        self.assertFalse(job_result.success)
+        self.assertNotIn("Compiled on", job_result.output)
+
+    def test_malformed_compile_response_is_retried_locally(self):
+        compiler = DistributedCompiler([self.address], 1)
+        with mock.patch.object(Worker, "request", return_value=({}, b"")):
+            job_result = compiler.run_job(self._job(self.source))
+        self.assertTrue(job_result.success)
+        self.assertNotIn("Compiled on", job_result.output)
+        self.assertEqual(compiler.capacity, 0)
+
+    def test_local_compilations_are_limited(self):
+        running, max_running = [0], [0]
+        lock = threading.Lock()
+
+        def run_job(job: Job) -> JobResult:
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return JobResult(job, 0, "")
+
+        compiler = DistributedCompiler([], 2)
+        with mock.patch("tools.build_system.distributed.run_job", run_job):
+            threads = [
+                threading.Thread(
+                    target=compiler.run_job, args=(self._job(self.source),)
+                )
+                for _ in range(6)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(max_running[0], 2)
+
+    def test_unreachable_worker_is_not_used(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+        compiler = DistributedCompiler([self.address], 1)
+        self.assertEqual(compiler.capacity, 0)
+        self.assertTrue(compiler.run_job(self._job(self.source)).success)
+
+    def test_worker_with_malformed_status_is_not_used(self):
+        with mock.patch.object(Worker, "request", return_value=({}, b"")):
+            self.assertEqual(DistributedCompiler([self.address], 1).capacity, 0)
+        self.assertEqual(DistributedCompiler(["localhost:port"], 1).capacity, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.code_util import REPO_ROOT
+from tools.build_system.include_resolution import (
+    AmbigousHeader,
+    HeaderClosureRecord,
+    HeaderClosures,
+    HeaderIndex,
+)
+
+MATH_INCLUDE_DIR = Path(REPO_ROOT) / "src/core/math/include/math"
+UTIL_INCLUDE_DIR = Path(REPO_ROOT) / "src/core/util/include/util"
+
+
+class TestHeaderIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = HeaderIndex(
+            [
+                "/a/dstruct/include/dstruct/list.h",
+                "/a/dstruct/include/dstruct/util.h",
+                "/a/math/include/math/util.h",
+            ]
+        )
+
+    def test_find_by_include_statement(self):
+        self.assertEqual(
+            self.index.find("dstruct/list.h"), "/a/dstruct/include/dstruct/list.h"
+        )
+        self.assertEqual(self.index.find("list.h"), "/a/dstruct/include/dstruct/list.h")
+        self.assertEqual(self.index.find("math/util.h"), "/a/math/include/math/util.h")
+
+    def test_no_partial_component_match(self):
+        self.assertIsNone(self.index.find("st.h"))
+        self.assertIsNone(self.index.find("struct/list.h"))
+
+    def test_not_found(self):
+        self.assertIsNone(self.index.find("gtest/gtest.h"))
+
+    def test_ambigous(self):
+        with self.assertRaises(AmbigousHeader):
+            self.index.find("util.h")
+
+
+class TestHeaderClosures(unittest.TestCase):
+    def setUp(self):
+        self.mat_n = str(MATH_INCLUDE_DIR / "mat_n.h")
+        self.vec_n = str(MATH_INCLUDE_DIR / "vec_n.h")
+        self.expected_closure = {
+            self.vec_n,
+            str(MATH_INCLUDE_DIR / "util.h"),
+            str(UTIL_INCLUDE_DIR / "assert.h"),
+        }
+
+    def test_closure(self):
+        closures = HeaderClosures()
+        self.assertEqual(closures.closure(self.mat_n), self.expected_closure)
+
+    def test_circular_inclusions(self):
+        inclusions = {
+            "a.h": {"b.h", "d.h"},
+            "b.h": {"c.h"},
+            "c.h": {"a.h"},
+            "d.h": {"e.h"},
+            "e.h": set(),
+        }
+        cycle_closure = {"a.h", "b.h", "c.h", "d.h", "e.h"}
+        with mock.patch.object(
+            HeaderClosures,
+            "_parse_direct_inclusions",
+            side_effect=lambda header: frozenset(inclusions[header]),
+        ), mock.patch.object(HeaderClosures, "_checksum", return_value="checksum"):
+            closures = HeaderClosures()
+            self.assertEqual(closures.closure("a.h"), cycle_closure)
+            self.assertEqual(closures.closure("c.h"), cycle_closure)
+            self.assertEqual(closures.closure("d.h"), {"e.h"})
+
+            reloaded = HeaderClosures(closures._records)
+            self.assertEqual(reloaded.closure("b.h"), cycle_closure)
+
+    def test_persisted_closure_is_reused(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = BuildDatabase(Path(tmp_dir))
+            closures = HeaderClosures.load(database)
+            closures.closure(self.mat_n)
+            closures.save(database)
+
+            loaded = HeaderClosures.load(database)
+            with mock.patch.object(HeaderClosures, "_parse_direct_inclusions") as parse:
+                self.assertEqual(loaded.closure(self.mat_n), self.expected_closure)
+                parse.assert_not_called()
+
+    def test_changed_header_is_reparsed(self):
+        closures = HeaderClosures()
+        closures.closure(self.mat_n)
+        stale_record = HeaderClosureRecord("stale", frozenset(), frozenset())
+        records = {**closures._records, self.vec_n: stale_record}
+
+        reloaded = HeaderClosures(records)
+        self.assertEqual(reloaded.closure(self.mat_n), self.expected_closure)
+        self.assertNotEqual(reloaded._records[self.vec_n], stale_record)
+
+    def test_deleted_header_in_closure_is_changed(self):
+        closures = HeaderClosures()
+        closures.closure(self.mat_n)
+        deleted = str(MATH_INCLUDE_DIR / "deleted.h")
+        record = closures._records[self.mat_n]
+        records = {
+            **closures._records,
+            self.mat_n: HeaderClosureRecord(
+                record.checksum, record.direct, record.closure | {deleted}
+            ),
+            deleted: HeaderClosureRecord("deleted", frozenset(), frozenset()),
+        }
+
+        reloaded = HeaderClosures(records)
+        self.assertEqual(reloaded.closure(self.mat_n), self.expected_closure)
+
+    def test_closures_are_discarded_when_headers_change(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = BuildDatabase(Path(tmp_dir))
+            closures = HeaderClosures.load(database, [self.mat_n, self.vec_n])
+            closures.closure(self.mat_n)
+            closures.save(database)
+
+            loaded = HeaderClosures.load(database, [self.mat_n, self.vec_n])
+            self.assertIn(self.mat_n, loaded._records)
+            added = HeaderClosures.load(database, [self.mat_n, self.vec_n, "/a.h"])
+            self.assertEqual(added._records, {})
+            self.assertEqual(database.get_header_closures(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from tools.build_system.build_config import BuildConfig
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.builder import Compiler, LibraryBuilder, Linker
+from tools.build_system.code_util import REPO_ROOT
+from tools.build_system.dependencies import Dependencies
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import TargetExploration
+from tools.build_system.tests import TempDirTestCase, make_target
+
+
+VEC = make_target("src/math/src/vec.cpp", SourceType.SRC, "src/math/vec.h")
+LOG = make_target("src/util/src/log.cpp", SourceType.SRC, "src/util/log.h")
+MAIN = make_target("src/app/main.cpp", SourceType.MAIN, internal=["src/math/vec.h"])
+TEST = make_target(
+    "src/util/test/test_log.cpp", SourceType.TEST, internal=["src/util/log.h"]
+)
+TARGETS = [VEC, LOG, MAIN, TEST]
+
+
+class TestLinker(TempDirTestCase):
+    def _make_linker(self, shared_objects: bool = False) -> Linker:
+        config = BuildConfig(
+            compiler="g++",
+            cpp_standard="17",
+            build_directory=self.tmp_path,
+            test=True,
+            shared_objects=shared_objects,
+        )
+        deps = Dependencies(self.tmp_path / "deps")
+        compiler = Compiler(config, deps)
+        libraries = LibraryBuilder(config, compiler, BuildDatabase(self.tmp_path))
+        libraries.assign_libraries(TargetExploration.scan_static_libs(TARGETS))
+        return Linker(config, deps, compiler, libraries)
+
+    def test_executables_linking_compiled_targets_are_linked(self):
+        jobs = self._make_linker().make_jobs([], TARGETS, [VEC])
+        self.assertEqual([job.name for job in jobs], [str(MAIN.name)])
+        self.assertIn(("library", "src-math"), jobs[0].dependencies)
+
+    def test_executables_in_changelist_are_linked(self):
+        jobs = self._make_linker().make_jobs([TEST], TARGETS, [TEST])
+        self.assertEqual([job.name for job in jobs], [str(TEST.name)])
+
+    def test_changed_shared_objects_do_not_relink(self):
+        linker = self._make_linker(shared_objects=True)
+        self.assertEqual(linker.make_jobs([], TARGETS, [VEC, LOG]), [])
+
+    def test_shared_objects_are_linked_without_changing_as_needed(self):
+        (job,) = self._make_linker(shared_objects=True).make_jobs([MAIN], TARGETS, [])
+        start = job.cmd.index("-Wl,--push-state,--no-as-needed")
+        self.assertIn("-Wl,--pop-state", job.cmd[start:])
+        self.assertNotIn("-Wl,--as-needed", job.cmd)
+
+    def test_executables_loading_changed_shared_objects_are_affected(self):
+        linker = self._make_linker(shared_objects=True)
+        self.assertEqual(linker.find_affected_executables([VEC], TARGETS), [MAIN])
+        self.assertEqual(linker.find_affected_executables([TEST], TARGETS), [TEST])
+
+    def test_changed_headers_change_including_targets(self):
+        changed = TargetExploration.find_changed_targets(
+            TARGETS, [f"{REPO_ROOT}/src/math/vec.h"]
+        )
+        self.assertEqual(changed, [VEC, MAIN])
+
+    def test_unaffected_tests_linking_compiled_targets_are_outdated(self):
+        linker = self._make_linker()
+        self.assertEqual(
+            linker.select_affected_tests([VEC], [LOG], TARGETS), ([], [TEST])
+        )
+        self.assertEqual(
+            linker.select_affected_tests([LOG], [LOG], TARGETS), ([TEST], [])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import sys
+import unittest
+
+from tools.build_system.linker_selection import (
+    DEFAULT_LINKER,
+    benchmark_linkers,
+    make_linker_flags,
+    select_linker,
+)
+
+
+class TestLinkerSelection(unittest.TestCase):
+    def test_default_linker_has_no_flags(self):
+        self.assertEqual(make_linker_flags(None), [])
+        self.assertEqual(make_linker_flags("lld"), ["-fuse-ld=lld"])
+
+    def test_missing_compiler_selects_default_linker(self):
+        self.assertIsNone(select_linker("missing-compiler++", "lld"))
+        self.assertIsNone(select_linker("missing-compiler++", DEFAULT_LINKER))
+
+    def test_benchmark_leaves_out_failing_linkers(self):
+        # The linker flag is passed to the script as an argument.
+        script = "import sys; sys.exit('-fuse-ld=gold' in sys.argv)"
+        timings = benchmark_linkers(
+            [[sys.executable, "-c", script, "-o", "executable"]],
+            [DEFAULT_LINKER, "gold"],
+            repeat=2,
+        )
+        self.assertEqual(list(timings), [DEFAULT_LINKER])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+
+from tools.build_system.code_util import calculate_checksum
+from tools.build_system.include_resolution import IncludedHeaders
+from tools.build_system.object_cache import ObjectCache
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import Target
+from tools.build_system.tests import TempDirTestCase, make_target
+
+TARGET = Target(
+    source_file="/a/src/a.cpp",
+    includes=IncludedHeaders("/a/include/a.h", [], []),
+    source_checksum="source",
+    include_checksums={"header"},
+    source_type=SourceType.SRC,
+)
+CMD = [sys.executable, "-o", "/build/obj/a.o", "-c", "-std=c++17", "/a/src/a.cpp"]
+
+
+class TestObjectCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ObjectCache(self.tmp_path / "cache", max_size=15)
+
+    def _write_object(self, name: str, content: bytes) -> Path:
+        path = self.tmp_path / name
+        path.write_bytes(content)
+        return path
+
+    def test_key_ignores_output_path(self):
+        other_output = [*CMD[:2], "/other/obj/a.o", *CMD[3:]]
+        self.assertEqual(
+            ObjectCache.make_key(TARGET, CMD),
+            ObjectCache.make_key(TARGET, other_output),
+        )
+
+    def test_key_covers_flags_and_headers(self):
+        key = ObjectCache.make_key(TARGET, CMD)
+        self.assertNotEqual(key, ObjectCache.make_key(TARGET, [*CMD, "-O3"]))
+
+        changed_header = Target(**{**TARGET.__dict__, "include_checksums": {"other"}})
+        self.assertNotEqual(key, ObjectCache.make_key(changed_header, CMD))
+
+    def test_store_and_fetch(self):
+        source = self._write_object("a.cpp", b"source")
+        self.cache.store("ab01", self._write_object("a.o", b"object"), [str(source)])
+
+        output = self.tmp_path / "fetched.o"
+        self.assertEqual(self.cache.fetch("ab01", output), [str(source)])
+        self.assertEqual(output.read_bytes(), b"object")
+        self.assertIsNone(self.cache.fetch("ab02", output))
+
+    def test_changed_dependency_of_main_is_a_miss(self):
+        header = self._write_object("a.h", b"#define A 1")
+        main = make_target(
+            str(self.tmp_path / "main.cpp"), SourceType.MAIN, internal=[str(header)]
+        )
+        self.assertEqual(main.includes.all, [str(header)])
+
+        key = ObjectCache.make_key(main, CMD)
+        self.cache.store(key, self._write_object("a.o", b"object"), [str(header)])
+        output = self.tmp_path / "fetched.o"
+        self.assertEqual(self.cache.fetch(key, output), [str(header)])
+
+        header.write_bytes(b"#define A 2")
+        self.assertIsNone(self.cache.fetch(key, output))
+
+    def test_manifest_of_changed_files_is_rejected(self):
+        header = self._write_object("a.h", b"#define A 1")
+        manifest = ObjectCache.make_manifest({str(header): calculate_checksum(header)})
+        self.assertEqual(list(ObjectCache.read_manifest(manifest)), [str(header)])
+
+        header.write_bytes(b"#define A 2")
+        self.assertIsNone(ObjectCache.read_manifest(manifest))
+        self.assertIsNone(ObjectCache.read_manifest(b"truncated {"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for index, key in enumerate(("aa01", "bb01", "cc01")):
+            self.cache.store(key, self._write_object(f"{key}.o", b"1234"), [])
+            entry = self.cache._entry_path(ObjectCache.make_object_key(key, {}))
+            os.utime(entry, ns=(index, index))
+            os.utime(self.cache._manifest_path(key), ns=(index, index))
+
+        self.cache.fetch("aa01", self.tmp_path / "fetched.o")
+        self.cache.evict()
+
+        self.assertIsNotNone(self.cache.fetch("aa01", self.tmp_path / "fetched.o"))
+        self.assertIsNone(self.cache.fetch("bb01", self.tmp_path / "fetched.o"))
+        self.assertIsNotNone(self.cache.fetch("cc01", self.tmp_path / "fetched.o"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from tools.build_system.parallel import Job, JobGraph, run_jobs
+
+
+class TestJobGraph(unittest.TestCase):
+    def test_dependents_become_ready_when_done(self):
+        compile_a = Job("a", ["true"], pool="compile")
+        compile_b = Job("b", ["true"], pool="compile")
+        link = Job(
+            "exe", ["true"], pool="link", dependencies=(compile_a.key, compile_b.key)
+        )
+        graph = JobGraph([link, compile_a, compile_b])
+
+        self.assertIsNone(graph.pop_ready("link"))
+        first, second = graph.pop_ready("compile"), graph.pop_ready("compile")
+        self.assertEqual({first.key, second.key}, {compile_a.key, compile_b.key})
+
+        graph.mark_done(first)
+        self.assertIsNone(graph.pop_ready("link"))
+        graph.mark_done(second)
+        self.assertEqual(graph.pop_ready("link"), link)
+
+    def test_unscheduled_dependencies_are_satisfied(self):
+        link = Job("exe", ["true"], pool="link", dependencies=(("compile", "a"),))
+        graph = JobGraph([link])
+        self.assertEqual(graph.pop_ready("link"), link)
+
+    def test_cyclic_dependency(self):
+        first = Job("a", ["true"], dependencies=(("default", "b"),))
+        second = Job("b", ["true"], dependencies=(("default", "a"),))
+        with self.assertRaises(JobGraph.CyclicDependency):
+            JobGraph([first, second])
+
+
+class TestRunJobs(unittest.TestCase):
+    def test_success(self):
+        jobs = [Job(str(idx), ["true"]) for idx in range(4)]
+        self.assertEqual(run_jobs(jobs, {"default": 2}), [])
+
+    def test_failures_stop_scheduling(self):
+        failing = Job("failing", ["false"])
+        dependent = Job("dependent", ["false"], dependencies=(failing.key,))
+        later = Job("later", ["false"])
+
+        failures = run_jobs([failing, dependent, later], {"default": 1})
+        self.assertEqual([failure.job for failure in failures], [failing])
+
+    def test_keep_going_after_failures(self):
+        failing = Job("failing", ["false"])
+        dependent = Job("dependent", ["true"], dependencies=(failing.key,))
+        later = Job("later", ["false"])
+
+        failures = run_jobs(
+            [failing, dependent, later], {"default": 1}, keep_going=True
+        )
+        self.assertEqual([failure.job for failure in failures], [failing, later])
+
+    def test_all_running_failures_are_reported(self):
+        jobs = [Job("first", ["false"]), Job("second", ["false"])]
+        failures = run_jobs(jobs, {"default": 2})
+        self.assertEqual(
+            {failure.job.name for failure in failures}, {"first", "second"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
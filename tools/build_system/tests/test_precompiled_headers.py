@@ -0,0 +1,63 @@
+import unittest
+
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.precompiled_headers import PrecompiledHeaders
+from tools.build_system.tests import TempDirTestCase, make_target
+
+
+class TestPrecompiledHeaders(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pch = PrecompiledHeaders(
+            self.tmp_path, BuildDatabase(self.tmp_path), threshold=2
+        )
+
+    def test_assign_widely_included_headers(self):
+        targets = [
+            make_target(
+                "src/a.cpp", internal=["/a/x.h", "/a/y.h"], external=["/gtest.h"]
+            ),
+            make_target("src/b.cpp", internal=["/a/x.h"], external=["/gtest.h"]),
+            make_target("src/c.cpp", internal=["/a/x.h"], external=["/gtest.h"]),
+            make_target("src/d.cpp", internal=["/a/y.h"]),
+        ]
+        assignment = self.pch.assign(targets)
+
+        # Each target gets only the selected headers it includes, and a set of
+        # headers used by a single target is not worth precompiling.
+        self.assertEqual(
+            assignment,
+            {
+                str(targets[1].name): ("/a/x.h", "/gtest.h"),
+                str(targets[2].name): ("/a/x.h", "/gtest.h"),
+            },
+        )
+
+    def test_name_covers_flags(self):
+        headers = ("/a/x.h",)
+        self.assertNotEqual(
+            PrecompiledHeaders.make_name(headers, ["g++", "-std=c++17"]),
+            PrecompiledHeaders.make_name(headers, ["g++", "-std=c++20"]),
+        )
+
+    def test_prepare_until_recorded(self):
+        header = self.tmp_path / "x.h"
+        header.write_text("int x();\n")
+        name = PrecompiledHeaders.make_name((str(header),), ["g++"])
+        self.assertTrue(self.pch.prepare(name, (str(header),), "g++"))
+        self.assertIn(str(header), self.pch.make_header_path(name).read_text())
+
+        # Simulate a compilation.
+        self.pch.make_output_path(name, "g++").write_bytes(b"pch")
+        self.pch.make_depfile_path(name).write_text(f"x.h.gch: {header}\n")
+        self.pch.record(name)
+        self.assertFalse(self.pch.prepare(name, (str(header),), "g++"))
+
+        # An outdated precompiled header is removed before it is compiled again.
+        header.write_text("int y();\n")
+        self.assertTrue(self.pch.prepare(name, (str(header),), "g++"))
+        self.assertFalse(self.pch.make_output_path(name, "g++").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import http.client
+import socket
+import threading
+import unittest
+from unittest import mock
+
+from tools.build_system.remote_cache import RemoteCache, RemoteCacheMode
+from tools.build_system.remote_cache_server import RemoteCacheServer
+from tools.build_system.tests import TempDirTestCase
+
+KEY = "0123456789abcdef0123456789abcdef"
+
+
+class TestRemoteCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = RemoteCacheServer(("localhost", 0), self.tmp_path / "server")
+        self.url = f"http://localhost:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_put_and_get(self):
+        cache = RemoteCache(self.url, RemoteCacheMode.READ_WRITE)
+        self.assertIsNone(cache.get(RemoteCache.OBJECTS, KEY))
+        cache.put(RemoteCache.OBJECTS, KEY, b"object")
+        self.assertEqual(cache.get(RemoteCache.OBJECTS, KEY), b"object")
+        self.assertIsNone(cache.get(RemoteCache.EXECUTABLES, KEY))
+
+    def test_read_only_cache_does_not_upload(self):
+        RemoteCache(self.url).put(RemoteCache.OBJECTS, KEY, b"object")
+        self.assertIsNone(RemoteCache(self.url).get(RemoteCache.OBJECTS, KEY))
+
+    def test_upload_and_fetch_all(self):
+        artifact = self.tmp_path / "a.o"
+        artifact.write_bytes(b"object")
+        cache = RemoteCache(self.url, RemoteCacheMode.READ_WRITE)
+        cache.upload(RemoteCache.OBJECTS, KEY, artifact)
+        cache.close()
+
+        missing_key = "f" * 32
+        outputs = {KEY: self.tmp_path / "b.o", missing_key: self.tmp_path / "c.o"}
+        fetched = RemoteCache(self.url).fetch_all(RemoteCache.OBJECTS, outputs)
+        self.assertEqual(fetched, {KEY})
+        self.assertEqual(outputs[KEY].read_bytes(), b"object")
+        self.assertFalse(outputs[missing_key].exists())
+
+    def test_get_all(self):
+        cache = RemoteCache(self.url, RemoteCacheMode.READ_WRITE)
+        cache.upload_content(RemoteCache.MANIFESTS, KEY, b"{}")
+        cache.close()
+
+        manifests = RemoteCache(self.url).get_all(
+            RemoteCache.MANIFESTS, [KEY, "f" * 32]
+        )
+        self.assertEqual(manifests, {KEY: b"{}"})
+
+    def test_unreachable_server_is_a_miss(self):
+        with socket.socket() as unused_socket:
+            unused_socket.bind(("localhost", 0))
+            url = f"http://localhost:{unused_socket.getsockname()[1]}"
+
+        cache = RemoteCache(url, RemoteCacheMode.READ_WRITE, timeout=1.0)
+        self.assertIsNone(cache.get(RemoteCache.OBJECTS, KEY))
+        cache.put(RemoteCache.OBJECTS, KEY, b"object")
+
+    def test_truncated_response_disables_cache(self):
+        cache = RemoteCache(self.url, RemoteCacheMode.READ_WRITE)
+        cache.put(RemoteCache.OBJECTS, KEY, b"object")
+        with mock.patch(
+            "urllib.request.urlopen", side_effect=http.client.IncompleteRead(b"")
+        ):
+            self.assertIsNone(cache.get(RemoteCache.OBJECTS, KEY))
+        self.assertIsNone(cache.get(RemoteCache.OBJECTS, KEY))
+
+    def test_invalid_url_is_a_miss(self):
+        self.assertIsNone(RemoteCache("localhost").get(RemoteCache.OBJECTS, KEY))
+
+
+if __name__ == "__main__":
+    unittest.main()
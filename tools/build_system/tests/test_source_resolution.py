@@ -0,0 +1,49 @@
+import unittest
+from pathlib import Path
+
+from tools.build_system.source_resolution import (
+    SourceType,
+    resolve_source_file_type,
+    scan_source_file,
+)
+from tools.build_system.tests import TempDirTestCase
+
+
+class TestSourceScan(TempDirTestCase):
+    def _write(self, name: str, content: str) -> Path:
+        path = self.tmp_path / name
+        path.write_bytes(content.encode("utf-8"))
+        return path
+
+    def test_scan_includes_and_markers(self):
+        path = self._write(
+            "test_a.cpp",
+            '#include "a/b.h"\r\n'
+            "#include <vector>\n"
+            '#include "c.hpp"\n'
+            "\n"
+            '// #include "commented.h" is not at the beginning of the line\n'
+            "TEST(A, B) {}\n",
+        )
+        scan = scan_source_file(path)
+        self.assertEqual(scan.includes, ("a/b.h", "c.hpp"))
+        self.assertTrue(scan.has_regular_include)
+        self.assertTrue(scan.has_gtest_macro)
+        self.assertFalse(scan.has_main_entrypoint)
+
+    def test_scan_empty_file(self):
+        scan = scan_source_file(self._write("empty.h", ""))
+        self.assertEqual(scan.includes, ())
+        self.assertFalse(scan.has_regular_include)
+
+    def test_resolve_source_file_type(self):
+        test_file = self._write("test_a.cpp", '#include "a.h"\nTEST_F(A, B) {}\n')
+        main_file = self._write("main.cpp", '#include "a.h"\nint main() {}\n')
+        src_file = self._write("a.cpp", '#include "a.h"\nint a() {}\n')
+        self.assertEqual(resolve_source_file_type(test_file), SourceType.TEST)
+        self.assertEqual(resolve_source_file_type(main_file), SourceType.MAIN)
+        self.assertEqual(resolve_source_file_type(src_file), SourceType.SRC)
+
+
+if __name__ == "__main__":
+    unittest.main()
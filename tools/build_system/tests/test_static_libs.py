@@ -0,0 +1,32 @@
+import unittest
+
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import TargetExploration
+from tools.build_system.tests import make_target
+
+
+class TestScanStaticLibs(unittest.TestCase):
+    def test_libraries_per_module(self):
+        targets = [
+            make_target("src/math/src/vec.cpp", own="src/math/include/math/vec.h"),
+            make_target("src/util/log.cpp", own="src/util/log.h"),
+            make_target("src/math/src/mat.cpp", own="src/math/include/math/mat.h"),
+            make_target("src/math/test/test_vec.cpp", SourceType.TEST),
+        ]
+        libraries = TargetExploration.scan_static_libs(targets)
+
+        self.assertEqual(
+            [
+                (library.name, [target.name for target in library.targets])
+                for library in libraries
+            ],
+            [
+                ("src-math", [targets[2].name, targets[0].name]),
+                ("src-util", [targets[1].name]),
+            ],
+        )
+        self.assertEqual(TargetExploration.scan_shared_object_libs(targets), libraries)
+
+
+if __name__ == "__main__":
+    unittest.main()
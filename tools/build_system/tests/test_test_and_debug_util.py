@@ -0,0 +1,79 @@
+import unittest
+from pathlib import Path
+
+from tools.build_system.build_database import BuildDatabase
+from tools.build_system.test_and_debug_util import (
+    ExecutableShard,
+    make_test_shards,
+    run_tests,
+)
+from tools.build_system.tests import TempDirTestCase
+
+
+class TestRunTests(TempDirTestCase):
+    def _make_executable(self, name: str, script: str) -> Path:
+        executable = self.tmp_path / name
+        executable.write_text(f"#!/bin/sh\n{script}\n")
+        executable.chmod(0o755)
+        return executable
+
+    def test_large_executables_are_sharded(self):
+        listing = "Suite.\\n" + "".join(f"  Test{idx}\\n" for idx in range(8))
+        large = self._make_executable("large", f'printf "{listing}"')
+        small = self._make_executable("small", "exit 1")
+
+        shards = make_test_shards([small, large], workers=4)
+        self.assertEqual(
+            shards,
+            [
+                ExecutableShard(large, 0, 2),
+                ExecutableShard(large, 1, 2),
+                ExecutableShard(small),
+            ],
+        )
+        self.assertEqual(shards[1].name, "large [2/2]")
+        self.assertEqual(
+            shards[1].env, {"GTEST_TOTAL_SHARDS": "2", "GTEST_SHARD_INDEX": "1"}
+        )
+        self.assertEqual(shards[2].env, {})
+
+    def test_failures_and_timeouts(self):
+        self._make_executable("passing", "exit 0")
+        self.assertEqual(run_tests(self.tmp_path, workers=2, timeout=10), 0)
+
+        self._make_executable("slow", '[ "$1" = --gtest_list_tests ] || sleep 10')
+        self.assertEqual(run_tests(self.tmp_path, workers=2, timeout=0.1), -1)
+
+    def test_unchanged_passed_tests_are_not_run_again(self):
+        test_dir = self.tmp_path / "test"
+        test_dir.mkdir()
+        runs = self.tmp_path / "runs"
+        database = BuildDatabase(self.tmp_path)
+
+        def write_test(script: str):
+            # Listing the tests does not count as a run.
+            listing = '[ "$1" = --gtest_list_tests ] && exit 1'
+            executable.write_text(f"#!/bin/sh\n{listing}\n{script}\n")
+
+        def run_twice(**kwargs) -> str:
+            for _ in range(2):
+                run_tests(test_dir, database=database, **kwargs)
+            return runs.read_text() if runs.exists() else ""
+
+        executable = self._make_executable("test/passing", "")
+        write_test(f"echo run >> {runs}")
+        self.assertEqual(run_twice(), "run\n")
+        self.assertEqual(run_twice(rerun=True), "run\n" * 3)
+
+        runs.unlink()
+        write_test(f"echo changed >> {runs}")
+        self.assertEqual(run_twice(), "changed\n")
+
+        runs.unlink()
+        write_test(f"echo failed >> {runs}; exit 1")
+        self.assertEqual(run_twice(), "failed\n" * 2)
+        database.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
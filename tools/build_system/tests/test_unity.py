@@ -0,0 +1,55 @@
+import unittest
+
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import Target
+from tools.build_system.tests import TempDirTestCase, make_target
+from tools.build_system.unity import UnityBuild
+
+
+def _make_module_target(module: str, name: str, source_type=SourceType.SRC) -> Target:
+    return make_target(
+        f"src/{module}/src/{name}.cpp",
+        source_type,
+        own=f"src/{module}/include/{module}/{name}.h",
+    )
+
+
+class TestUnityBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.unity = UnityBuild(self.tmp_path, batch_size=2)
+
+    def test_batches_per_module(self):
+        targets = [
+            _make_module_target("math", "vec"),
+            _make_module_target("util", "log"),
+            _make_module_target("math", "mat"),
+            _make_module_target("math", "util"),
+            _make_module_target("util", "main", SourceType.MAIN),
+        ]
+        batches = self.unity.make_batches(targets)
+
+        # The third source of math would be alone in its batch, and executables
+        # are never batched.
+        self.assertEqual(
+            [[target.name for target in batch.targets] for batch in batches],
+            [[targets[2].name, targets[3].name]],
+        )
+        self.assertEqual(
+            batches[0].source_file.read_text(),
+            f'#include "{targets[2].source_file}"\n'
+            f'#include "{targets[3].source_file}"\n',
+        )
+
+    def test_batch_name_depends_on_members(self):
+        first = self.unity.make_batches(
+            [_make_module_target("math", "mat"), _make_module_target("math", "vec")]
+        )
+        second = self.unity.make_batches(
+            [_make_module_target("math", "mat"), _make_module_target("math", "util")]
+        )
+        self.assertNotEqual(first[0].name, second[0].name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Unity builds, compiling the sources of a module in batched translation units."""
+import hashlib
+import json
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import List, Tuple
+
+from tools.build_system.module_organization import ModuleOrganization
+from tools.build_system.source_resolution import SourceType
+from tools.build_system.target import Target
+
+
+@dataclass(frozen=True)
+class UnityBatch:
+    """Targets of a module, compiled together as a single translation unit."""
+
+    name: str
+    targets: Tuple[Target, ...]
+    source_file: Path
+
+
+class UnityBuild:
+    """Batches module sources, so that the headers they share are parsed once.
+
+    Sources of the same module directory, as determined by the module
+    organization, are batched in the order of their names. Executables and
+    tests are never batched, as each of them is linked separately.
+    """
+
+    DIR = "unity"
+
+    def __init__(self, build_directory: Path, batch_size: int):
+        """Create an instance, writing batched sources into the build directory."""
+        self._directory = build_directory / UnityBuild.DIR
+        self._directory.mkdir(exist_ok=True, parents=True)
+        self._batch_size = batch_size
+
+    def make_batches(self, targets: List[Target]) -> List[UnityBatch]:
+        """Batch the module sources among targets, writing a source per batch.
+
+        Targets that would be alone in a batch are left out.
+        """
+        sources = sorted(
+            (target for target in targets if target.source_type == SourceType.SRC),
+            key=lambda target: (self._module_directory(target), str(target.name)),
+        )
+
+        batches = []
+        for module_directory, module_targets in groupby(
+            sources, key=self._module_directory
+        ):
+            module_targets = list(module_targets)
+            for start in range(0, len(module_targets), self._batch_size):
+                end = start + self._batch_size
+                batch_targets = module_targets[start:end]
+                if len(batch_targets) > 1:
+                    batches.append(self._make_batch(module_directory, batch_targets))
+        return batches
+
+    def _make_batch(self, module_directory: Path, targets: List[Target]) -> UnityBatch:
+        # Batches are named after their members, so that a batch is never
+        # overwritten while other targets still link its previous object file.
+        members = json.dumps([str(target.name) for target in targets])
+        digest = hashlib.sha256(members.encode("utf-8")).hexdigest()[:16]
+        name = f"unity-{module_directory.name}-{digest}"
+
+        source_file = self._directory / f"{name}.cpp"
+        content = "".join(f'#include "{target.source_file}"\n' for target in targets)
+        if not source_file.is_file() or source_file.read_text() != content:
+            source_file.write_text(content)
+        return UnityBatch(name, tuple(targets), source_file)
+
+    @staticmethod
+    def _module_directory(target: Target) -> Path:
+        return ModuleOrganization.module_directory(
+            target.source_file, target.includes.own
+        )